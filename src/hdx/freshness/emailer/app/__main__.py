@@ -12,12 +12,20 @@ from hdx.facades.keyword_arguments import facade
 from hdx.utilities.dateparse import now_utc
 from hdx.utilities.dictandlist import args_to_dict
 from hdx.utilities.easy_logging import setup_logging
-from hdx.utilities.path import script_dir_plus_file
+from hdx.utilities.path import get_temp_dir, script_dir_plus_file
 
 from ..utils.databasequeries import DatabaseQueries
 from ..utils.freshnessemail import Email
 from ..utils.hdxhelper import HDXHelper
+from ..utils.historycache import HistoryCache
+from ..utils.indexadvisor import IndexAdvisor
+from ..utils.paginatedfetcher import PaginatedFetcher
+from ..utils.queryprofiler import QueryProfiler
+from ..utils.resultcache import ResultCache
+from ..utils.runsnapshot import RunSnapshot
 from ..utils.sheet import Sheet
+from ..utils.sqliteaccelerator import SQLiteAccelerator
+from ..utils.userorgcache import UserOrgCache
 from . import __version__
 from .datafreshnessstatus import DataFreshnessStatus
 
@@ -35,6 +43,23 @@ def main(
     email_test: Optional[str] = None,
     spreadsheet_test: bool = False,
     no_spreadsheet: bool = False,
+    ensure_indexes: bool = False,
+    use_transitions: bool = False,
+    export_snapshot: Optional[str] = None,
+    load_snapshot: Optional[str] = None,
+    bulk_load: bool = False,
+    use_run_summaries: bool = False,
+    partition_aware: bool = False,
+    prefetch: bool = False,
+    profile_queries: Optional[str] = None,
+    slow_query_threshold: float = 1.0,
+    explain_queries: bool = False,
+    result_cache: Optional[str] = None,
+    history_cache: Optional[str] = None,
+    accelerate_sqlite: bool = False,
+    sqlite_in_memory: bool = False,
+    user_org_cache: Optional[str] = None,
+    fetch_workers: Optional[int] = None,
     **ignore,
 ) -> None:
     """Run freshness emailer. Either a database connection string (db_uri) or database
@@ -54,6 +79,45 @@ def main(
     HDX system administrators who are emailed with summaries of maintainers contacted,
     datasets that have become delinquent, invalid maintainers and org admins etc.
 
+    If ensure_indexes is True, the indexes needed by the emailer's queries are
+    created in the freshness database if they are missing and the query plans are
+    logged. No emails are sent. If use_transitions is True, the transitions between
+    the current and previous runs are stored in a table in the freshness database
+    when they are first needed and the checks read them from there.
+
+    If export_snapshot is supplied, the current and previous runs are exported to a
+    compressed file with that path and no emails are sent. If load_snapshot is
+    supplied, the exported file with that path is used instead of the freshness
+    database. If bulk_load is True and the database is PostgreSQL, the current run
+    is read using COPY. If use_run_summaries is True, summaries of recent runs are
+    stored in a table in the freshness database and the check of the number of
+    datasets uses them to ignore falls within normal variation. It cannot be used
+    with load_snapshot as the exported file only has the datasets of the current
+    and previous runs. If partition_aware is
+    True, run numbers are written into queries as literals so that PostgreSQL can
+    prune partitions of tables partitioned by run number. If prefetch and email_test
+    are True, once the check of the number of datasets has passed, the snapshot and
+    broken resources queries are run concurrently reading from the same snapshot on
+    PostgreSQL.
+
+    If profile_queries is supplied, the time taken, rows and size of every query are
+    measured and saved to a csv file with that path. Queries taking longer than
+    slow_query_threshold seconds are logged as warnings. If explain_queries is
+    True, query plans are also saved. If result_cache is supplied, the results of
+    queries are cached in a private folder with that path so that repeat runs on the same
+    day do not need to query the database. If history_cache is supplied, the run
+    history of datasets is kept in memory-mapped files in a folder with that path
+    and the check of reference periods reads it from there.
+
+    If accelerate_sqlite is True and the database is SQLite, it is opened read-only
+    and immutable with a large memory map and page cache. If sqlite_in_memory is
+    also True, it is first copied into memory. It must be if use_transitions,
+    use_run_summaries or ensure_indexes is True as they write to the database. If
+    user_org_cache is supplied, HDX users and organisations are cached in a folder
+    with that path and only changes are downloaded on later runs. If fetch_workers
+    is supplied, HDX users and organisations are downloaded page by page with up to
+    that many concurrent requests.
+
     Args:
         db_uri (Optional[str]): Database connection URI. Defaults to None.
         db_params (Optional[str]): Database connection parameters. Defaults to None.
@@ -64,11 +128,40 @@ def main(
         email_test (Optional[str]): Only email test users. Defaults to None.
         spreadsheet_test (bool): Output to test Google spreadsheet. Defaults to False.
         no_spreadsheet (bool): Don't output to Google spreadsheet. Defaults to False.
+        ensure_indexes (bool): Only create missing indexes. Defaults to False.
+        use_transitions (bool): Use transitions table. Defaults to False.
+        export_snapshot (Optional[str]): Path to export runs to. Defaults to None.
+        load_snapshot (Optional[str]): Path to load runs from. Defaults to None.
+        bulk_load (bool): Read current run using COPY. Defaults to False.
+        use_run_summaries (bool): Use run summaries table. Defaults to False.
+        partition_aware (bool): Write run numbers into queries. Defaults to False.
+        prefetch (bool): Run independent queries of email test concurrently. Defaults to False.
+        profile_queries (Optional[str]): Save query measurements to this file. Defaults to None.
+        slow_query_threshold (float): Seconds above which query is slow. Defaults to 1.0.
+        explain_queries (bool): Save query plans with measurements. Defaults to False.
+        result_cache (Optional[str]): Folder in which to cache query results. Defaults to None.
+        history_cache (Optional[str]): Folder in which to cache run history. Defaults to None.
+        accelerate_sqlite (bool): Open SQLite database read-only for speed. Defaults to False.
+        sqlite_in_memory (bool): Copy SQLite database into memory. Defaults to False.
+        user_org_cache (Optional[str]): Folder in which to cache HDX users and organisations. Defaults to None.
+        fetch_workers (Optional[int]): Concurrent requests to download users and organisations. Defaults to None.
 
     Returns:
         None
     """
 
+    if load_snapshot and use_run_summaries:
+        raise ValueError(
+            "Run summaries cannot be used with a loaded snapshot as it only has the datasets of the current and previous runs!"
+        )
+    if (
+        accelerate_sqlite
+        and not sqlite_in_memory
+        and (use_transitions or use_run_summaries or ensure_indexes)
+    ):
+        raise ValueError(
+            "Accelerated SQLite database is read-only so sqlite_in_memory is needed to use transitions, run summaries or ensure indexes!"
+        )
     logger.info(f"> Data freshness emailer {__version__}")
     configuration = Configuration.read()
     if email_server:  # Get email server details
@@ -88,7 +181,11 @@ def main(
     else:
         logger.info("> No email host!")
         send_emails = None
-    if db_params:  # Get freshness database server details
+    if load_snapshot:  # Use exported runs instead of freshness database
+        params = RunSnapshot.load(
+            load_snapshot, get_temp_dir("freshness_emailer")
+        )
+    elif db_params:  # Get freshness database server details
         params = args_to_dict(db_params)
     elif db_uri:
         params = get_params_from_connection_uri(db_uri)
@@ -97,8 +194,38 @@ def main(
     if sysadmin_emails:
         sysadmin_emails = sysadmin_emails.split(",")
     logger.info(f"> Database parameters: {params}")
-    with Database(**params) as session:
+    if accelerate_sqlite and params.get("dialect") == "sqlite":
+        database = SQLiteAccelerator(
+            params["database"], in_memory=sqlite_in_memory
+        )
+    else:
+        database = Database(**params)
+    with database as session:
         now = now_utc()
+        if ensure_indexes:
+            hdxhelper = HDXHelper(
+                site_url=configuration.get_hdx_site_url(),
+                users=list(),
+                organizations=list(),
+            )
+            databasequeries = DatabaseQueries(
+                session=session, now=now, hdxhelper=hdxhelper
+            )
+            IndexAdvisor(session, databasequeries).ensure_indexes()
+            logger.info("Freshness database indexes ensured!")
+            return
+        if export_snapshot:
+            hdxhelper = HDXHelper(
+                site_url=configuration.get_hdx_site_url(),
+                users=list(),
+                organizations=list(),
+            )
+            databasequeries = DatabaseQueries(
+                session=session, now=now, hdxhelper=hdxhelper
+            )
+            RunSnapshot(databasequeries).export(export_snapshot)
+            logger.info("Freshness runs exported!")
+            return
         email = Email(
             now,
             sysadmin_emails=sysadmin_emails,
@@ -126,11 +253,54 @@ def main(
                     error,
                 )
             else:
+                if fetch_workers:
+                    fetcher = PaginatedFetcher(
+                        configuration.get_hdx_site_url(),
+                        api_key=configuration.get_api_key(),
+                        user_agent=configuration.get_user_agent(),
+                        max_workers=fetch_workers,
+                    )
+                else:
+                    fetcher = None
+                if user_org_cache:
+                    userorgcache = UserOrgCache(
+                        user_org_cache, now, fetcher=fetcher
+                    )
+                else:
+                    userorgcache = None
+                # Users and organisations are only downloaded when a check
+                # first needs them so failure runs do not call HDX
                 hdxhelper = HDXHelper(
-                    site_url=configuration.get_hdx_site_url()
+                    site_url=configuration.get_hdx_site_url(),
+                    userorgcache=userorgcache,
+                    fetcher=fetcher,
                 )
+                if profile_queries:
+                    queryprofiler = QueryProfiler(
+                        slow_threshold=slow_query_threshold,
+                        explain=explain_queries,
+                    )
+                else:
+                    queryprofiler = None
+                if result_cache:
+                    resultcache = ResultCache(result_cache)
+                else:
+                    resultcache = None
+                if history_cache:
+                    historycache = HistoryCache(history_cache)
+                else:
+                    historycache = None
                 databasequeries = DatabaseQueries(
-                    session=session, now=now, hdxhelper=hdxhelper
+                    session=session,
+                    now=now,
+                    hdxhelper=hdxhelper,
+                    use_transitions=use_transitions,
+                    bulk_load=bulk_load,
+                    use_run_summaries=use_run_summaries,
+                    partition_aware=partition_aware,
+                    queryprofiler=queryprofiler,
+                    resultcache=resultcache,
+                    historycache=historycache,
                 )
                 freshness = DataFreshnessStatus(
                     databasequeries=databasequeries,
@@ -141,6 +311,13 @@ def main(
                 if not freshness.check_number_datasets(
                     now, send_failures=failure_emails
                 ):
+                    # Only prefetch once it is known that the checks will run.
+                    # The production checks only read the snapshot so there is
+                    # nothing to run alongside it.
+                    if prefetch and email_test:
+                        databasequeries.prefetch(
+                            ("snapshot", "broken_resources")
+                        )
                     if email_test:  # send just to test users
                         test_users = [failure_emails[0]]
                         freshness.process_broken(recipients=test_users)
@@ -154,10 +331,9 @@ def main(
                         freshness.process_datasets_noresources(
                             recipients=test_users
                         )
-                        # freshness.process_datasets_reference_period(
-                        #     recipients=test_users,
-                        #     sysadmins=test_users
-                        # )
+                        freshness.process_datasets_reference_period(
+                            recipients=test_users, sysadmins=test_users
+                        )
                         freshness.process_datasets_datagrid(
                             recipients=test_users
                         )
@@ -171,11 +347,16 @@ def main(
                         # Check for datasets with no resources
                         freshness.process_datasets_noresources()
                         # Check for datasets where the reference period may need updating
-                        # freshness.process_datasets_reference_period(
-                        #     sysadmins=test_users
-                        # )
+                        freshness.process_datasets_reference_period()
                         # Check for candidates for the data grid
                         freshness.process_datasets_datagrid()
+                if queryprofiler is not None:
+                    queryprofiler.log_table()
+                    if databasequeries.run_numbers:
+                        run_number = databasequeries.run_numbers[0][0]
+                    else:
+                        run_number = None
+                    queryprofiler.save(profile_queries, run_number)
 
     logger.info("Freshness emailer completed!")
 
@@ -238,6 +419,119 @@ if __name__ == "__main__":
         action="store_true",
         help="Do not update issues spreadsheet",
     )
+    parser.add_argument(
+        "-ei",
+        "--ensure_indexes",
+        default=False,
+        action="store_true",
+        help="Create missing database indexes and log query plans",
+    )
+    parser.add_argument(
+        "-ut",
+        "--use_transitions",
+        default=False,
+        action="store_true",
+        help="Store and read run to run transitions in a table",
+    )
+    parser.add_argument(
+        "-xs",
+        "--export_snapshot",
+        default=None,
+        help="Export current and previous runs to this file",
+    )
+    parser.add_argument(
+        "-ls",
+        "--load_snapshot",
+        default=None,
+        help="Use runs exported to this file instead of database",
+    )
+    parser.add_argument(
+        "-bl",
+        "--bulk_load",
+        default=False,
+        action="store_true",
+        help="Read current run using COPY on PostgreSQL",
+    )
+    parser.add_argument(
+        "-rs",
+        "--use_run_summaries",
+        default=False,
+        action="store_true",
+        help="Store and read run summaries in a table",
+    )
+    parser.add_argument(
+        "-pa",
+        "--partition_aware",
+        default=False,
+        action="store_true",
+        help="Write run numbers into queries for partition pruning",
+    )
+    parser.add_argument(
+        "-pf",
+        "--prefetch",
+        default=False,
+        action="store_true",
+        help="Run independent database queries concurrently",
+    )
+    parser.add_argument(
+        "-pq",
+        "--profile_queries",
+        default=None,
+        help="Save database query measurements to this csv file",
+    )
+    parser.add_argument(
+        "-sq",
+        "--slow_query_threshold",
+        default=1.0,
+        type=float,
+        help="Seconds above which a database query is logged as slow",
+    )
+    parser.add_argument(
+        "-eq",
+        "--explain_queries",
+        default=False,
+        action="store_true",
+        help="Save query plans with database query measurements",
+    )
+    parser.add_argument(
+        "-rc",
+        "--result_cache",
+        default=None,
+        help="Folder in which to cache database query results",
+    )
+    parser.add_argument(
+        "-hc",
+        "--history_cache",
+        default=None,
+        help="Folder in which to cache run history of datasets",
+    )
+    parser.add_argument(
+        "-as",
+        "--accelerate_sqlite",
+        default=False,
+        action="store_true",
+        help="Open SQLite database read-only with large memory map and cache",
+    )
+    parser.add_argument(
+        "-sm",
+        "--sqlite_in_memory",
+        default=False,
+        action="store_true",
+        help="Copy SQLite database into memory (with --accelerate_sqlite)",
+    )
+    parser.add_argument(
+        "-uc",
+        "--user_org_cache",
+        default=None,
+        help="Folder in which to cache HDX users and organisations",
+    )
+    parser.add_argument(
+        "-fw",
+        "--fetch_workers",
+        default=None,
+        type=int,
+        help="Concurrent requests to download HDX users and organisations",
+    )
     args = parser.parse_args()
     hdx_key = args.hdx_key
     if hdx_key is None:
@@ -289,4 +583,21 @@ if __name__ == "__main__":
         email_test=args.email_test,
         spreadsheet_test=args.spreadsheet_test,
         no_spreadsheet=args.no_spreadsheet,
+        ensure_indexes=args.ensure_indexes,
+        use_transitions=args.use_transitions,
+        export_snapshot=args.export_snapshot,
+        load_snapshot=args.load_snapshot,
+        bulk_load=args.bulk_load,
+        use_run_summaries=args.use_run_summaries,
+        partition_aware=args.partition_aware,
+        prefetch=args.prefetch,
+        profile_queries=args.profile_queries,
+        slow_query_threshold=args.slow_query_threshold,
+        explain_queries=args.explain_queries,
+        result_cache=args.result_cache,
+        history_cache=args.history_cache,
+        accelerate_sqlite=args.accelerate_sqlite,
+        sqlite_in_memory=args.sqlite_in_memory,
+        user_org_cache=args.user_org_cache,
+        fetch_workers=args.fetch_workers,
     )
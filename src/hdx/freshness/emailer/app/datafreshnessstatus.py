@@ -5,6 +5,7 @@ the data grid.
 """
 import logging
 from datetime import datetime, timedelta
+from statistics import median, pstdev
 from typing import Dict, List, Optional, Type
 
 from hdx.data.dataset import Dataset
@@ -27,6 +28,10 @@ class DataFreshnessStatus:
     """
 
     object_output_limit = 2
+    # Number of recent runs with datasets needed to use rolling statistics
+    min_previous_runs = 3
+    # Number of standard deviations of recent runs within which a fall is normal
+    fall_sigmas = 3
 
     def __init__(
         self, databasequeries: DatabaseQueries, email: Email, sheet: Sheet
@@ -36,6 +41,30 @@ class DataFreshnessStatus:
         self.email = email
         self.sheet = sheet
 
+    @classmethod
+    def is_normal_fall(
+        cls, datasets_today: int, previous_number_datasets: List[int]
+    ) -> bool:
+        """Check if the number of datasets today is within the normal variation of
+        the numbers of datasets in recent runs ie. its fall below their median is no
+        more than 2% or fall_sigmas standard deviations, whichever is bigger. Runs
+        with no datasets are ignored. If there are fewer than min_previous_runs
+        runs, the fall is not considered normal.
+
+        Args:
+            datasets_today (int): Number of datasets today
+            previous_number_datasets (List[int]): Number of datasets in recent runs
+
+        Returns:
+            bool: Whether fall in number of datasets is normal
+        """
+        counts = [count for count in previous_number_datasets if count != 0]
+        if len(counts) < cls.min_previous_runs:
+            return False
+        baseline = median(counts)
+        tolerance = max(0.02, cls.fall_sigmas * pstdev(counts) / baseline)
+        return (baseline - datasets_today) / baseline <= tolerance
+
     def check_number_datasets(
         self,
         now: datetime,
@@ -43,7 +72,8 @@ class DataFreshnessStatus:
     ) -> bool:
         """Check the number of datasets in HDX today compared to yesterday and alert for
         failures like no run date today, no datasets today or a sizable fall in
-        number of datasets compared to the previous day.
+        number of datasets compared to the previous day. If there are summaries of
+        recent runs, a fall that is within their normal variation is not reported.
 
 
         Args:
@@ -89,6 +119,14 @@ class DataFreshnessStatus:
                     subject = "FAILURE: No datasets today!"
                     msg = "Dear system administrator,\n\nIt is highly probable that data freshness has failed!\n"
                     to = send_failures
+                elif self.is_normal_fall(
+                    datasets_today,
+                    self.databasequeries.get_previous_number_datasets(),
+                ):
+                    logger.info(
+                        "Fall in number of datasets is within normal variation."
+                    )
+                    return False
                 else:
                     subject = "WARNING: Fall in datasets on HDX today!"
                     startmsg = f"Dear {Email.get_addressee(self.sheet.dutyofficer)},\n\n"
@@ -231,7 +269,7 @@ class DataFreshnessStatus:
         startmsg = "Dear {},\n\nThe following datasets have just become delinquent and their maintainers should be approached:\n\n"
         subject = "Delinquent datasets"
         sheetname = "Delinquent"
-        datasets = self.databasequeries.get_status(3)
+        datasets = self.databasequeries.iter_status(3)
         self.email.email_admins(
             self.hdxhelper,
             datasets,
@@ -241,6 +279,7 @@ class DataFreshnessStatus:
             self.sheet,
             sheetname,
             recipients,
+            presorted=True,
         )
 
     def process_overdue(
@@ -260,7 +299,7 @@ class DataFreshnessStatus:
             None
         """
         logger.info("\n\n*** Checking for overdue datasets ***")
-        datasets = self.databasequeries.get_status(2)
+        datasets = self.databasequeries.iter_status(2)
         nodatasetsmsg = "No overdue datasets found."
         startmsg = "Dear {},\n\nThe dataset(s) listed below are due for an update on the Humanitarian Data Exchange (HDX). You can update all of these in your $dashboard on HDX.\n\n"
         endmsg = '\nTip: You can decrease the "Expected Update Frequency" by clicking "Edit" on the top right of the dataset.\n'
@@ -282,6 +321,7 @@ class DataFreshnessStatus:
             self.sheet,
             sheetname,
             sysadmins=sysadmins,
+            presorted=True,
         )
 
     def send_maintainer_email(
@@ -478,6 +518,15 @@ class DataFreshnessStatus:
         datasets_modified_yesterday = (
             self.databasequeries.get_datasets_modified_yesterday()
         )
+        if len(self.databasequeries.get_run_numbers()) < 2:
+            logger.info("Less than 2 runs so no data grid candidates.")
+            return
+        (
+            runyesterday,
+            runtoday,
+        ) = self.databasequeries.runcatalog.get_run_window()
+        runyesterday = runyesterday.replace(tzinfo=None).isoformat()
+        runtoday = runtoday.replace(tzinfo=None).isoformat()
         emails = dict()
         for datagridname in self.sheet.datagrids:
             datasets = list()
@@ -485,12 +534,6 @@ class DataFreshnessStatus:
             for category in datagrid:
                 if category in ["datagrid", "owner"]:
                     continue
-                runyesterday = self.databasequeries.run_numbers[1][1]
-                runyesterday = runyesterday.replace(tzinfo=None)
-                runyesterday = runyesterday.isoformat()
-                runtoday = self.databasequeries.run_numbers[0][1]
-                runtoday = runtoday.replace(tzinfo=None)
-                runtoday = runtoday.isoformat()
                 query = f'metadata_created:[{runyesterday}Z TO {runtoday}Z] AND {datagrid["datagrid"]} AND ({datagrid[category]})'
                 datasetinfos = datasetclass.search_in_hdx(fq=query)
                 for datasetinfo in datasetinfos:
@@ -0,0 +1,229 @@
+"""Asynchronous functions that perform queries of the freshness database
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Tuple
+
+from hdx.database.dburi import get_connection_uri
+
+from .databasequeries import DatabaseQueries
+from .hdxhelper import HDXHelper
+from .records import DatasetRecord
+
+try:
+    from sqlalchemy.ext.asyncio import (
+        AsyncSession,
+        async_sessionmaker,
+        create_async_engine,
+    )
+except ImportError:
+    AsyncSession = None
+    async_sessionmaker = None
+    create_async_engine = None
+
+logger = logging.getLogger(__name__)
+
+async_drivers = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def get_async_connection_uri(params: Dict) -> str:
+    """Get a connection URI that uses an asyncio driver (aiosqlite for SQLite and
+    asyncpg for PostgreSQL) from database connection parameters
+
+    Args:
+        params (Dict): Database connection parameters
+
+    Returns:
+        str: Connection URI
+    """
+    dialect = params.get("dialect", "postgresql")
+    return get_connection_uri(
+        database=params.get("database"),
+        host=params.get("host"),
+        port=params.get("port"),
+        username=params.get("username"),
+        password=params.get("password"),
+        dialect=dialect,
+        driver=async_drivers[dialect],
+    )
+
+
+@asynccontextmanager
+async def async_session(params: Dict) -> AsyncIterator["AsyncSession"]:
+    """Open an asyncio session on the freshness database. Requires the async extra
+    to be installed.
+
+    Args:
+        params (Dict): Database connection parameters
+
+    Returns:
+        AsyncIterator[AsyncSession]: Asyncio session
+    """
+    if create_async_engine is None:
+        raise ImportError(
+            "Asyncio support requires hdx-data-freshness-emailer[async]!"
+        )
+    engine = create_async_engine(get_async_connection_uri(params))
+    try:
+        async with async_sessionmaker(engine)() as session:
+            yield session
+    finally:
+        await engine.dispose()
+
+
+class AsyncDatabaseQueries:
+    """A class that offers awaitable functions that query the freshness database
+    so that database reads can overlap with network bound work such as calls to
+    HDX and Google Sheets. Queries are run by DatabaseQueries within the asyncio
+    session so they give the same results. Queries on the same session are run one
+    at a time. Use create to construct.
+
+    Args:
+        session (AsyncSession): Asyncio session to use for queries
+        databasequeries (DatabaseQueries): DatabaseQueries using the session
+    """
+
+    def __init__(
+        self, session: "AsyncSession", databasequeries: DatabaseQueries
+    ):
+        self.session = session
+        self.databasequeries = databasequeries
+        self.run_numbers = databasequeries.run_numbers
+        self.lock = asyncio.Lock()
+
+    @classmethod
+    async def create(
+        cls,
+        session: "AsyncSession",
+        now: datetime,
+        hdxhelper: HDXHelper,
+        **kwargs: Any,
+    ) -> "AsyncDatabaseQueries":
+        """Create AsyncDatabaseQueries
+
+        Args:
+            session (AsyncSession): Asyncio session to use for queries
+            now (datetime): Date to use for now
+            hdxhelper (HDXHelper): HDX helper object
+            **kwargs: Other arguments to pass to DatabaseQueries
+
+        Returns:
+            AsyncDatabaseQueries: AsyncDatabaseQueries object
+        """
+
+        def create_databasequeries(sync_session):
+            return DatabaseQueries(sync_session, now, hdxhelper, **kwargs)
+
+        databasequeries = await session.run_sync(create_databasequeries)
+        return cls(session, databasequeries)
+
+    async def run(self, method: Callable, *args: Any) -> Any:
+        """Run a method of DatabaseQueries within the asyncio session
+
+        Args:
+            method (Callable): Method of DatabaseQueries
+            *args: Arguments to pass to method
+
+        Returns:
+            Any: Return value of method
+        """
+        async with self.lock:
+            return await self.session.run_sync(lambda _: method(*args))
+
+    async def get_number_datasets(self) -> Tuple[int, int]:
+        """Get the number of datasets today and yesterday in a tuple
+
+        Returns:
+             Tuple[int, int]: (number of datasets today, number of datasets yesterday)
+        """
+        return await self.run(self.databasequeries.get_number_datasets)
+
+    async def get_snapshot(self) -> Dict[str, DatasetRecord]:
+        """Get a snapshot of the datasets in the current run including their
+        freshness, what updated and reference period in the previous run
+
+        Returns:
+            Dict[str, DatasetRecord]: Dataset id to dataset for the current run
+        """
+        return await self.run(self.databasequeries.get_snapshot)
+
+    async def get_broken(self) -> Dict[str, Dict]:
+        """Get dateset information categorised by error message
+
+        Returns:
+             Dict[str, Dict]: Dataset information categorised by error message
+        """
+        return await self.run(self.databasequeries.get_broken)
+
+    async def get_status(self, status: int) -> List[DatasetRecord]:
+        """Get datasets for a given freshness status (0=fresh, 1=due, 2=overdue,
+        3=delinquent)
+
+        Args:
+            status (int): Freshness status
+
+        Returns:
+            List[DatasetRecord]: List of datasets for a given freshness status
+        """
+        return await self.run(self.databasequeries.get_status, status)
+
+    async def get_status_transitions(
+        self, statuses: Tuple[int, ...] = (1, 2, 3)
+    ) -> Dict[int, List[DatasetRecord]]:
+        """Get datasets for the given freshness statuses grouped by status
+
+        Args:
+            statuses (Tuple[int, ...]): Freshness statuses. Defaults to (1, 2, 3).
+
+        Returns:
+            Dict[int, List[DatasetRecord]]: Freshness status to list of datasets
+        """
+        return await self.run(
+            self.databasequeries.get_status_transitions, statuses
+        )
+
+    async def get_invalid_maintainer_orgadmins(
+        self,
+    ) -> Tuple[List[DatasetRecord], Dict[str, Dict]]:
+        """Get datasets with invalid maintainer and organisations with invalid
+        administrators
+
+        Returns:
+            Tuple[List[DatasetRecord], Dict[str, Dict]]: (Datasets with invalid
+            maintainer, organisations with invalid administrators)
+        """
+        return await self.run(
+            self.databasequeries.get_invalid_maintainer_orgadmins
+        )
+
+    async def get_datasets_noresources(self) -> List[DatasetRecord]:
+        """Get datasets with no resources
+
+        Returns:
+            List[DatasetRecord]: Datasets with no resources
+        """
+        return await self.run(self.databasequeries.get_datasets_noresources)
+
+    async def get_datasets_modified_yesterday(
+        self,
+    ) -> Dict[str, DatasetRecord]:
+        """Get datasets modified yesterday
+
+        Returns:
+            Dict[str, DatasetRecord]: Datasets modified yesterday
+        """
+        return await self.run(
+            self.databasequeries.get_datasets_modified_yesterday
+        )
+
+    async def get_datasets_reference_period(self) -> List[DatasetRecord]:
+        """Get datasets with a reference period that could be due for update
+
+        Returns:
+            List[DatasetRecord]: Datasets with a reference period that could be due for update
+        """
+        return await self.run(
+            self.databasequeries.get_datasets_reference_period
+        )
@@ -0,0 +1,104 @@
+"""Functions that bulk load the results of freshness database queries using
+PostgreSQL COPY
+"""
+import logging
+from typing import Dict, Tuple
+
+from sqlalchemy import Boolean, DateTime, Float, Integer, Select, TypeDecorator
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+class BulkLoader:
+    """A class that loads the results of a statement into columnar buffers using
+    COPY (SELECT ...) TO STDOUT. This avoids the per row overhead of the database
+    driver and SQLAlchemy when reading a whole run. It is only supported on
+    PostgreSQL with the psycopg (version 3) driver. Use is_supported to check
+    whether the normal query path should be used instead.
+
+    Args:
+        session (sqlalchemy.orm.Session): Session to use for queries
+    """
+
+    # SQLAlchemy type to PostgreSQL type used to parse COPY output
+    type_names = {
+        Boolean: "bool",
+        Integer: "int8",
+        Float: "float8",
+        DateTime: "timestamp",
+    }
+
+    def __init__(self, session: Session):
+        self.session = session
+        self.dialect = session.get_bind().dialect
+
+    def is_supported(self) -> bool:
+        """Check if bulk loading is supported by the database
+
+        Returns:
+            bool: Whether bulk loading is supported
+        """
+        return self.dialect.name == "postgresql" and self.dialect.driver in (
+            "psycopg",
+            "psycopg_async",
+        )
+
+    @classmethod
+    def get_type_name(cls, column_type) -> str:
+        """Get the PostgreSQL type used to parse a column from COPY output
+
+        Args:
+            column_type: SQLAlchemy type of column
+
+        Returns:
+            str: PostgreSQL type name
+        """
+        if isinstance(column_type, TypeDecorator):
+            column_type = column_type.impl_instance
+        for type_class, type_name in cls.type_names.items():
+            if isinstance(column_type, type_class):
+                return type_name
+        return "text"
+
+    def load(self, statement: Select) -> Dict[str, Tuple]:
+        """Load the results of a statement into columnar buffers ie. one tuple of
+        values per column. Values are converted the same way as SQLAlchemy would
+        convert them (eg. datetimes have a timezone added).
+
+        Args:
+            statement (Select): Statement to execute
+
+        Returns:
+            Dict[str, Tuple]: Column name to values
+        """
+        # named paramstyle so that % is not escaped as there are no parameters
+        dialect = self.dialect.__class__(paramstyle="named")
+        sql = statement.compile(
+            dialect=dialect, compile_kwargs={"literal_binds": True}
+        )
+        columns = statement.selected_columns
+        names = [column.key for column in columns]
+        type_names = [self.get_type_name(column.type) for column in columns]
+        driver_connection = (
+            self.session.connection().connection.driver_connection
+        )
+        with driver_connection.cursor() as cursor:
+            with cursor.copy(f"COPY ({sql}) TO STDOUT") as copy:
+                copy.set_types(type_names)
+                rows = list(copy.rows())
+        if rows:
+            values = list(zip(*rows))
+        else:
+            values = [tuple() for _ in names]
+        buffers = dict()
+        for name, column, column_values in zip(names, columns, values):
+            column_type = column.type
+            if isinstance(column_type, TypeDecorator):
+                column_values = tuple(
+                    column_type.process_result_value(value, self.dialect)
+                    for value in column_values
+                )
+            buffers[name] = column_values
+        logger.info(f"COPY returned {len(rows)} rows.")
+        return buffers
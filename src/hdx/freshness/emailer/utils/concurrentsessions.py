@@ -0,0 +1,142 @@
+"""Functions that run queries of the freshness database concurrently
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import Connection, Engine, text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+class ConcurrentSessions:
+    """A class that runs tasks in a thread pool giving each task its own session on
+    a connection from the engine's pool. On PostgreSQL, a snapshot is exported when
+    entering the context and every session reads from it with REPEATABLE READ
+    isolation so that all tasks see the same data even if a freshness run is
+    writing to the database at the same time. The transaction that exported the
+    snapshot is closed as soon as every task has imported it.
+
+    Args:
+        engine (Engine): Engine from which to get connections
+        max_workers (Optional[int]): Maximum number of threads. Defaults to None (one per task).
+    """
+
+    def __init__(self, engine: Engine, max_workers: Optional[int] = None):
+        self.engine = engine
+        self.max_workers = max_workers
+        self.snapshot_connection: Optional[Connection] = None
+        self.snapshot_id: Optional[str] = None
+
+    def is_snapshot_supported(self) -> bool:
+        """Check if snapshots can be shared between sessions
+
+        Returns:
+            bool: Whether snapshots can be shared between sessions
+        """
+        return self.engine.dialect.name == "postgresql"
+
+    def __enter__(self) -> "ConcurrentSessions":
+        """Export a snapshot if it is supported keeping the transaction that
+        exported it open
+
+        Returns:
+            ConcurrentSessions: ConcurrentSessions object
+        """
+        if not self.is_snapshot_supported():
+            return self
+        connection = self.engine.connect()
+        connection.execution_options(isolation_level="REPEATABLE READ")
+        connection.begin()
+        self.snapshot_connection = connection
+        self.snapshot_id = connection.execute(
+            text("SELECT pg_export_snapshot()")
+        ).scalar_one()
+        logger.info(f"Exported snapshot {self.snapshot_id}.")
+        return self
+
+    def release(self) -> None:
+        """Close the transaction that exported the snapshot if it is open. Sessions
+        that have already imported the snapshot keep reading from it.
+
+        Returns:
+            None
+        """
+        if self.snapshot_connection is not None:
+            self.snapshot_connection.close()
+            self.snapshot_connection = None
+            logger.info(f"Released snapshot {self.snapshot_id}.")
+
+    def __exit__(self, exc_type: Any, exc_value: Any, traceback: Any) -> None:
+        """Close the transaction that exported the snapshot if it is still open
+
+        Returns:
+            None
+        """
+        self.release()
+        self.snapshot_id = None
+
+    def connect(self) -> Connection:
+        """Get a connection that reads from the exported snapshot if there is one
+
+        Returns:
+            Connection: Connection
+        """
+        connection = self.engine.connect()
+        if self.snapshot_id is not None:
+            try:
+                connection.execution_options(isolation_level="REPEATABLE READ")
+                connection.begin()
+                connection.execute(
+                    text(f"SET TRANSACTION SNAPSHOT '{self.snapshot_id}'")
+                )
+            except BaseException:
+                connection.close()
+                raise
+        return connection
+
+    def run(
+        self, tasks: Dict[str, Callable[[Session], Any]]
+    ) -> Dict[str, Any]:
+        """Run tasks concurrently each with its own session. Once every task has
+        imported the snapshot, the transaction that exported it is released.
+
+        Args:
+            tasks (Dict[str, Callable[[Session], Any]]): Task name to function that takes a session
+
+        Returns:
+            Dict[str, Any]: Task name to return value of task
+        """
+        if not tasks:
+            return dict()
+        lock = Lock()
+        all_imported = Event()
+        remaining = [len(tasks)]
+
+        def run_task(task):
+            try:
+                connection = self.connect()
+            finally:
+                with lock:
+                    remaining[0] -= 1
+                    if remaining[0] == 0:
+                        all_imported.set()
+            try:
+                with Session(bind=connection) as session:
+                    return task(session)
+            finally:
+                connection.close()
+
+        max_workers = self.max_workers
+        if max_workers is None:
+            max_workers = len(tasks)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                name: executor.submit(run_task, task)
+                for name, task in tasks.items()
+            }
+            all_imported.wait()
+            self.release()
+            return {name: future.result() for name, future in futures.items()}
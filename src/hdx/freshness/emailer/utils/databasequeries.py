@@ -3,8 +3,21 @@
 import logging
 import re
 from collections import OrderedDict
+from copy import copy
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
 
 from hdx.freshness.database.dbdataset import DBDataset
 from hdx.freshness.database.dbinfodataset import DBInfoDataset
@@ -12,37 +25,126 @@ from hdx.freshness.database.dborganization import DBOrganization
 from hdx.freshness.database.dbresource import DBResource
 from hdx.freshness.database.dbrun import DBRun
 from hdx.freshness.utils.retrieval import Retrieval
-from sqlalchemy import func, select
+from hdx.utilities.dictandlist import dict_of_lists_add
+from sqlalchemy import (
+    BindParameter,
+    Row,
+    Select,
+    case,
+    func,
+    null,
+    or_,
+    select,
+)
 from sqlalchemy.orm import Session, aliased
 
+from .bulkloader import BulkLoader
+from .concurrentsessions import ConcurrentSessions
+from .dbtransition import DBTransition
 from .hdxhelper import HDXHelper
+from .historycache import HistoryCache
+from .queryprofiler import QueryProfiler
+from .records import DatasetRecord, ResourceRecord
+from .resultcache import ResultCache
+from .runcatalog import RunCatalog
+from .runsummaries import RunSummaries
+from .transitions import Transitions
 
 logger = logging.getLogger(__name__)
 
 
 class DatabaseQueries:
-    """A class that offers functions that query the freshness database
+    """A class that offers functions that query the freshness database. If
+    use_transitions is True, the transitions of the current run are added to a
+    sidecar table if they are not already there and the checks read the current
+    and previous run from that table instead of joining DBDataset with itself. If
+    bulk_load is True and the database is PostgreSQL, the current run is read using
+    COPY rather than row by row. If use_run_summaries is True, summaries of recent
+    runs are added to a sidecar table if they are not already there and the numbers
+    of datasets are read from that table. If partition_aware is True, run numbers
+    are rendered into statements as literals and tables are only joined on
+    run number via those literals, so that PostgreSQL can prune partitions of
+    tables partitioned by run number when planning. Queries that do not depend on each other can be
+    run concurrently using prefetch. If a QueryProfiler is given, every statement is
+    measured by it. If a ResultCache is given, the rows returned by statements are
+    read from it where possible instead of from the database. If a HistoryCache is
+    given, the history analyses of the reference period check read from it instead
+    of from the database, the cache being brought up to the current run the first
+    time it is used.
 
     Args:
         session (sqlalchemy.orm.Session): Session to use for queries
         now (datetime): Date to use for now
         hdxhelper (HDXHelper): HDX helper object
+        use_transitions (bool): Whether to use transitions table. Defaults to False.
+        bulk_load (bool): Whether to use COPY where supported. Defaults to False.
+        use_run_summaries (bool): Whether to use run summaries table. Defaults to False.
+        partition_aware (bool): Whether to render run numbers as literals. Defaults to False.
+        queryprofiler (Optional[QueryProfiler]): Profiler to measure statements. Defaults to None.
+        resultcache (Optional[ResultCache]): Cache of rows returned by statements. Defaults to None.
+        historycache (Optional[HistoryCache]): Cache of run history of datasets. Defaults to None.
     """
 
     format_mismatch_msg = "Format Mismatch"
     other_error_msg = "Server Error (may be temporary)"
+    batch_size = 500
+    yield_per = 1000
+    # SQL LIKE pattern that matches a superset of Retrieval.clienterror_regex
+    clienterror_like = "%_Client%Error %"
+    clienterror_pattern = re.compile(Retrieval.clienterror_regex)
+    prefetchable = ("snapshot", "number_datasets", "broken_resources")
 
-    def __init__(self, session: Session, now: datetime, hdxhelper: HDXHelper):
+    def __init__(
+        self,
+        session: Session,
+        now: datetime,
+        hdxhelper: HDXHelper,
+        use_transitions: bool = False,
+        bulk_load: bool = False,
+        use_run_summaries: bool = False,
+        partition_aware: bool = False,
+        queryprofiler: Optional[QueryProfiler] = None,
+        resultcache: Optional[ResultCache] = None,
+        historycache: Optional[HistoryCache] = None,
+    ):
         self.session = session
         self.now = now
         self.hdxhelper = hdxhelper
-        (
-            self.run_number_to_run_date,
-            self.run_numbers,
-        ) = self.get_cur_prev_runs()
+        self.partition_aware = partition_aware
+        self.queryprofiler = queryprofiler
+        self.resultcache = resultcache
+        self.historycache = historycache
+        self.historycache_updated = False
+        self.runcatalog = RunCatalog(session, now, partition_aware)
+        self.run_numbers = self.runcatalog.get_run_numbers()
         if len(self.run_numbers) < 2:
             logger.warning("Less than 2 runs!")
+        if use_transitions and len(self.run_numbers) != 0:
+            self.transitions = Transitions(session, self.runcatalog)
+            self.transitions.populate()
+        else:
+            self.transitions = None
+        if use_run_summaries and len(self.run_numbers) != 0:
+            self.runsummaries = RunSummaries(session, self.runcatalog)
+            self.runsummaries.populate()
+        else:
+            self.runsummaries = None
+        self.bulkloader = None
+        if bulk_load:
+            bulkloader = BulkLoader(session)
+            if bulkloader.is_supported():
+                self.bulkloader = bulkloader
+            else:
+                logger.info(
+                    "Bulk loading not supported so reading row by row."
+                )
+        self.snapshot = None
         self.datasets_modified_yesterday = None
+        self.error_msgs: Dict[str, Optional[str]] = dict()
+        self.snapshot_by_organization = None
+        self.status_transitions = None
+        self.valid_maintainer_ids: Dict[str, Set[str]] = dict()
+        self.prefetched: Dict[str, Any] = dict()
 
     def get_run_numbers(self) -> List[Tuple]:
         """Get run numbers as list of tuples of the form (run number, run date)
@@ -50,37 +152,396 @@ class DatabaseQueries:
         Returns:
              List[Tuple]: List of (run number, run date)
         """
-        return self.run_numbers
+        return self.runcatalog.get_run_numbers()
+
+    def copy_for_session(self, session: Session) -> "DatabaseQueries":
+        """Get a copy of this object that queries using another session. Cached
+        results and run summaries are not copied.
+
+        Args:
+            session (sqlalchemy.orm.Session): Session to use for queries
+
+        Returns:
+            DatabaseQueries: DatabaseQueries object that uses session
+        """
+        databasequeries = copy(self)
+        databasequeries.session = session
+        databasequeries.runsummaries = None
+        if self.bulkloader is not None:
+            databasequeries.bulkloader = BulkLoader(session)
+        databasequeries.snapshot = None
+        databasequeries.datasets_modified_yesterday = None
+        databasequeries.error_msgs = dict()
+        databasequeries.snapshot_by_organization = None
+        databasequeries.status_transitions = None
+        databasequeries.valid_maintainer_ids = dict()
+        databasequeries.prefetched = dict()
+        return databasequeries
+
+    def get_prefetch_tasks(self) -> Dict[str, Callable[[Session], Any]]:
+        """Get the functions that run each of the queries that can be prefetched
+        with a given session
+
+        Returns:
+            Dict[str, Callable[[Session], Any]]: Query name to function
+        """
+        return {
+            "snapshot": lambda session: self.copy_for_session(
+                session
+            ).get_snapshot(),
+            "number_datasets": lambda session: self.copy_for_session(
+                session
+            ).get_number_datasets(),
+            "broken_resources": lambda session: list(
+                self.copy_for_session(session).execute(
+                    "broken_resources", self.get_broken_resources_statement()
+                )
+            ),
+        }
+
+    def prefetch(
+        self,
+        names: Iterable[str] = prefetchable,
+        max_workers: Optional[int] = None,
+    ) -> None:
+        """Run queries that do not depend on each other concurrently, each with its
+        own session from the connection pool, and keep their results for the
+        checks. On PostgreSQL, the sessions share one snapshot so that the
+        prefetched results are consistent with each other. Results other than the
+        snapshot are used once.
+
+        Args:
+            names (Iterable[str]): Names of queries to run. Defaults to prefetchable.
+            max_workers (Optional[int]): Maximum number of threads. Defaults to None (one per query).
+
+        Returns:
+            None
+        """
+        no_runs = len(self.run_numbers)
+        if no_runs == 0:
+            return
+        prefetch_tasks = self.get_prefetch_tasks()
+        tasks = dict()
+        for name in names:
+            if name == "snapshot" and self.snapshot is not None:
+                continue
+            if name != "snapshot" and no_runs < 2:
+                continue
+            if name == "number_datasets" and self.runsummaries is not None:
+                continue
+            tasks[name] = prefetch_tasks[name]
+        if self.resultcache is not None:
+            # Read on this session before the tasks use the run states
+            self.get_run_states()
+        engine = self.session.get_bind()
+        with ConcurrentSessions(engine, max_workers) as concurrentsessions:
+            results = concurrentsessions.run(tasks)
+        snapshot = results.pop("snapshot", None)
+        if snapshot is not None:
+            self.snapshot = snapshot
+        self.prefetched.update(results)
+        logger.info(f"Prefetched {', '.join(tasks)}.")
+
+    def get_run_number(self, index: int = 0) -> Union[int, BindParameter]:
+        """Get the run number of the current (index 0) or previous (index 1) run for
+        use in a statement. In partition aware mode, it is rendered into the SQL as
+        a literal rather than sent as a parameter.
+
+        Args:
+            index (int): 0 for current run, 1 for previous run. Defaults to 0.
+
+        Returns:
+            Union[int, BindParameter]: Run number or literal run number
+        """
+        return self.runcatalog.get_literal(self.run_numbers[index][0])
+
+    def get_snapshot_table(self) -> Union[Type[DBDataset], Type[DBTransition]]:
+        """Get the table from which the datasets in the current run are read
+
+        Returns:
+            Union[Type[DBDataset], Type[DBTransition]]: DBTransition or DBDataset
+        """
+        if self.transitions is None:
+            return DBDataset
+        return DBTransition
+
+    @staticmethod
+    def get_dataset_columns(
+        dataset_table: Union[Type[DBDataset], Type[DBTransition]] = DBDataset
+    ) -> List:
+        """Get the columns that are read for each dataset in the current run. They
+        are in the same order as the arguments of DatasetRecord.
+
+        Args:
+            dataset_table (Union[Type[DBDataset], Type[DBTransition]]): Table with run information. Defaults to DBDataset.
+
+        Returns:
+            List: Dataset columns
+        """
+        return [
+            DBInfoDataset.id,
+            DBInfoDataset.name,
+            DBInfoDataset.title,
+            DBInfoDataset.maintainer,
+            DBOrganization.id.label("organization_id"),
+            DBOrganization.name.label("organization_name"),
+            DBOrganization.title.label("organization_title"),
+            dataset_table.dataset_date,
+            dataset_table.update_frequency,
+            dataset_table.latest_of_modifieds,
+            dataset_table.what_updated,
+            dataset_table.fresh,
+        ]
+
+    def get_snapshot_statement(self) -> Select:
+        """Get the statement that selects the datasets in the current run with their
+        freshness, what updated and reference period in the previous run. Requires
+        that there is at least one run.
+
+        Returns:
+            Select: Snapshot statement
+        """
+        if self.transitions is not None:
+            columns = self.get_dataset_columns(DBTransition)
+            columns.extend(
+                [
+                    DBTransition.prev_fresh,
+                    DBTransition.prev_what_updated,
+                    DBTransition.prev_dataset_date,
+                ]
+            )
+            return (
+                select(*columns)
+                .select_from(DBTransition)
+                .join(DBInfoDataset, DBTransition.id == DBInfoDataset.id)
+                .join(
+                    DBOrganization,
+                    DBInfoDataset.organization_id == DBOrganization.id,
+                )
+                .where(DBTransition.run_number == self.get_run_number(0))
+            )
+        columns = self.get_dataset_columns()
+        no_runs = len(self.run_numbers)
+        if no_runs >= 2:
+            DBDataset2 = aliased(DBDataset)
+            columns.extend(
+                [
+                    DBDataset2.fresh.label("prev_fresh"),
+                    DBDataset2.what_updated.label("prev_what_updated"),
+                    DBDataset2.dataset_date.label("prev_dataset_date"),
+                ]
+            )
+        else:
+            columns.extend(
+                [
+                    null().label("prev_fresh"),
+                    null().label("prev_what_updated"),
+                    null().label("prev_dataset_date"),
+                ]
+            )
+        statement = (
+            select(*columns)
+            .select_from(DBDataset)
+            .join(DBInfoDataset, DBDataset.id == DBInfoDataset.id)
+            .join(
+                DBOrganization,
+                DBInfoDataset.organization_id == DBOrganization.id,
+            )
+        )
+        if no_runs >= 2:
+            # select * from dbdatasets a left outer join dbdatasets b on a.id = b.id
+            # and b.run_number = previous where a.run_number = current;
+            statement = statement.outerjoin(
+                DBDataset2,
+                (DBDataset2.id == DBDataset.id)
+                & (DBDataset2.run_number == self.get_run_number(1)),
+            )
+        return statement.where(DBDataset.run_number == self.get_run_number(0))
+
+    def get_ordered_snapshot_statement(self) -> Select:
+        """Get the snapshot statement ordered by organisation title and dataset
+        name. On PostgreSQL, the C collation is used so that the order is the same
+        as sorting in Python. Requires that there is at least one run.
+
+        Returns:
+            Select: Ordered snapshot statement
+        """
+        statement = self.get_snapshot_statement()
+        columns = statement.selected_columns
+        order_by = [columns.organization_title, columns.name]
+        if self.session.get_bind().dialect.name == "postgresql":
+            order_by = [column.collate("C") for column in order_by]
+        return statement.order_by(*order_by, columns.id)
+
+    def execute(
+        self,
+        name: str,
+        statement: Select,
+        execution_options: Optional[Dict] = None,
+    ) -> Iterable[Row]:
+        """Execute a statement measuring it if there is a query profiler. If there
+        is a result cache, the rows are read from it if they are there.
+
+        Args:
+            name (str): Name of statement
+            statement (Select): Statement to execute
+            execution_options (Optional[Dict]): Execution options. Defaults to None.
+
+        Returns:
+            Iterable[Row]: Rows
+        """
+        if execution_options is None:
+            execution_options = dict()
+
+        def execute_statement():
+            if self.queryprofiler is None:
+                return self.session.execute(
+                    statement, execution_options=execution_options
+                )
+            return self.queryprofiler.execute(
+                self.session, name, statement, execution_options
+            )
+
+        return self.get_cached_rows(name, statement, execute_statement)
+
+    def load(self, name: str, statement: Select) -> Iterable[Tuple]:
+        """Bulk load the rows returned by a statement measuring it if there is a
+        query profiler. If there is a result cache, the rows are read from it if
+        they are there. Requires a bulk loader.
+
+        Args:
+            name (str): Name of statement
+            statement (Select): Statement to execute
+
+        Returns:
+            Iterable[Tuple]: Rows
+        """
+
+        def load_statement():
+            if self.queryprofiler is None:
+                columns = self.bulkloader.load(statement)
+            else:
+                columns = self.queryprofiler.load(
+                    self.bulkloader, name, statement
+                )
+            return zip(*columns.values())
+
+        return self.get_cached_rows(name, statement, load_statement)
+
+    def get_run_states(self) -> List[Tuple]:
+        """Get the states of the current and previous runs (see
+        RunCatalog.get_run_state)
+
+        Returns:
+            List[Tuple]: States of current and previous runs
+        """
+        return [
+            self.runcatalog.get_run_state(run_number)
+            for run_number, _ in self.run_numbers
+        ]
 
-    def get_cur_prev_runs(
+    def get_cached_rows(
         self,
-    ) -> Tuple[Dict[int, datetime], List[Tuple]]:
-        """Get run numbers in two forms in a tuple. the first form is a dictionary
-        from run number to run date. The second form is list of tuples of the form
-        (run number, run date)
-
-        Returns:
-             Tuple[Dict[int, datetime], List[Tuple]]:
-             (run number to run date, list of run numbers an run dates)
-        """
-        list_run_numbers = self.session.execute(
-            select(DBRun.run_number, DBRun.run_date)
-            .distinct()
-            .order_by(DBRun.run_number.desc())
-        ).all()
-        run_number_to_run_date = dict()
-        run_numbers = list()
-        last_ind = len(list_run_numbers) - 1
-        for i, run_number_date in enumerate(list_run_numbers):
-            run_no = run_number_date[0]
-            run_date = run_number_date[1]
-            run_number_to_run_date[run_no] = run_date
-            if not run_numbers and run_date < self.now:
-                if i == last_ind:
-                    run_numbers = [run_number_date]
-                else:
-                    run_numbers = [run_number_date, list_run_numbers[i + 1]]
-        return run_number_to_run_date, run_numbers
+        name: str,
+        statement: Select,
+        get_rows: Callable[[], Iterable],
+    ) -> Iterable:
+        """Get the rows returned by a statement from the result cache if there is
+        one, otherwise get them using the supplied function
+
+        Args:
+            name (str): Name of statement
+            statement (Select): Statement
+            get_rows (Callable[[], Iterable]): Function that gets rows from the database
+
+        Returns:
+            Iterable: Rows
+        """
+        if self.resultcache is None:
+            return get_rows()
+        return self.resultcache.get_rows(
+            name,
+            self.run_numbers,
+            self.get_run_states(),
+            statement,
+            self.session.get_bind().dialect,
+            get_rows,
+        )
+
+    def iter_rows(self, name: str, statement: Select) -> Iterator[Row]:
+        """Stream the rows returned by a statement. Rows are fetched in batches of
+        yield_per rows using a server side cursor where the database supports it,
+        so memory use is bounded by the batch size.
+
+        Args:
+            name (str): Name of statement
+            statement (Select): Statement to execute
+
+        Returns:
+            Iterator[Row]: Rows
+        """
+        yield from self.execute(
+            name, statement, execution_options={"yield_per": self.yield_per}
+        )
+
+    def iter_datasets(
+        self, name: str, statement: Select
+    ) -> Iterator[DatasetRecord]:
+        """Stream the datasets returned by a statement based on the snapshot
+        statement
+
+        Args:
+            name (str): Name of statement
+            statement (Select): Statement to execute
+
+        Returns:
+            Iterator[DatasetRecord]: Datasets
+        """
+        for row in self.iter_rows(name, statement):
+            yield DatasetRecord.from_row(row)
+
+    def get_snapshot(self) -> Dict[str, DatasetRecord]:
+        """Get a snapshot of the datasets in the current run including their
+        freshness, what updated and reference period in the previous run. The
+        snapshot is loaded with a single query the first time it is requested and
+        is then shared by all the checks that examine the current run.
+
+        Returns:
+            Dict[str, DatasetRecord]: Dataset id to dataset for the current run
+        """
+        if self.snapshot is not None:
+            return self.snapshot
+        snapshot = OrderedDict()
+        if len(self.run_numbers) == 0:
+            self.snapshot = snapshot
+            return snapshot
+        statement = self.get_snapshot_statement()
+        if self.bulkloader is None:
+            datasets = self.iter_datasets("snapshot", statement)
+        else:
+            rows = self.load("snapshot", statement)
+            datasets = map(DatasetRecord.from_row, rows)
+        for dataset in datasets:
+            snapshot[dataset.id] = dataset
+        logger.info(f"SQL query returned {len(snapshot)} rows.")
+        self.snapshot = snapshot
+        return snapshot
+
+    @staticmethod
+    def get_number_datasets_statement(
+        run_number: Union[int, BindParameter]
+    ) -> Select:
+        """Get the statement that counts the datasets in a run
+
+        Args:
+            run_number (Union[int, BindParameter]): Run number or literal run number
+
+        Returns:
+            Select: Number of datasets statement
+        """
+        return select(func.count(DBDataset.id)).where(
+            DBDataset.run_number == run_number
+        )
 
     def get_number_datasets(self) -> Tuple[int, int]:
         """Get the number of datasets today and yesterday in a tuple
@@ -88,17 +549,122 @@ class DatabaseQueries:
         Returns:
              Tuple[int, int]: (number of datasets today, number of datasets yesterday)
         """
-        datasets_today = self.session.execute(
-            select(func.count(DBDataset.id)).where(
-                DBDataset.run_number == self.run_numbers[0][0]
-            )
-        ).scalar_one()
-        datasets_previous = self.session.execute(
-            select(func.count(DBDataset.id)).where(
-                DBDataset.run_number == self.run_numbers[1][0]
+        number_datasets = self.prefetched.pop("number_datasets", None)
+        if number_datasets is not None:
+            return number_datasets
+        if self.runsummaries is not None:
+            return self.runsummaries.get_number_datasets()
+        number_datasets = list()
+        for index in range(2):
+            results = self.execute(
+                "number_datasets",
+                self.get_number_datasets_statement(self.get_run_number(index)),
             )
-        ).scalar_one()
-        return datasets_today, datasets_previous
+            for (count,) in results:
+                number_datasets.append(count)
+        return number_datasets[0], number_datasets[1]
+
+    def get_previous_number_datasets(self) -> List[int]:
+        """Get the number of datasets in each of the recent runs before the current
+        run ordered from newest to oldest. Requires run summaries, otherwise an
+        empty list is returned.
+
+        Returns:
+             List[int]: Number of datasets in each run
+        """
+        if self.runsummaries is None:
+            return list()
+        return self.runsummaries.get_previous_number_datasets()
+
+    def get_broken_filters(self) -> List:
+        """Get the filters that select resources in the current run with errors
+        that could be reported. Resources whose file is too large to hash and those
+        with server errors, which most of the time are temporary, are excluded in
+        the database. LIKE can be case insensitive (eg. in SQLite) so the filters
+        may match a superset of the errors that are reported.
+
+        Returns:
+            List: Filters on DBResource
+        """
+        error = DBResource.error
+        return [
+            DBResource.when_checked > self.run_numbers[1][1],
+            error.is_not(None),
+            error != Retrieval.toolargeerror,
+            or_(
+                error.contains(Retrieval.notmatcherror, autoescape=True),
+                error.like(self.clienterror_like),
+            ),
+        ]
+
+    def get_format_mismatch_column(self):
+        """Get a column that is true if the resource error is a format mismatch
+
+        Returns:
+            Column that is true for format mismatch errors
+        """
+        return case(
+            (
+                DBResource.error.contains(
+                    Retrieval.notmatcherror, autoescape=True
+                ),
+                True,
+            ),
+            else_=False,
+        ).label("format_mismatch")
+
+    def get_error_msg(
+        self, error: str, format_mismatch: bool = False
+    ) -> Optional[str]:
+        """Get the error message under which a resource error is reported or None
+        if the error should not be reported (eg. file too large to hash or a server
+        error which most of the time is temporary). Results are memoised by error.
+
+        Args:
+            error (str): Resource error
+            format_mismatch (bool): Whether the database classified the error as a format mismatch. Defaults to False.
+
+        Returns:
+            Optional[str]: Error message or None
+        """
+        # the database classification is confirmed as LIKE can be case insensitive
+        if format_mismatch and Retrieval.notmatcherror in error:
+            return self.format_mismatch_msg
+        if error in self.error_msgs:
+            return self.error_msgs[error]
+        if error == Retrieval.toolargeerror:
+            error_msg = None
+        elif Retrieval.notmatcherror in error:
+            error_msg = self.format_mismatch_msg
+        else:
+            match_error = self.clienterror_pattern.search(error)
+            if match_error:
+                error_msg = match_error.group(0)[1:-1]
+            else:
+                # some sort of Server Error which most of the time is temporary
+                # so ignore
+                error_msg = None
+        self.error_msgs[error] = error_msg
+        return error_msg
+
+    def get_broken_resources_statement(self) -> Select:
+        """Get the statement that selects the resources in the current run with
+        errors that could be reported. Requires that there are at least two runs.
+
+        Returns:
+            Select: Broken resources statement
+        """
+        columns = [
+            DBResource.id,
+            DBResource.name,
+            DBResource.dataset_id,
+            DBResource.error,
+            self.get_format_mismatch_column(),
+        ]
+        filters = [
+            DBResource.run_number == self.get_run_number(0)
+        ] + self.get_broken_filters()
+        return select(*columns).where(*filters)
 
     def get_broken(self) -> Dict[str, Dict]:
         """Get dateset information categorised by error message
@@ -109,263 +675,296 @@ class DatabaseQueries:
         datasets = dict()
         if len(self.run_numbers) == 0:
             return datasets
-        columns = [
-            DBResource.id.label("resource_id"),
-            DBResource.name.label("resource_name"),
-            DBResource.dataset_id.label("id"),
-            DBResource.error,
-            DBInfoDataset.name,
-            DBInfoDataset.title,
-            DBInfoDataset.maintainer,
-            DBOrganization.id.label("organization_id"),
-            DBOrganization.title.label("organization_title"),
-            DBDataset.update_frequency,
-            DBDataset.latest_of_modifieds,
-            DBDataset.what_updated,
-            DBDataset.fresh,
-        ]
-        filters = [
-            DBResource.dataset_id == DBInfoDataset.id,
-            DBInfoDataset.organization_id == DBOrganization.id,
-            DBResource.dataset_id == DBDataset.id,
-            DBDataset.run_number == self.run_numbers[0][0],
-            DBResource.run_number == DBDataset.run_number,
-            DBResource.error.is_not(None),
-            DBResource.when_checked > self.run_numbers[1][1],
-        ]
-        results = self.session.execute(select(*columns).where(*filters))
+        snapshot = self.get_snapshot()
+        results = self.prefetched.pop("broken_resources", None)
+        if results is None:
+            results = self.execute(
+                "broken_resources", self.get_broken_resources_statement()
+            )
         norows = 0
-        for norows, result in enumerate(results):
-            row = dict()
-            for i, column in enumerate(columns):
-                row[column.key] = result[i]
-            error = row["error"]
-            if error == Retrieval.toolargeerror:
+        for result in results:
+            norows += 1
+            (
+                resource_id,
+                resource_name,
+                dataset_id,
+                error,
+                format_mismatch,
+            ) = result
+            snapshot_dataset = snapshot.get(dataset_id)
+            if snapshot_dataset is None:
+                continue
+            error_msg = self.get_error_msg(error, format_mismatch)
+            if error_msg is None:
                 continue
-            if Retrieval.notmatcherror in error:
-                error_msg = self.format_mismatch_msg
-            else:
-                match_error = re.search(Retrieval.clienterror_regex, error)
-                if match_error:
-                    error_msg = match_error.group(0)[1:-1]
-                else:
-                    # some sort of Server Error which most of the time is temporary so ignore
-                    continue
             datasets_error = datasets.get(error_msg, dict())
             datasets[error_msg] = datasets_error
 
-            org_title = row["organization_title"]
+            org_title = snapshot_dataset.organization_title
             org = datasets_error.get(org_title, dict())
             datasets_error[org_title] = org
 
-            dataset_name = row["name"]
-            dataset = org.get(dataset_name, dict())
-            org[dataset_name] = dataset
-
-            resources = dataset.get("resources", list())
-            dataset["resources"] = resources
+            dataset_name = snapshot_dataset.name
+            dataset = org.get(dataset_name)
+            if dataset is None:
+                dataset = snapshot_dataset.with_resources()
+                org[dataset_name] = dataset
 
-            resource = {
-                "id": row["resource_id"],
-                "name": row["resource_name"],
-                "error": error,
-            }
-            resources.append(resource)
-            del row["resource_id"]
-            del row["resource_name"]
-            del row["error"]
-            dataset.update(row)
+            resource = ResourceRecord(resource_id, resource_name, error)
+            dataset.resources.append(resource)
 
         logger.info(f"SQL query returned {norows} rows.")
         return datasets
 
-    def get_status(self, status: int) -> List[Dict]:
+    def get_status_dataset(
+        self, dataset: DatasetRecord, status: int
+    ) -> Optional[DatasetRecord]:
+        """Get a copy of the dataset if it has changed into the given freshness
+        status since the previous run (or has the status if there is only one run)
+        or None if it has not. If nothing was updated in the current run, what
+        updated is taken from the previous run.
+
+        Args:
+            dataset (DatasetRecord): Dataset from the snapshot
+            status (int): Freshness status
+
+        Returns:
+            Optional[DatasetRecord]: Copy of dataset or None
+        """
+        if dataset.fresh != status:
+            return None
+        if len(self.run_numbers) < 2:
+            return dataset.copy()
+        if dataset.prev_fresh != status - 1:
+            return None
+        dataset = dataset.copy()
+        if dataset.what_updated == "nothing":
+            dataset.what_updated = dataset.prev_what_updated
+        return dataset
+
+    def get_status_transitions(
+        self, statuses: Iterable[int] = (1, 2, 3)
+    ) -> Dict[int, List[DatasetRecord]]:
+        """Get datasets for the given freshness statuses (0=fresh, 1=due,
+        2=overdue, 3=delinquent) grouped by status. If there is a previous run, only
+        datasets that have changed into a status since that run are returned eg.
+        fresh to due, due to overdue and overdue to delinquent. The transitions for
+        all statuses are worked out in one pass over the snapshot the first time
+        they are requested.
+
+        Args:
+            statuses (Iterable[int]): Freshness statuses. Defaults to (1, 2, 3).
+
+        Returns:
+            Dict[int, List[DatasetRecord]]: Freshness status to list of datasets
+        """
+        if self.status_transitions is None:
+            status_transitions = dict()
+            if len(self.run_numbers) != 0:
+                for snapshot_dataset in self.get_snapshot().values():
+                    status = snapshot_dataset.fresh
+                    if status is None:
+                        continue
+                    dataset = self.get_status_dataset(snapshot_dataset, status)
+                    if dataset is not None:
+                        dict_of_lists_add(status_transitions, status, dataset)
+            self.status_transitions = status_transitions
+        datasets_by_status = dict()
+        for status in statuses:
+            datasets_by_status[status] = [
+                dataset.copy()
+                for dataset in self.status_transitions.get(status, [])
+            ]
+        return datasets_by_status
+
+    def get_status(self, status: int) -> List[DatasetRecord]:
         """Get datasets for a given freshness status (0=fresh, 1=due, 2=overdue,
-        3=delinquent)
+        3=delinquent). If there is a previous run, only datasets that have changed
+        into the given status since that run are returned.
 
         Args:
             status (int): Freshness status
 
         Returns:
-            List[Dict]: List of datasets for a given freshness status
+            List[DatasetRecord]: List of datasets for a given freshness status
         """
-        datasets = list()
-        no_runs = len(self.run_numbers)
-        if no_runs == 0:
-            return datasets
-        columns = [
-            DBInfoDataset.id,
-            DBInfoDataset.name,
-            DBInfoDataset.title,
-            DBInfoDataset.maintainer,
-            DBOrganization.id.label("organization_id"),
-            DBOrganization.title.label("organization_title"),
-            DBDataset.update_frequency,
-            DBDataset.latest_of_modifieds,
-            DBDataset.what_updated,
-        ]
-        filters = [
-            DBDataset.id == DBInfoDataset.id,
-            DBInfoDataset.organization_id == DBOrganization.id,
-            DBDataset.fresh == status,
-            DBDataset.run_number == self.run_numbers[0][0],
-        ]
-        if no_runs >= 2:
-            # select * from dbdatasets a, dbdatasets b where a.id = b.id and a.fresh = status and a.run_number = 1 and
-            # b.fresh = status - 1 and b.run_number = 0;
-            DBDataset2 = aliased(DBDataset)
-            columns.append(DBDataset2.what_updated.label("prev_what_updated"))
-            filters.extend(
-                [
-                    DBDataset.id == DBDataset2.id,
-                    DBDataset2.fresh == status - 1,
-                    DBDataset2.run_number == self.run_numbers[1][0],
-                ]
+        return self.get_status_transitions((status,))[status]
+
+    def get_status_statement(self, status: int) -> Select:
+        """Get the statement that selects the datasets in the current run that have
+        changed into the given freshness status since the previous run (or have the
+        status if there is only one run) ordered by organisation title and dataset
+        name. Requires that there is at least one run.
+
+        Args:
+            status (int): Freshness status
+
+        Returns:
+            Select: Status statement
+        """
+        statement = self.get_ordered_snapshot_statement()
+        columns = statement.selected_columns
+        statement = statement.where(columns.fresh == status)
+        if len(self.run_numbers) >= 2:
+            statement = statement.where(columns.prev_fresh == status - 1)
+        return statement
+
+    def iter_status(self, status: int) -> Iterator[DatasetRecord]:
+        """Stream datasets for a given freshness status (0=fresh, 1=due, 2=overdue,
+        3=delinquent) ordered by organisation title and dataset name. If there is a
+        previous run, only datasets that have changed into the given status since
+        that run are returned. If the snapshot has already been loaded, the
+        datasets are taken from it, otherwise they are streamed from the database
+        in batches so that memory use does not grow with the size of the run.
+
+        Args:
+            status (int): Freshness status
+
+        Returns:
+            Iterator[DatasetRecord]: Datasets for a given freshness status
+        """
+        if len(self.run_numbers) == 0:
+            return
+        if self.snapshot is not None:
+            yield from sorted(
+                self.get_status(status),
+                key=lambda d: (d.organization_title, d.name),
             )
-        results = self.session.execute(select(*columns).where(*filters))
-        norows = 0
-        for norows, result in enumerate(results):
-            dataset = dict()
-            for i, column in enumerate(columns):
-                dataset[column.key] = result[i]
-            if dataset["what_updated"] == "nothing":
-                dataset["what_updated"] = dataset["prev_what_updated"]
-            del dataset["prev_what_updated"]
-            datasets.append(dataset)
+            return
+        statement = self.get_status_statement(status)
+        for dataset in self.iter_datasets("status", statement):
+            dataset = self.get_status_dataset(dataset, status)
+            if dataset is not None:
+                yield dataset
 
-        logger.info(f"SQL query returned {norows} rows.")
-        return datasets
+    def get_snapshot_by_organization(self) -> Dict[str, List[DatasetRecord]]:
+        """Get the datasets in the snapshot grouped by organisation id
+
+        Returns:
+            Dict[str, List[DatasetRecord]]: Organisation id to datasets
+        """
+        if self.snapshot_by_organization is not None:
+            return self.snapshot_by_organization
+        snapshot_by_organization = OrderedDict()
+        for dataset in self.get_snapshot().values():
+            dict_of_lists_add(
+                snapshot_by_organization, dataset.organization_id, dataset
+            )
+        self.snapshot_by_organization = snapshot_by_organization
+        return snapshot_by_organization
+
+    def get_valid_maintainer_ids(self, organization_id: str) -> Set[str]:
+        """Get the ids of the users who can be maintainers of datasets in the
+        organisation ie. its administrators and editors and system administrators
+
+        Args:
+            organization_id (str): Organisation id
+
+        Returns:
+            Set[str]: Ids of valid maintainers
+        """
+        valid_maintainer_ids = self.valid_maintainer_ids.get(organization_id)
+        if valid_maintainer_ids is not None:
+            return valid_maintainer_ids
+        directory = self.hdxhelper.directory
+        indices = directory.get_role_indices(
+            organization_id, "admin", "editor"
+        )
+        valid_maintainer_ids = set(
+            directory.get_user_ids(indices.union(directory.sysadmin_indices))
+        )
+        self.valid_maintainer_ids[organization_id] = valid_maintainer_ids
+        return valid_maintainer_ids
+
+    def get_orgadmins_error(self, organization_id: str) -> Optional[str]:
+        """Get the error with the administrators of the organisation or None if
+        they are valid
+
+        Args:
+            organization_id (str): Organisation id
+
+        Returns:
+            Optional[str]: Error or None
+        """
+        directory = self.hdxhelper.directory
+        admins = directory.get_role_ids(organization_id, "admin")
+        if not admins:
+            return "No org admins defined!"
+        all_sysadmins = True
+        nonexistantids = list()
+        for adminid in admins:
+            admin = directory.get_user(adminid)
+            if not admin:
+                nonexistantids.append(adminid)
+            else:
+                if admin["sysadmin"] is False:
+                    all_sysadmins = False
+        if nonexistantids:
+            return f"The following org admins do not exist: {', '.join(nonexistantids)}!"
+        if all_sysadmins:
+            return "All org admins are sysadmins!"
+        return None
 
     def get_invalid_maintainer_orgadmins(
         self,
-    ) -> Tuple[List[Dict], Dict[str, Dict]]:
+    ) -> Tuple[List[DatasetRecord], Dict[str, Dict]]:
         """Get datasets with invalid maintainer and organisations with invalid
-        administrators
+        administrators. The administrators of each organisation are checked once
+        and invalid maintainers are found per organisation by removing its valid
+        maintainers from the maintainers of its datasets.
 
         Returns:
-            Tuple[List[Dict], Dict[str, Dict]]: (Datasets with invalid maintainer,
-            organisations with invalid administrators)
+            Tuple[List[DatasetRecord], Dict[str, Dict]]: (Datasets with invalid
+            maintainer, organisations with invalid administrators)
         """
         invalid_maintainers = list()
         invalid_orgadmins = dict()
         no_runs = len(self.run_numbers)
         if no_runs == 0:
             return invalid_maintainers, invalid_orgadmins
-        columns = [
-            DBInfoDataset.id,
-            DBInfoDataset.name,
-            DBInfoDataset.title,
-            DBInfoDataset.maintainer,
-            DBOrganization.id.label("organization_id"),
-            DBOrganization.name.label("organization_name"),
-            DBOrganization.title.label("organization_title"),
-            DBDataset.update_frequency,
-            DBDataset.latest_of_modifieds,
-            DBDataset.what_updated,
-        ]
-        filters = [
-            DBDataset.id == DBInfoDataset.id,
-            DBInfoDataset.organization_id == DBOrganization.id,
-            DBDataset.run_number == self.run_numbers[0][0],
-        ]
-        results = self.session.execute(select(*columns).where(*filters))
-        norows = 0
-        for norows, result in enumerate(results):
-            dataset = dict()
-            for i, column in enumerate(columns):
-                dataset[column.key] = result[i]
-            maintainer_id = dataset["maintainer"]
-            organization_id = dataset["organization_id"]
-            organization_name = dataset["organization_name"]
-            organization = self.hdxhelper.organizations[organization_id]
-            admins = organization.get("admin")
-
-            def get_orginfo(error):
-                return {
+        snapshot_by_organization = self.get_snapshot_by_organization()
+        for organization_id, datasets in snapshot_by_organization.items():
+            dataset = datasets[0]
+            error = self.get_orgadmins_error(organization_id)
+            if error:
+                invalid_orgadmins[dataset.organization_name] = {
                     "id": organization_id,
-                    "name": organization_name,
-                    "title": dataset["organization_title"],
+                    "name": dataset.organization_name,
+                    "title": dataset.organization_title,
                     "error": error,
                 }
-
-            if admins:
-                all_sysadmins = True
-                nonexistantids = list()
-                for adminid in admins:
-                    admin = self.hdxhelper.users.get(adminid)
-                    if not admin:
-                        nonexistantids.append(adminid)
-                    else:
-                        if admin["sysadmin"] is False:
-                            all_sysadmins = False
-                if nonexistantids:
-                    invalid_orgadmins[organization_name] = get_orginfo(
-                        f"The following org admins do not exist: {', '.join(nonexistantids)}!"
-                    )
-                elif all_sysadmins:
-                    invalid_orgadmins[organization_name] = get_orginfo(
-                        "All org admins are sysadmins!"
-                    )
-                if maintainer_id in admins:
-                    continue
-            else:
-                invalid_orgadmins[organization_name] = get_orginfo(
-                    "No org admins defined!"
-                )
-            editors = organization.get("editor", [])
-            if maintainer_id in editors:
-                continue
-            if maintainer_id in self.hdxhelper.sysadmins:
+            maintainer_ids = {dataset.maintainer for dataset in datasets}
+            invalid_maintainer_ids = maintainer_ids.difference(
+                self.get_valid_maintainer_ids(organization_id)
+            )
+            if not invalid_maintainer_ids:
                 continue
-            invalid_maintainers.append(dataset)
-
-        logger.info(f"SQL query returned {norows} rows.")
+            for dataset in datasets:
+                if dataset.maintainer in invalid_maintainer_ids:
+                    invalid_maintainers.append(dataset.copy())
         return invalid_maintainers, invalid_orgadmins
 
-    def get_datasets_noresources(self) -> List[Dict]:
+    def get_datasets_noresources(self) -> List[DatasetRecord]:
         """Get datasets with no resources
 
         Returns:
-            List[Dict]: Datasets with no resources
+            List[DatasetRecord]: Datasets with no resources
         """
         datasets_noresources = list()
         no_runs = len(self.run_numbers)
         if no_runs == 0:
             return datasets_noresources
-        columns = [
-            DBInfoDataset.id,
-            DBInfoDataset.name,
-            DBInfoDataset.title,
-            DBInfoDataset.maintainer,
-            DBOrganization.id.label("organization_id"),
-            DBOrganization.name.label("organization_name"),
-            DBOrganization.title.label("organization_title"),
-            DBDataset.update_frequency,
-            DBDataset.latest_of_modifieds,
-            DBDataset.what_updated,
-        ]
-        filters = [
-            DBDataset.id == DBInfoDataset.id,
-            DBInfoDataset.organization_id == DBOrganization.id,
-            DBDataset.run_number == self.run_numbers[0][0],
-            DBDataset.what_updated == "no resources",
-        ]
-        results = self.session.execute(select(*columns).where(*filters))
-        norows = 0
-        for norows, result in enumerate(results):
-            dataset = dict()
-            for i, column in enumerate(columns):
-                dataset[column.key] = result[i]
-            datasets_noresources.append(dataset)
-
-        logger.info(f"SQL query returned {norows} rows.")
+        for snapshot_dataset in self.get_snapshot().values():
+            if snapshot_dataset.what_updated != "no resources":
+                continue
+            datasets_noresources.append(snapshot_dataset.copy())
         return datasets_noresources
 
-    def get_datasets_modified_yesterday(self) -> Dict[str, Dict]:
+    def get_datasets_modified_yesterday(self) -> Dict[str, DatasetRecord]:
         """Get datasets modified yesterday
 
         Returns:
-            Dict[str, Dict]: Datasets modified yesterday
+            Dict[str, DatasetRecord]: Datasets modified yesterday
         """
         if self.datasets_modified_yesterday is not None:
             return self.datasets_modified_yesterday
@@ -373,103 +972,272 @@ class DatabaseQueries:
         no_runs = len(self.run_numbers)
         if no_runs < 2:
             return datasets
-        columns = [
-            DBInfoDataset.id,
-            DBInfoDataset.name,
-            DBInfoDataset.title,
-            DBInfoDataset.maintainer,
-            DBOrganization.id.label("organization_id"),
-            DBOrganization.name.label("organization_name"),
-            DBOrganization.title.label("organization_title"),
-            DBDataset.dataset_date,
-            DBDataset.update_frequency,
-            DBDataset.latest_of_modifieds,
-            DBDataset.what_updated,
-        ]
-        filters = [
-            DBDataset.id == DBInfoDataset.id,
-            DBInfoDataset.organization_id == DBOrganization.id,
-            DBDataset.run_number == self.run_numbers[0][0],
-            DBDataset.latest_of_modifieds > self.run_numbers[1][1],
-        ]
-        results = self.session.execute(select(*columns).where(*filters))
-        norows = 0
-        for norows, result in enumerate(results):
-            dataset = dict()
-            for i, column in enumerate(columns):
-                dataset[column.key] = result[i]
-            datasets[dataset["id"]] = dataset
-        logger.info(f"SQL query returned {norows} rows.")
+        prev_run_date = self.run_numbers[1][1]
+        for dataset_id, snapshot_dataset in self.get_snapshot().items():
+            if snapshot_dataset.latest_of_modifieds > prev_run_date:
+                datasets[dataset_id] = snapshot_dataset.copy()
         self.datasets_modified_yesterday = datasets
         return datasets
 
-    def get_datasets_reference_period(self) -> List[Dict]:
-        """Get datasets with a reference period that could be due for update
+    def get_dataset_date_last_changed_statement(
+        self, dataset_ids: List[str]
+    ) -> Select:
+        """Get the statement that selects the date of the run in which the
+        reference period of each given dataset last changed
+
+        Args:
+            dataset_ids (List[str]): Dataset ids
+
+        Returns:
+            Select: Reference period last changed statement
+        """
+        window = {
+            "partition_by": DBDataset.id,
+            "order_by": DBDataset.run_number,
+        }
+        history = (
+            select(
+                DBDataset.id,
+                DBDataset.run_number,
+                DBDataset.dataset_date,
+                func.lag(DBDataset.dataset_date)
+                .over(**window)
+                .label("prev_dataset_date"),
+                func.row_number().over(**window).label("row_number"),
+            )
+            .where(
+                DBDataset.id.in_(dataset_ids),
+                DBDataset.run_number <= self.get_run_number(0),
+            )
+            .subquery()
+        )
+        changes = (
+            select(
+                history.c.id,
+                func.max(history.c.run_number).label("run_number"),
+            )
+            .where(
+                or_(
+                    history.c.row_number == 1,
+                    history.c.dataset_date.is_distinct_from(
+                        history.c.prev_dataset_date
+                    ),
+                )
+            )
+            .group_by(history.c.id)
+            .subquery()
+        )
+        return select(changes.c.id, DBRun.run_date).join(
+            DBRun, DBRun.run_number == changes.c.run_number
+        )
+
+    def get_historycache(self) -> Optional[HistoryCache]:
+        """Get the history cache if there is one, appending the runs up to the
+        current run to it the first time it is requested.
+
+        Returns:
+            Optional[HistoryCache]: Cache of run history of datasets or None
+        """
+        if self.historycache is not None and not self.historycache_updated:
+            self.historycache.update(self.session, self.runcatalog)
+            self.historycache_updated = True
+        return self.historycache
+
+    def get_dataset_date_last_changed(
+        self, dataset_ids: List[str]
+    ) -> Dict[str, datetime]:
+        """Get the date of the run in which the reference period of each given
+        dataset last changed (or the dataset first appeared if it never changed).
+        This is computed for all the datasets at once using window functions
+        partitioned by dataset id.
+
+        Args:
+            dataset_ids (List[str]): Dataset ids
+
+        Returns:
+            Dict[str, datetime]: Dataset id to run date of last reference period change
+        """
+        historycache = self.get_historycache()
+        if historycache is not None:
+            return historycache.get_dataset_date_last_changed(
+                dataset_ids, self.run_numbers[0][0]
+            )
+        last_changed = dict()
+        for i in range(0, len(dataset_ids), self.batch_size):
+            batch = dataset_ids[i : i + self.batch_size]
+            results = self.execute(
+                "dataset_date_last_changed",
+                self.get_dataset_date_last_changed_statement(batch),
+            )
+            for dataset_id, run_date in results:
+                last_changed[dataset_id] = run_date
+        return last_changed
+
+    def get_update_regularity_statement(
+        self, dataset_ids: List[str]
+    ) -> Select:
+        """Get the statement that selects the updates of each given dataset after
+        its first run along with the run date and update frequency ordered by
+        dataset id and most recent run first
+
+        Args:
+            dataset_ids (List[str]): Dataset ids
+
+        Returns:
+            Select: Update regularity statement
+        """
+        history = (
+            select(
+                DBDataset.id,
+                DBDataset.run_number,
+                DBDataset.update_frequency,
+                DBDataset.what_updated,
+                func.row_number()
+                .over(
+                    partition_by=DBDataset.id,
+                    order_by=DBDataset.run_number,
+                )
+                .label("row_number"),
+            )
+            .where(
+                DBDataset.id.in_(dataset_ids),
+                DBDataset.run_number <= self.get_run_number(0),
+            )
+            .subquery()
+        )
+        return (
+            select(history.c.id, DBRun.run_date, history.c.update_frequency)
+            .join(DBRun, DBRun.run_number == history.c.run_number)
+            .where(
+                history.c.row_number > 1,
+                history.c.what_updated != "nothing",
+            )
+            .order_by(history.c.id, history.c.run_number.desc())
+        )
+
+    def iter_updates(
+        self, dataset_ids: List[str]
+    ) -> Iterator[Tuple[str, datetime, Optional[int]]]:
+        """Get the updates of each given dataset after its first run along with
+        the run date and update frequency. The updates of each dataset are together
+        with the most recent run first.
+
+        Args:
+            dataset_ids (List[str]): Dataset ids
+
+        Returns:
+            Iterator[Tuple[str, datetime, Optional[int]]]: (id, run date, update frequency)
+        """
+        historycache = self.get_historycache()
+        if historycache is not None:
+            yield from historycache.get_updates(
+                dataset_ids, self.run_numbers[0][0]
+            )
+            return
+        for i in range(0, len(dataset_ids), self.batch_size):
+            batch = dataset_ids[i : i + self.batch_size]
+            yield from self.execute(
+                "update_regularity",
+                self.get_update_regularity_statement(batch),
+            )
+
+    def get_update_regularity(
+        self, datasets: Dict[str, DatasetRecord]
+    ) -> Dict[str, float]:
+        """Get the proportion of updates of each given dataset that happened within
+        its update frequency of the following update (or now for the latest update).
+        The updates of all the datasets are retrieved at once using window functions
+        partitioned by dataset id.
+
+        Args:
+            datasets (Dict[str, DatasetRecord]): Dataset id to dataset
 
         Returns:
-            List[Dict]: Datasets with a reference period that could be due for update
+            Dict[str, float]: Dataset id to proportion of updates within update frequency
+        """
+        dataset_ids = list(datasets.keys())
+        number_of_updates = dict()
+        number_of_updates_within_uf = dict()
+        prevdates = dict()
+        for dataset_id, run_date, update_frequency in self.iter_updates(
+            dataset_ids
+        ):
+            prevdate = prevdates.get(dataset_id, self.now)
+            number_of_updates[dataset_id] = (
+                number_of_updates.get(dataset_id, 0) + 1
+            )
+            within_uf = number_of_updates_within_uf.get(dataset_id, 0)
+            if update_frequency is not None:
+                if prevdate - run_date < timedelta(days=update_frequency):
+                    within_uf += 1
+            number_of_updates_within_uf[dataset_id] = within_uf
+            prevdates[dataset_id] = run_date
+        regularity = dict()
+        for dataset_id, updates in number_of_updates.items():
+            regularity[dataset_id] = (
+                number_of_updates_within_uf[dataset_id] / updates
+            )
+        return regularity
+
+    def get_datasets_reference_period(self) -> List[DatasetRecord]:
+        """Get datasets with a reference period that could be due for update. These
+        are datasets modified yesterday with a reference period that has not changed
+        within their update frequency despite them being updated regularly.
+
+        Returns:
+            List[DatasetRecord]: Datasets with a reference period that could be due for update
         """
         datasets = self.get_datasets_modified_yesterday()
         dataset_ids = list()
         for dataset_id, dataset in datasets.items():
-            if "*" in dataset["dataset_date"]:
+            dataset_date = dataset.dataset_date
+            if not dataset_date or "*" in dataset_date:
                 continue
-            if dataset["update_frequency"] <= 0:
+            update_frequency = dataset.update_frequency
+            if update_frequency is None or update_frequency <= 0:
+                continue
+            if dataset_date != dataset.prev_dataset_date:
                 continue
             dataset_ids.append(dataset_id)
-        columns = [DBDataset.id, DBDataset.dataset_date]
-        filters = [
-            DBDataset.id.in_(dataset_ids),
-            DBDataset.run_number == self.run_numbers[1][0],
-        ]
-        results = self.session.execute(select(*columns).where(*filters))
-        norows = 0
-        unchanged_dsdates_datasets = list()
-        for norows, result in enumerate(results):
-            dataset_id = result.id
-            if result.dataset_date == datasets[dataset_id]["dataset_date"]:
-                unchanged_dsdates_datasets.append(dataset_id)
-        logger.info(f"SQL query returned {norows} rows.")
-        DBDataset2 = aliased(DBDataset)
-        dsdates_not_changed_within_uf = list()
-        for dataset_id in unchanged_dsdates_datasets:
-            filters = [
-                DBDataset.id == dataset_id,
-                DBDataset2.id == DBDataset.id,
-                DBDataset2.run_number == DBDataset.run_number - 1,
-                DBDataset.dataset_date != DBDataset2.dataset_date,
-            ]
-            result = self.session.scalar(
-                select(DBDataset.run_number)
-                .where(*filters)
-                .order_by(DBDataset.run_number.desc())
-                .limit(1)
-            )
-            delta = self.now - self.run_number_to_run_date[result.run_number]
-            if delta > timedelta(
-                days=datasets[dataset_id]["update_frequency"]
-            ):
-                dsdates_not_changed_within_uf.append(dataset_id)
+        last_changed = self.get_dataset_date_last_changed(dataset_ids)
+        dsdates_not_changed_within_uf = dict()
+        for dataset_id in dataset_ids:
+            dataset = datasets[dataset_id]
+            run_date = last_changed.get(dataset_id)
+            if run_date is None:
+                continue
+            delta = self.now - run_date
+            if delta > timedelta(days=dataset.update_frequency):
+                dsdates_not_changed_within_uf[dataset_id] = dataset
+        regularity = self.get_update_regularity(dsdates_not_changed_within_uf)
         datasets_dataset_date = list()
-        for dataset_id in dsdates_not_changed_within_uf:
-            columns = [DBDataset.run_number, DBDataset.update_frequency]
-            filters = [
-                DBDataset.id == dataset_id,
-                DBDataset2.id == DBDataset.id,
-                DBDataset2.run_number == DBDataset.run_number - 1,
-                DBDataset.what_updated != "nothing",
-            ]
-            results = self.session.execute(select(*columns).where(*filters))
-            prevdate = self.now
-            number_of_updates = 0
-            number_of_updates_within_uf = 0
-            for number_of_updates, result in enumerate(results):
-                run_date = self.run_number_to_run_date[result.run_number]
-                delta = prevdate - run_date
-                if delta < timedelta(days=result.update_frequency):
-                    number_of_updates_within_uf += 1
-                prevdate = run_date
-            if number_of_updates_within_uf / number_of_updates < 0.8:
+        for dataset_id, dataset in dsdates_not_changed_within_uf.items():
+            if regularity.get(dataset_id, 0) < 0.8:
                 continue
-            datasets_dataset_date.append(datasets[dataset_id])
+            datasets_dataset_date.append(dataset)
         return datasets_dataset_date
+
+    def get_statements(self) -> Dict[str, Select]:
+        """Get the statements that are executed by the checks so that they can be
+        examined (eg. with EXPLAIN). Statements that filter on dataset ids use the
+        first batch of dataset ids in the snapshot. Requires that there are at least
+        two runs.
+
+        Returns:
+            Dict[str, Select]: Statement name to statement
+        """
+        dataset_ids = list(self.get_snapshot().keys())[: self.batch_size]
+        return {
+            "number_datasets": self.get_number_datasets_statement(
+                self.get_run_number(0)
+            ),
+            "snapshot": self.get_snapshot_statement(),
+            "broken_resources": self.get_broken_resources_statement(),
+            "status": self.get_status_statement(2),
+            "dataset_date_last_changed": self.get_dataset_date_last_changed_statement(
+                dataset_ids
+            ),
+            "update_regularity": self.get_update_regularity_statement(
+                dataset_ids
+            ),
+        }
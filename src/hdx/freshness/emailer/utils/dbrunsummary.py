@@ -0,0 +1,56 @@
+"""SQLAlchemy class representing DBRunSummary row. Holds the number of datasets in
+each freshness status and the number of resources with errors in a run along with
+the state of the run when they were counted.
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .dbtransition import TransitionBase
+
+
+class DBRunSummary(TransitionBase):
+    """
+    run_number: Mapped[int] = mapped_column(primary_key=True)
+    run_date: Mapped[datetime] = mapped_column(nullable=False)
+    datasets: Mapped[int] = mapped_column(nullable=False)
+    fresh: Mapped[int] = mapped_column(nullable=False)
+    due: Mapped[int] = mapped_column(nullable=False)
+    overdue: Mapped[int] = mapped_column(nullable=False)
+    delinquent: Mapped[int] = mapped_column(nullable=False)
+    resource_errors: Mapped[int] = mapped_column(nullable=False)
+    latest_of_modifieds: Mapped[datetime] = mapped_column(nullable=True)
+    when_checked: Mapped[datetime] = mapped_column(nullable=True)
+    """
+
+    __tablename__ = "dbrunsummaries"
+
+    run_number: Mapped[int] = mapped_column(primary_key=True)
+    run_date: Mapped[datetime] = mapped_column(nullable=False)
+    datasets: Mapped[int] = mapped_column(nullable=False)
+    fresh: Mapped[int] = mapped_column(nullable=False)
+    due: Mapped[int] = mapped_column(nullable=False)
+    overdue: Mapped[int] = mapped_column(nullable=False)
+    delinquent: Mapped[int] = mapped_column(nullable=False)
+    resource_errors: Mapped[int] = mapped_column(nullable=False)
+    latest_of_modifieds: Mapped[Optional[datetime]] = mapped_column(
+        nullable=True
+    )
+    when_checked: Mapped[Optional[datetime]] = mapped_column(nullable=True)
+
+    def __repr__(self) -> str:
+        """String representation of DBRunSummary row
+
+        Returns:
+            str: String representation of DBRunSummary row
+        """
+        output = f"<RunSummary(run number={self.run_number}, run date={str(self.run_date)}, "
+        output += (
+            f"datasets={self.datasets}, fresh={self.fresh}, due={self.due},\n"
+        )
+        output += f"overdue={self.overdue}, delinquent={self.delinquent}, "
+        output += f"resource errors={self.resource_errors}, "
+        output += f"latest of modifieds={str(self.latest_of_modifieds)}, "
+        output += f"when checked={str(self.when_checked)})>"
+        return output
@@ -0,0 +1,67 @@
+"""SQLAlchemy class representing DBTransition row. Holds the freshness, what
+updated and reference period of each dataset in a run and in the run before it.
+"""
+from datetime import datetime
+from typing import Optional
+
+from hdx.database.no_timezone import Base
+from sqlalchemy import Index
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+
+class TransitionBase(DeclarativeBase):
+    """Base for the emailer's own tables. It has its own metadata so that the
+    tables are only created in the freshness database when they are used."""
+
+    type_annotation_map = Base.type_annotation_map
+
+
+class DBTransition(TransitionBase):
+    """
+    run_number: Mapped[int] = mapped_column(primary_key=True)
+    id: Mapped[str] = mapped_column(primary_key=True)
+    prev_run_number: Mapped[int] = mapped_column(nullable=True)
+    dataset_date: Mapped[str] = mapped_column(nullable=True)
+    prev_dataset_date: Mapped[str] = mapped_column(nullable=True)
+    update_frequency: Mapped[int] = mapped_column(nullable=True)
+    latest_of_modifieds: Mapped[datetime] = mapped_column(nullable=False)
+    what_updated: Mapped[str] = mapped_column(nullable=False)
+    prev_what_updated: Mapped[str] = mapped_column(nullable=True)
+    fresh: Mapped[int] = mapped_column(nullable=True)
+    prev_fresh: Mapped[int] = mapped_column(nullable=True)
+    """
+
+    __tablename__ = "dbtransitions"
+    __table_args__ = (
+        Index("ix_dbtransitions_run_number_fresh", "run_number", "fresh"),
+        Index(
+            "ix_dbtransitions_run_number_latest_of_modifieds",
+            "run_number",
+            "latest_of_modifieds",
+        ),
+    )
+
+    run_number: Mapped[int] = mapped_column(primary_key=True)
+    id: Mapped[str] = mapped_column(primary_key=True)
+    prev_run_number: Mapped[Optional[int]] = mapped_column(nullable=True)
+    dataset_date: Mapped[Optional[str]] = mapped_column(nullable=True)
+    prev_dataset_date: Mapped[Optional[str]] = mapped_column(nullable=True)
+    update_frequency: Mapped[Optional[int]] = mapped_column(nullable=True)
+    latest_of_modifieds: Mapped[datetime] = mapped_column(nullable=False)
+    what_updated: Mapped[str] = mapped_column(nullable=False)
+    prev_what_updated: Mapped[Optional[str]] = mapped_column(nullable=True)
+    fresh: Mapped[Optional[int]] = mapped_column(nullable=True)
+    prev_fresh: Mapped[Optional[int]] = mapped_column(nullable=True)
+
+    def __repr__(self) -> str:
+        """String representation of DBTransition row
+
+        Returns:
+            str: String representation of DBTransition row
+        """
+        output = f"<Transition(run number={self.run_number}, id={self.id}, "
+        output += f"previous run number={self.prev_run_number},\n"
+        output += f"reference period={self.dataset_date}, previous reference period={self.prev_dataset_date},\n"
+        output += f"what updated={self.what_updated}, previous what updated={self.prev_what_updated},\n"
+        output += f"fresh={self.fresh}, previous fresh={self.prev_fresh})>"
+        return output
@@ -0,0 +1,39 @@
+"""SQLAlchemy class representing DBTransitionRun row. Marks that the transitions
+of a run have been added to the transitions table and records the state of the run
+when they were.
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .dbtransition import TransitionBase
+
+
+class DBTransitionRun(TransitionBase):
+    """
+    run_number: Mapped[int] = mapped_column(primary_key=True)
+    datasets: Mapped[int] = mapped_column(nullable=False)
+    latest_of_modifieds: Mapped[datetime] = mapped_column(nullable=True)
+    when_checked: Mapped[datetime] = mapped_column(nullable=True)
+    """
+
+    __tablename__ = "dbtransitionruns"
+
+    run_number: Mapped[int] = mapped_column(primary_key=True)
+    datasets: Mapped[int] = mapped_column(nullable=False)
+    latest_of_modifieds: Mapped[Optional[datetime]] = mapped_column(
+        nullable=True
+    )
+    when_checked: Mapped[Optional[datetime]] = mapped_column(nullable=True)
+
+    def __repr__(self) -> str:
+        """String representation of DBTransitionRun row
+
+        Returns:
+            str: String representation of DBTransitionRun row
+        """
+        output = f"<TransitionRun(run number={self.run_number}, datasets={self.datasets}, "
+        output += f"latest of modifieds={str(self.latest_of_modifieds)}, "
+        output += f"when checked={str(self.when_checked)})>"
+        return output
@@ -0,0 +1,27 @@
+"""SQLAlchemy construct that gets the query plan of a statement
+"""
+from sqlalchemy import Select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+
+class Explain(Executable, ClauseElement):
+    """A statement that gets the query plan of another statement
+
+    Args:
+        statement (Select): Statement to explain
+    """
+
+    inherit_cache = False
+
+    def __init__(self, statement: Select):
+        self.statement = statement
+
+
+@compiles(Explain)
+def compile_explain(element: Explain, compiler, **kw) -> str:
+    if compiler.dialect.name == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN"
+    else:
+        prefix = "EXPLAIN"
+    return f"{prefix} {compiler.process(element.statement, **kw)}"
@@ -4,7 +4,19 @@ from __future__ import annotations
 
 import logging
 from datetime import datetime
-from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple, Union
+from itertools import chain
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
 
 from hdx.utilities.dictandlist import dict_of_lists_add
 
@@ -458,22 +470,41 @@ class Email:
         htmlmsg.append(f"<b><i>{title}</i></b>")
         cls.output_newline(msg, htmlmsg)
 
+    @staticmethod
+    def peek(datasets: Iterable[Mapping]) -> Optional[Iterator[Mapping]]:
+        """Check if there are any datasets without consuming them
+
+        Args:
+            datasets (Iterable[Mapping]): Datasets
+
+        Returns:
+            Optional[Iterator[Mapping]]: Iterator over all the datasets or None if there are none
+        """
+        datasets = iter(datasets)
+        first = next(datasets, None)
+        if first is None:
+            return None
+        return chain((first,), datasets)
+
     @staticmethod
     def prepare_user_emails(
         hdxhelper: HDXHelper,
         include_reference_period: bool,
-        datasets: List[Dict],
+        datasets: Iterable[Mapping],
         sheet: Sheet,
         sheetname: str,
+        presorted: bool = False,
     ) -> Dict[str, List]:
-        """Prepare emails to users
+        """Prepare emails to users. Datasets can be a list or a generator such as
+        iter_status of DatabaseQueries.
 
         Args:
             hdxhelper (HDXHelper): HDX helper object
             include_reference_period (bool): Whether to include reference period in output
-            datasets (List[Dict]): List of datasets
+            datasets (Iterable[Mapping]): Datasets
             sheet (Sheet): Sheet object
             sheetname (str): Name of sheet
+            presorted (bool): Whether datasets are ordered by organisation title and name. Defaults to False.
 
         Returns:
             Dict[str, List]: Emails to users
@@ -481,9 +512,11 @@ class Email:
 
         all_users_to_email = dict()
         datasets_flat = list()
-        for dataset in sorted(
-            datasets, key=lambda d: (d["organization_title"], d["name"])
-        ):
+        if not presorted:
+            datasets = sorted(
+                datasets, key=lambda d: (d["organization_title"], d["name"])
+            )
+        for dataset in datasets:
             (
                 maintainer,
                 orgadmins,
@@ -521,7 +554,7 @@ class Email:
         self,
         hdxhelper: HDXHelper,
         include_reference_period: bool,
-        datasets: List[Dict],
+        datasets: Iterable[Mapping],
         nodatasetsmsg: str,
         startmsg: str,
         endmsg: str,
@@ -532,13 +565,14 @@ class Email:
         sheet: Sheet,
         sheetname: str,
         sysadmins: Optional[List[str]] = None,
+        presorted: bool = False,
     ) -> None:
         """Email users and send a summary to HDX system administrators
 
         Args:
             hdxhelper (HDXHelper): HDX helper object
             include_reference_period (bool): Whether to include reference period in output
-            datasets (List[Dict]): List of datasets
+            datasets (Iterable[Mapping]): Datasets
             nodatasetsmsg (str): Message for log when there are no datasets
             startmsg (str): Text for start of email to users
             endmsg (str): Additional string to add to message end
@@ -549,16 +583,23 @@ class Email:
             sheet (Sheet): Sheet object
             sheetname (str): Name of sheet
             sysadmins (Optional[List[str]]): HDX sysadmin emails. Defaults to None.
+            presorted (bool): Whether datasets are ordered by organisation title and name. Defaults to False.
 
         Returns:
             None
         """
 
-        if len(datasets) == 0:
+        datasets = self.peek(datasets)
+        if datasets is None:
             logger.info(nodatasetsmsg)
             return
         all_users_to_email = self.prepare_user_emails(
-            hdxhelper, include_reference_period, datasets, sheet, sheetname
+            hdxhelper,
+            include_reference_period,
+            datasets,
+            sheet,
+            sheetname,
+            presorted,
         )
         starthtmlmsg = self.html_start(self.newline_to_br(startmsg))
         if "$dashboard" in startmsg:
@@ -597,21 +638,24 @@ class Email:
     @staticmethod
     def prepare_admin_emails(
         hdxhelper: HDXHelper,
-        datasets: List[Dict],
+        datasets: Iterable[Mapping],
         startmsg: str,
         sheet: Sheet,
         sheetname: str,
         dutyofficer: Dict[str, str],
+        presorted: bool = False,
     ):
-        """Prepare emails to HDX admins
+        """Prepare emails to HDX admins. Datasets can be a list or a generator such
+        as iter_status of DatabaseQueries.
 
         Args:
             hdxhelper (HDXHelper): HDX helper object
-            datasets (List[Dict]): List of datasets
+            datasets (Iterable[Mapping]): Datasets
             startmsg (str): Text for start of email to admins
             sheet (Sheet): Sheet object
             sheetname (str): Name of sheet
             dutyofficer (Dict[str, str]): Duty officer information
+            presorted (bool): Whether datasets are ordered by organisation title and name. Defaults to False.
 
         Returns:
             None
@@ -619,9 +663,11 @@ class Email:
         datasets_flat = list()
         msg = [startmsg]
         htmlmsg = [Email.newline_to_br(startmsg)]
-        for dataset in sorted(
-            datasets, key=lambda d: (d["organization_title"], d["name"])
-        ):
+        if not presorted:
+            datasets = sorted(
+                datasets, key=lambda d: (d["organization_title"], d["name"])
+            )
+        for dataset in datasets:
             maintainer, orgadmins, _ = hdxhelper.get_maintainer_orgadmins(
                 dataset
             )
@@ -644,7 +690,7 @@ class Email:
     def email_admins(
         self,
         hdxhelper: HDXHelper,
-        datasets: List[Dict],
+        datasets: Iterable[Mapping],
         nodatasetsmsg,
         startmsg,
         subject,
@@ -653,12 +699,13 @@ class Email:
         recipients=None,
         dutyofficer: Optional[Dict[str, str]] = None,
         recipients_in_cc: bool = False,
+        presorted: bool = False,
     ):
         """Send summary of emails sent to users to HDX admins
 
         Args:
             hdxhelper (HDXHelper): HDX helper object
-            datasets (List[Dict]): List of datasets
+            datasets (Iterable[Mapping]): Datasets
             nodatasetsmsg (str): Message for log when there are no datasets
             startmsg (str): Text for start of email to users
             endmsg (str): Additional string to add to message end
@@ -667,17 +714,25 @@ class Email:
             recipients (Optional[List[str]]): Recipient emails. Defaults to None.
             dutyofficer (Optional[Dict[str, str]]): Duty officer. Defaults to None.
             recipients_in_cc (bool): Put recipients in cc not to. Defaults to False.
+            presorted (bool): Whether datasets are ordered by organisation title and name. Defaults to False.
 
         Returns:
             None
         """
-        if len(datasets) == 0:
+        datasets = self.peek(datasets)
+        if datasets is None:
             logger.info(nodatasetsmsg)
             return
         if not dutyofficer:
             dutyofficer = sheet.dutyofficer
         msg, htmlmsg = self.prepare_admin_emails(
-            hdxhelper, datasets, startmsg, sheet, sheetname, dutyofficer
+            hdxhelper,
+            datasets,
+            startmsg,
+            sheet,
+            sheetname,
+            dutyofficer,
+            presorted,
         )
         htmlmsg[0] = Email.html_start(htmlmsg[0])
 
@@ -1,25 +1,52 @@
 """Helper functions for HDX datasets, users and organisations
 """
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from threading import Lock
+from types import MappingProxyType
+from typing import (
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 from hdx.data.dataset import Dataset
 from hdx.data.date_helper import DateHelper
 from hdx.data.organization import Organization
 from hdx.data.user import User
-from hdx.utilities.dictandlist import dict_of_lists_add
 
 from .freshnessemail import Email
+from .paginatedfetcher import PaginatedFetcher
+from .records import UserRecord
+from .userorgcache import UserOrgCache
+from .userorgdirectory import UserOrgDirectory
+
+MaintainerOrgAdmins = Tuple[
+    Optional[Mapping[str, str]],
+    Tuple[Mapping[str, str], ...],
+    Tuple[UserRecord, ...],
+]
 
 
 class HDXHelper:
     """A class providing functions for retrieving information about HDX datasets,
-    users and organisations
+    users and organisations. If users or organizations are not given, they are
+    downloaded from HDX (concurrently if a PaginatedFetcher is given) or if a
+    UserOrgCache is given, read from it. Users and organisations are only loaded
+    into a compact UserOrgDirectory when they are first accessed so that runs that
+    do not need them (eg. when freshness has failed) do not call HDX. The
+    maintainer and organisation administrator information for each pair of
+    maintainer and organisation is worked out once per run and shared between
+    datasets.
 
     Args:
         site_url (str): URL of HDX site
         users (Optional[List[Dict]]): List of users (for testing). Defaults to None.
         organizations (Optional[List[Dict]]): List of organizations. Defaults to None.
+        userorgcache (Optional[UserOrgCache]): Cache of users and organizations. Defaults to None.
+        fetcher (Optional[PaginatedFetcher]): Concurrent downloader of users and organizations. Defaults to None.
     """
 
     freshness_status = {0: "Fresh", 1: "Due", 2: "Overdue", 3: "Delinquent"}
@@ -29,40 +56,102 @@ class HDXHelper:
         site_url: str,
         users: Optional[List[User]] = None,
         organizations: Optional[List[Organization]] = None,
+        userorgcache: Optional[UserOrgCache] = None,
+        fetcher: Optional[PaginatedFetcher] = None,
     ):
         self.site_url = site_url
-        if users is None:  # pragma: no cover
-            users = User.get_all_users()
-        self.users: Dict[str, User] = dict()
-        self.sysadmins = dict()
-        for user in users:
-            userid = user["id"]
-            self.users[userid] = user
-            if user["sysadmin"]:
-                self.sysadmins[userid] = user
-
-        self.organizations: Dict = dict()
-        if organizations is None:  # pragma: no cover
-            organizations: List = Organization.get_all_organization_names(
-                all_fields=True, include_users=True
-            )
-        for organization in organizations:
-            users_per_capacity = dict()
-            for user in organization["users"]:
-                dict_of_lists_add(
-                    users_per_capacity, user["capacity"], user["id"]
-                )
-            self.organizations[organization["id"]] = users_per_capacity
+        self.userorgcache = userorgcache
+        self.fetcher = fetcher
+        self.user_list = users
+        self.organization_list = organizations
+        self.lock = Lock()
+        self._directory: Optional[UserOrgDirectory] = None
+        self.maintainer_orgadmins: Dict[
+            Tuple[Optional[str], str], MaintainerOrgAdmins
+        ] = dict()
+
+    def load(self) -> UserOrgDirectory:
+        """Load users and organisations into the directory if they have not been
+        loaded
+
+        Returns:
+            UserOrgDirectory: Directory of users and organisations
+        """
+        with self.lock:
+            if self._directory is not None:
+                return self._directory
+            users = self.user_list
+            if users is None:  # pragma: no cover
+                if self.userorgcache is not None:
+                    users = self.userorgcache.get_users()
+                elif self.fetcher is not None:
+                    users = self.fetcher.get_users()
+                else:
+                    users = User.get_all_users()
+            organizations = self.organization_list
+            if organizations is None:  # pragma: no cover
+                if self.userorgcache is not None:
+                    organizations = self.userorgcache.get_organizations()
+                elif self.fetcher is not None:
+                    organizations = self.fetcher.get_organizations()
+                else:
+                    organizations = Organization.get_all_organization_names(
+                        all_fields=True, include_users=True
+                    )
+            self._directory = UserOrgDirectory(users, organizations)
+            self.maintainer_orgadmins = dict()
+            self.user_list = None
+            self.organization_list = None
+            return self._directory
+
+    @property
+    def directory(self) -> UserOrgDirectory:
+        """Get directory of users and organisations, loading it if needed
+
+        Returns:
+            UserOrgDirectory: Directory of users and organisations
+        """
+        if self._directory is None:
+            return self.load()
+        return self._directory
+
+    @property
+    def users(self) -> Dict[str, UserRecord]:
+        """Get users, loading them if needed
+
+        Returns:
+            Dict[str, UserRecord]: User id to user
+        """
+        return self.directory.users
+
+    @property
+    def sysadmins(self) -> Dict[str, UserRecord]:
+        """Get sysadmins, loading users if needed
+
+        Returns:
+            Dict[str, UserRecord]: User id to sysadmin
+        """
+        return self.directory.sysadmins
+
+    @property
+    def organizations(self) -> Dict[str, Dict[str, Tuple[int, ...]]]:
+        """Get the indices of the users in each role of each organisation in
+        membership order, loading them if needed
+
+        Returns:
+            Dict[str, Dict[str, Tuple[int, ...]]]: Organisation id to role to user indices
+        """
+        return self.directory.organizations
 
     @staticmethod
     def get_reference_period(
-        dataset: Dict,
+        dataset: Mapping,
     ) -> Tuple[Optional[datetime], Optional[datetime]]:
         """Return a tuple containing dataset reference period start and end
         or (None, None)
 
         Args:
-            dataset (Dict): Dataset to examine
+            dataset (Mapping): Dataset to examine
 
         Returns:
             Tuple[Optional[datetime], Optional[datetime]]:
@@ -74,66 +163,94 @@ class HDXHelper:
         date_info = DateHelper.get_date_info(reference_period)
         return date_info["startdate"], date_info["enddate"]
 
-    def get_maintainer(self, dataset: Dict) -> User:
+    def get_maintainer(self, dataset: Mapping) -> Optional[UserRecord]:
         """Get the maintainer of a dataset
 
         Args:
-            dataset (Dict): Dataset to examine
+            dataset (Mapping): Dataset to examine
 
         Returns:
-            User: Maintainer of the dataset
+            Optional[UserRecord]: Maintainer of the dataset
         """
         maintainer = dataset["maintainer"]
         return self.users.get(maintainer)
 
-    def get_org_admins(self, dataset: Dict) -> List[User]:
+    def get_org_admins(self, dataset: Mapping) -> List[UserRecord]:
         """Get the administrators of the organisation of the dataset
 
         Args:
-            dataset (Dict): Dataset to examine
+            dataset (Mapping): Dataset to examine
 
         Returns:
-            List[User]: Administrators of the organisation of the dataset
+            List[UserRecord]: Administrators of the organisation of the dataset
         """
-        organization_id = dataset["organization_id"]
+        directory = self.directory
         orgadmins = list()
-        organization = self.organizations[organization_id]
-        if "admin" in organization:
-            for userid in self.organizations[organization_id]["admin"]:
-                user = self.users.get(userid)
-                if user:
-                    orgadmins.append(user)
+        for userid in directory.get_role_ids(
+            dataset["organization_id"], "admin"
+        ):
+            user = directory.get_user(userid)
+            if user:
+                orgadmins.append(user)
         return orgadmins
 
     def get_maintainer_orgadmins(
-        self, dataset: Dict
-    ) -> Tuple[Dict[str, str], List[Dict[str, str]], List[User]]:
+        self, dataset: Mapping
+    ) -> MaintainerOrgAdmins:
         """Get the maintainer of the dataset and the administrators of the organisation
-        of the dataset as well as a list of users to email
+        of the dataset as well as the users to email. Results are memoised by
+        maintainer id and organisation id and are immutable as they are shared
+        between datasets.
+
+        Args:
+            dataset (Mapping): Dataset to examine
+
+        Returns:
+            MaintainerOrgAdmins:
+            (maintainer info, org admin info, users to email)
+        """
+        key = (dataset["maintainer"], dataset["organization_id"])
+        result = self.maintainer_orgadmins.get(key)
+        if result is None:
+            result = self.create_maintainer_orgadmins(dataset)
+            self.maintainer_orgadmins[key] = result
+        return result
+
+    def create_maintainer_orgadmins(
+        self, dataset: Mapping
+    ) -> MaintainerOrgAdmins:
+        """Create the maintainer and organisation administrator information of
+        the dataset and the users to email
 
         Args:
-            dataset (Dict): Dataset to examine
+            dataset (Mapping): Dataset to examine
 
         Returns:
-            Tuple[Dict[str, str], List[Dict[str, str]], List[User]]:
-            (maintainer info, list of org admin info, list of users to email)
+            MaintainerOrgAdmins:
+            (maintainer info, org admin info, users to email)
         """
         users_to_email = list()
         maintainer = self.get_maintainer(dataset)
         if maintainer is not None:
             users_to_email.append(maintainer)
             maintainer_name = self.get_user_name(maintainer)
-            maintainer = {
-                "name": maintainer_name,
-                "email": maintainer["email"],
-            }
+            maintainer = MappingProxyType(
+                {
+                    "name": maintainer_name,
+                    "email": maintainer["email"],
+                }
+            )
         orgadmins = list()
         for orgadmin in self.get_org_admins(dataset):
             if maintainer is None:
                 users_to_email.append(orgadmin)
             username = self.get_user_name(orgadmin)
-            orgadmins.append({"name": username, "email": orgadmin["email"]})
-        return maintainer, orgadmins, users_to_email
+            orgadmins.append(
+                MappingProxyType(
+                    {"name": username, "email": orgadmin["email"]}
+                )
+            )
+        return maintainer, tuple(orgadmins), tuple(users_to_email)
 
     @staticmethod
     def get_update_frequency(update_freq: int) -> str:
@@ -151,11 +268,11 @@ class HDXHelper:
             return Dataset.transform_update_frequency(str(update_freq))
 
     @classmethod
-    def get_update_frequency_from_dataset(cls, dataset: Dict) -> str:
+    def get_update_frequency_from_dataset(cls, dataset: Mapping) -> str:
         """Get the update frequency string as words from the dataset
 
         Args:
-            dataset (Dict): Dataset to examine
+            dataset (Mapping): Dataset to examine
 
         Returns:
             str: Update frequency in words
@@ -163,14 +280,14 @@ class HDXHelper:
         return cls.get_update_frequency(dataset["update_frequency"])
 
     @staticmethod
-    def get_user_name(user: User) -> str:
+    def get_user_name(user: Mapping) -> str:
         """Get the user name from the user
 
         Args:
-            user (User): User to examine
+            user (Mapping): User to examine
 
         Returns:
-            str: User name of User object
+            str: User name of user
         """
         user_name = user.get("display_name")
         if not user_name:
@@ -179,11 +296,11 @@ class HDXHelper:
                 user_name = user["name"]
         return user_name
 
-    def get_dataset_url(self, dataset: Dict) -> str:
+    def get_dataset_url(self, dataset: Mapping) -> str:
         """Get the dataset's URL
 
         Args:
-            dataset (Dict): Dataset to examine
+            dataset (Mapping): Dataset to examine
 
         Returns:
             str: URL of dataset
@@ -203,9 +320,9 @@ class HDXHelper:
 
     def create_dataset_string(
         self,
-        dataset: Dict,
-        maintainer: Dict[str, str],
-        orgadmins: List[Dict[str, str]],
+        dataset: Mapping,
+        maintainer: Optional[Mapping[str, str]],
+        orgadmins: Sequence[Mapping[str, str]],
         sysadmin: bool = False,
         include_org: bool = True,
         include_freshness: bool = False,
@@ -215,9 +332,9 @@ class HDXHelper:
         and HTML version, the latter including URL links
 
         Args:
-            dataset (Dict): Dataset to examine
-            maintainer (Dict[str, str]): Maintainer information
-            orgadmins (List[Dict[str, str]]): List of organisation administrator info
+            dataset (Mapping): Dataset to examine
+            maintainer (Optional[Mapping[str, str]]): Maintainer information
+            orgadmins (Sequence[Mapping[str, str]]): Organisation administrator info
             sysadmin (bool): Include additional info for sysadmins. Defaults to False.
             include_org (bool): Include additional org info in string. Defaults to True.
             include_freshness (bool): Include freshness status. Defaults to False.
@@ -0,0 +1,478 @@
+"""Functions that cache the run history of datasets in memory-mapped files
+"""
+import json
+import logging
+from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+from os import makedirs, replace
+from os.path import exists, getsize, join
+from sys import intern
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from hdx.freshness.database.dbdataset import DBDataset
+from hdx.freshness.database.dbrun import DBRun
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .runcatalog import RunCatalog
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryCache:
+    """A class that keeps the history of every dataset across freshness runs as
+    columns of NumPy arrays in a folder of binary files that are read as
+    memory-mapped arrays. Dataset ids are interned and replaced by integer codes
+    and reference periods and what was updated are dictionary encoded so that
+    every column is a fixed width integer. Runs are appended in order, so after
+    the first emailer run only the newest run needs to be read from the database.
+    The state of the last run appended (see RunCatalog.get_run_state) is recorded
+    and if the run has changed since (eg. because freshness was still writing
+    it), it is replaced. The history analyses (when the reference period last
+    changed and the regularity of updates) are then computed from the arrays
+    without querying DBDataset. Requires the history extra (NumPy) to be
+    installed.
+
+    Args:
+        folder (str): Folder for cache files
+    """
+
+    schema_version = 2
+    metadata_filename = "metadata.json"
+    columns = (
+        "run_number",
+        "dataset",
+        "dataset_date",
+        "what_updated",
+        "update_frequency",
+        "fresh",
+    )
+    dtype = "<i4"
+    none_code = -1
+    none_update_frequency = -(2**31)
+    yield_per = 10000
+
+    def __init__(self, folder: str):
+        if np is None:
+            raise ImportError(
+                "History cache requires hdx-data-freshness-emailer[history]!"
+            )
+        makedirs(folder, exist_ok=True)
+        self.folder = folder
+        self.rows = 0
+        self.last_run_number: Optional[int] = None
+        self.last_run_start: Optional[int] = None
+        self.last_run_state: Optional[List] = None
+        self.run_dates: Dict[int, datetime] = dict()
+        self.strings: Dict[str, List[str]] = {
+            "dataset": list(),
+            "dataset_date": list(),
+            "what_updated": list(),
+        }
+        self.codes: Dict[str, Dict[str, int]] = {
+            name: dict() for name in self.strings
+        }
+        self.arrays: Dict[str, "np.ndarray"] = dict()
+        self.load_metadata()
+
+    def get_path(self, filename: str) -> str:
+        """Get the path of a file in the cache folder
+
+        Args:
+            filename (str): Filename
+
+        Returns:
+            str: Path of file
+        """
+        return join(self.folder, filename)
+
+    def get_column_path(self, column: str) -> str:
+        """Get the path of the file of a column
+
+        Args:
+            column (str): Column name
+
+        Returns:
+            str: Path of file
+        """
+        return self.get_path(f"{column}.i4")
+
+    def load_metadata(self) -> None:
+        """Load the number of rows, last run, run dates and string dictionaries
+        from the metadata file. If there is no metadata file or it was written by a
+        different schema version, the cache is treated as empty.
+
+        Returns:
+            None
+        """
+        path = self.get_path(self.metadata_filename)
+        if not exists(path):
+            return
+        with open(path) as f:
+            metadata = json.load(f)
+        if metadata["schema_version"] != self.schema_version:
+            logger.warning("History cache has old schema so rebuilding it.")
+            return
+        self.rows = metadata["rows"]
+        self.last_run_number = metadata["last_run_number"]
+        self.last_run_start = metadata["last_run_start"]
+        self.last_run_state = metadata["last_run_state"]
+        self.run_dates = {
+            int(run_number): datetime.fromisoformat(run_date)
+            for run_number, run_date in metadata["run_dates"].items()
+        }
+        for name, strings in metadata["strings"].items():
+            strings = [intern(string) for string in strings]
+            self.strings[name] = strings
+            self.codes[name] = {
+                string: code for code, string in enumerate(strings)
+            }
+
+    def save_metadata(self) -> None:
+        """Save the number of rows, last run, run dates and string dictionaries to
+        the metadata file. The file is replaced atomically so that rows appended to
+        the column files only become part of the cache once it is written.
+
+        Returns:
+            None
+        """
+        metadata = {
+            "schema_version": self.schema_version,
+            "rows": self.rows,
+            "last_run_number": self.last_run_number,
+            "last_run_start": self.last_run_start,
+            "last_run_state": self.last_run_state,
+            "run_dates": {
+                str(run_number): run_date.isoformat()
+                for run_number, run_date in self.run_dates.items()
+            },
+            "strings": self.strings,
+        }
+        path = self.get_path(self.metadata_filename)
+        temppath = f"{path}.tmp"
+        with open(temppath, "w") as f:
+            json.dump(metadata, f)
+        replace(temppath, path)
+
+    def get_code(self, name: str, value: Optional[str]) -> int:
+        """Get the code of a string in a dictionary, adding it if it is not there.
+        None has code none_code.
+
+        Args:
+            name (str): Name of dictionary
+            value (Optional[str]): String
+
+        Returns:
+            int: Code of string
+        """
+        if value is None:
+            return self.none_code
+        codes = self.codes[name]
+        code = codes.get(value)
+        if code is None:
+            code = len(codes)
+            value = intern(value)
+            codes[value] = code
+            self.strings[name].append(value)
+        return code
+
+    def get_column(self, column: str) -> "np.ndarray":
+        """Get a column as a read only array memory-mapped from its file
+
+        Args:
+            column (str): Column name
+
+        Returns:
+            np.ndarray: Column
+        """
+        array = self.arrays.get(column)
+        if array is None:
+            if self.rows == 0:
+                array = np.empty(0, dtype=self.dtype)
+            else:
+                array = np.memmap(
+                    self.get_column_path(column),
+                    dtype=self.dtype,
+                    mode="r",
+                    shape=(self.rows,),
+                )
+            self.arrays[column] = array
+        return array
+
+    def append(
+        self,
+        run_number: int,
+        run_date: datetime,
+        rows: List[Tuple],
+        save: bool = True,
+    ) -> int:
+        """Append the datasets of a run to the column files. Any rows left at the
+        end of the files by an append that did not complete are discarded first.
+        The rows only become part of the cache once the metadata is saved.
+
+        Args:
+            run_number (int): Run number
+            run_date (datetime): Run date
+            rows (List[Tuple]): List of (id, dataset date, what updated, update frequency, fresh)
+            save (bool): Whether to save the metadata. Defaults to True.
+
+        Returns:
+            int: Number of rows appended
+        """
+        values = {column: list() for column in self.columns}
+        for (
+            dataset_id,
+            dataset_date,
+            what_updated,
+            update_frequency,
+            fresh,
+        ) in rows:
+            values["dataset"].append(self.get_code("dataset", dataset_id))
+            values["dataset_date"].append(
+                self.get_code("dataset_date", dataset_date)
+            )
+            values["what_updated"].append(
+                self.get_code("what_updated", what_updated)
+            )
+            if update_frequency is None:
+                update_frequency = self.none_update_frequency
+            values["update_frequency"].append(update_frequency)
+            if fresh is None:
+                fresh = self.none_code
+            values["fresh"].append(fresh)
+        values["run_number"] = [run_number] * len(rows)
+        self.arrays = dict()
+        itemsize = np.dtype(self.dtype).itemsize
+        for column in self.columns:
+            path = self.get_column_path(column)
+            size = self.rows * itemsize
+            mode = "r+b" if exists(path) else "wb"
+            with open(path, mode) as f:
+                if getsize(path) != size:
+                    f.truncate(size)
+                f.seek(size)
+                f.write(np.asarray(values[column], dtype=self.dtype).tobytes())
+        self.last_run_start = self.rows
+        self.last_run_state = None
+        self.rows += len(rows)
+        self.last_run_number = run_number
+        self.run_dates[run_number] = run_date
+        if save:
+            self.save_metadata()
+        return len(rows)
+
+    def remove_last_run(self) -> None:
+        """Remove the last run from the cache. The rows left at the end of the
+        column files are discarded by the next append.
+
+        Returns:
+            None
+        """
+        del self.run_dates[self.last_run_number]
+        self.rows = self.last_run_start
+        self.last_run_number = max(self.run_dates, default=None)
+        self.last_run_start = None
+        self.last_run_state = None
+        self.arrays = dict()
+
+    @staticmethod
+    def get_state_metadata(run_state: Tuple) -> List:
+        """Get the state of a run in the form stored in the metadata file
+
+        Args:
+            run_state (Tuple): State of run
+
+        Returns:
+            List: State of run with dates as ISO strings
+        """
+        return [
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in run_state
+        ]
+
+    def update(self, session: Session, runcatalog: RunCatalog) -> int:
+        """Append the runs up to and including the current run that are newer than
+        the last run in the cache. If the last run in the cache has changed since
+        it was appended, it is replaced. The datasets of all the runs are read with
+        one query.
+
+        Args:
+            session (sqlalchemy.orm.Session): Session to use for queries
+            runcatalog (RunCatalog): Catalog of current and previous runs
+
+        Returns:
+            int: Number of runs appended
+        """
+        run_numbers = runcatalog.get_run_numbers()
+        if len(run_numbers) == 0:
+            return 0
+        cur_run_number = run_numbers[0][0]
+        if (
+            self.last_run_state is not None
+            and self.last_run_number <= cur_run_number
+        ):
+            run_state = runcatalog.get_run_state(self.last_run_number)
+            if self.get_state_metadata(run_state) != self.last_run_state:
+                logger.info(
+                    f"Run {self.last_run_number} has changed so replacing it in history cache."
+                )
+                self.remove_last_run()
+        get_literal = runcatalog.get_literal
+        where = [DBRun.run_number <= get_literal(cur_run_number)]
+        if self.last_run_number is not None:
+            where.append(DBRun.run_number > get_literal(self.last_run_number))
+        runs = session.execute(
+            select(DBRun.run_number, DBRun.run_date)
+            .where(*where)
+            .order_by(DBRun.run_number)
+        ).all()
+        if not runs:
+            return 0
+        results = session.execute(
+            select(
+                DBDataset.run_number,
+                DBDataset.id,
+                DBDataset.dataset_date,
+                DBDataset.what_updated,
+                DBDataset.update_frequency,
+                DBDataset.fresh,
+            )
+            .where(
+                DBDataset.run_number >= get_literal(runs[0][0]),
+                DBDataset.run_number <= get_literal(runs[-1][0]),
+            )
+            .order_by(DBDataset.run_number),
+            execution_options={"yield_per": self.yield_per},
+        )
+        groups = groupby(results, key=itemgetter(0))
+        group = next(groups, None)
+        for run_number, run_date in runs:
+            while group is not None and group[0] < run_number:
+                group = next(groups, None)
+            rows = list()
+            if group is not None and group[0] == run_number:
+                rows = [tuple(row[1:]) for row in group[1]]
+                group = next(groups, None)
+            self.append(run_number, run_date, rows, save=False)
+        self.last_run_state = self.get_state_metadata(
+            runcatalog.get_run_state(self.last_run_number)
+        )
+        self.save_metadata()
+        logger.info(f"Added {len(runs)} runs to history cache.")
+        return len(runs)
+
+    def get_history(
+        self, dataset_ids: List[str], run_number: int, columns: Tuple[str]
+    ) -> Dict[str, "np.ndarray"]:
+        """Get the history of the given datasets up to and including a run ordered
+        by dataset code then run number
+
+        Args:
+            dataset_ids (List[str]): Dataset ids
+            run_number (int): Run number of last run
+            columns (Tuple[str]): Columns to get in addition to run number and dataset
+
+        Returns:
+            Dict[str, np.ndarray]: Column name to values
+        """
+        codes = self.codes["dataset"]
+        dataset_codes = [
+            codes[dataset_id]
+            for dataset_id in dataset_ids
+            if dataset_id in codes
+        ]
+        run_numbers = self.get_column("run_number")
+        datasets = self.get_column("dataset")
+        # Runs are appended in order so rows up to the run form a prefix
+        end = int(np.searchsorted(run_numbers, run_number, side="right"))
+        indices = np.flatnonzero(np.isin(datasets[:end], dataset_codes))
+        indices = indices[
+            np.lexsort((run_numbers[indices], datasets[indices]))
+        ]
+        history = {
+            "run_number": run_numbers[indices],
+            "dataset": datasets[indices],
+        }
+        for column in columns:
+            history[column] = self.get_column(column)[indices]
+        return history
+
+    def get_dataset_date_last_changed(
+        self, dataset_ids: List[str], run_number: int
+    ) -> Dict[str, datetime]:
+        """Get the date of the run in which the reference period of each given
+        dataset last changed (or the dataset first appeared if it never changed)
+        considering runs up to and including the given run
+
+        Args:
+            dataset_ids (List[str]): Dataset ids
+            run_number (int): Run number of last run
+
+        Returns:
+            Dict[str, datetime]: Dataset id to run date of last reference period change
+        """
+        history = self.get_history(dataset_ids, run_number, ("dataset_date",))
+        datasets = history["dataset"]
+        if len(datasets) == 0:
+            return dict()
+        dataset_dates = history["dataset_date"]
+        changed = np.ones(len(datasets), dtype=bool)
+        changed[1:] = (datasets[1:] != datasets[:-1]) | (
+            dataset_dates[1:] != dataset_dates[:-1]
+        )
+        datasets = datasets[changed]
+        run_numbers = history["run_number"][changed]
+        last = np.ones(len(datasets), dtype=bool)
+        last[:-1] = datasets[:-1] != datasets[1:]
+        ids = self.strings["dataset"]
+        return {
+            ids[dataset]: self.run_dates[run_number]
+            for dataset, run_number in zip(
+                datasets[last].tolist(), run_numbers[last].tolist()
+            )
+        }
+
+    def get_updates(
+        self, dataset_ids: List[str], run_number: int
+    ) -> Iterator[Tuple[str, datetime, Optional[int]]]:
+        """Get the updates of each given dataset after its first run up to and
+        including the given run along with the run date and update frequency. The
+        updates of each dataset are together with the most recent run first.
+
+        Args:
+            dataset_ids (List[str]): Dataset ids
+            run_number (int): Run number of last run
+
+        Returns:
+            Iterator[Tuple[str, datetime, Optional[int]]]: (id, run date, update frequency)
+        """
+        history = self.get_history(
+            dataset_ids, run_number, ("what_updated", "update_frequency")
+        )
+        datasets = history["dataset"]
+        if len(datasets) == 0:
+            return
+        what_updated = history["what_updated"]
+        updated = np.zeros(len(datasets), dtype=bool)
+        updated[1:] = datasets[1:] == datasets[:-1]
+        updated &= what_updated != self.none_code
+        nothing = self.codes["what_updated"].get("nothing")
+        if nothing is not None:
+            updated &= what_updated != nothing
+        # Reversing keeps the rows of each dataset together, most recent first
+        indices = np.flatnonzero(updated)[::-1]
+        ids = self.strings["dataset"]
+        for dataset, run_number, update_frequency in zip(
+            datasets[indices].tolist(),
+            history["run_number"][indices].tolist(),
+            history["update_frequency"][indices].tolist(),
+        ):
+            if update_frequency == self.none_update_frequency:
+                update_frequency = None
+            yield ids[dataset], self.run_dates[run_number], update_frequency
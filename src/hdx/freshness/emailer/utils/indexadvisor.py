@@ -0,0 +1,150 @@
+"""Functions that check and create the indexes needed by the freshness database
+queries
+"""
+import logging
+from typing import Dict, List, Tuple
+
+from hdx.freshness.database.dbdataset import DBDataset
+from hdx.freshness.database.dbresource import DBResource
+from sqlalchemy import Select, inspect, text
+from sqlalchemy.orm import Session
+
+from .databasequeries import DatabaseQueries
+from .explain import Explain
+
+logger = logging.getLogger(__name__)
+
+
+class IndexAdvisor:
+    """A class that reports the query plans of the statements executed by
+    DatabaseQueries and creates the composite indexes that they need if they do not
+    already exist. It works with SQLite and PostgreSQL.
+
+    Args:
+        session (sqlalchemy.orm.Session): Session to use for queries
+        databasequeries (DatabaseQueries): DatabaseQueries object
+    """
+
+    # Table class to composite indexes (as lists of columns)
+    indexes = {
+        DBDataset: [
+            ["run_number", "fresh"],
+            ["run_number", "what_updated"],
+            ["run_number", "latest_of_modifieds"],
+            ["id", "run_number"],
+        ],
+        DBResource: [
+            ["run_number", "when_checked"],
+            ["run_number", "dataset_id"],
+        ],
+    }
+
+    def __init__(self, session: Session, databasequeries: DatabaseQueries):
+        self.session = session
+        self.databasequeries = databasequeries
+
+    def get_existing_indexes(self, table_name: str) -> List[List[str]]:
+        """Get the columns of the existing indexes (including the primary key) of a
+        table
+
+        Args:
+            table_name (str): Table name
+
+        Returns:
+            List[List[str]]: List of index columns
+        """
+        inspector = inspect(self.session.connection())
+        existing_indexes = list()
+        primary_key = inspector.get_pk_constraint(table_name)
+        if primary_key["constrained_columns"]:
+            existing_indexes.append(primary_key["constrained_columns"])
+        for index in inspector.get_indexes(table_name):
+            existing_indexes.append(index["column_names"])
+        return existing_indexes
+
+    def get_missing_indexes(self) -> List[Tuple[str, List[str]]]:
+        """Get the indexes that are needed by the queries and are not covered by an
+        existing index ie. there is no existing index whose leading columns are the
+        needed columns
+
+        Returns:
+            List[Tuple[str, List[str]]]: List of (table name, index columns)
+        """
+        missing_indexes = list()
+        for table_class, indexes in self.indexes.items():
+            table_name = table_class.__tablename__
+            existing_indexes = self.get_existing_indexes(table_name)
+            for columns in indexes:
+                no_columns = len(columns)
+                for existing_columns in existing_indexes:
+                    if existing_columns[:no_columns] == columns:
+                        break
+                else:
+                    missing_indexes.append((table_name, columns))
+        return missing_indexes
+
+    def create_indexes(self) -> List[str]:
+        """Create the indexes that are needed by the queries and are missing
+
+        Returns:
+            List[str]: Names of indexes created
+        """
+        preparer = self.session.get_bind().dialect.identifier_preparer
+        index_names = list()
+        for table_name, columns in self.get_missing_indexes():
+            index_name = f"ix_{table_name}_{'_'.join(columns)}"
+            quoted_columns = ", ".join(preparer.quote(x) for x in columns)
+            self.session.execute(
+                text(
+                    f"CREATE INDEX IF NOT EXISTS {preparer.quote(index_name)} "
+                    f"ON {preparer.quote(table_name)} ({quoted_columns})"
+                )
+            )
+            logger.info(f"Created index {index_name}.")
+            index_names.append(index_name)
+        self.session.commit()
+        return index_names
+
+    def explain(self, statement: Select) -> List[str]:
+        """Get the query plan of a statement
+
+        Args:
+            statement (Select): Statement to explain
+
+        Returns:
+            List[str]: Lines of query plan
+        """
+        results = self.session.execute(Explain(statement))
+        return [str(result[-1]) for result in results]
+
+    def explain_all(self) -> Dict[str, List[str]]:
+        """Get the query plans of all the statements executed by DatabaseQueries
+
+        Returns:
+            Dict[str, List[str]]: Statement name to lines of query plan
+        """
+        plans = dict()
+        statements = self.databasequeries.get_statements()
+        for name, statement in statements.items():
+            plans[name] = self.explain(statement)
+        return plans
+
+    def ensure_indexes(self) -> Dict[str, List[str]]:
+        """Create the indexes that are needed by the queries and are missing and
+        report the query plans of all the statements executed by DatabaseQueries.
+        The query plans can only be reported if there are at least two runs.
+
+        Returns:
+            Dict[str, List[str]]: Statement name to lines of query plan
+        """
+        index_names = self.create_indexes()
+        if not index_names:
+            logger.info("No indexes are missing.")
+        if len(self.databasequeries.run_numbers) < 2:
+            logger.warning("Less than 2 runs so cannot explain queries!")
+            return dict()
+        plans = self.explain_all()
+        for name, plan in plans.items():
+            plan = "\n".join(plan)
+            logger.info(f"Query plan for {name}:\n{plan}")
+        return plans
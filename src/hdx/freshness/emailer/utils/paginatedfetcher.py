@@ -0,0 +1,170 @@
+"""Functions that download HDX users and organisations page by page concurrently
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class PaginatedFetcher:
+    """A class that downloads the paginated CKAN user_list and organization_list
+    actions of an HDX site using a bounded thread pool. The first page is
+    requested on its own to find out how many results the site actually returns
+    per page as sites cap limit (eg. organization_list with all_fields is capped
+    at 25 by ckan.group_and_organization_list_all_fields_max). Later pages are
+    requested at offsets based on that number in waves of max_workers pages at a
+    time until a page comes back with fewer results, so no count request is
+    needed. Sites that ignore offset (eg. CKAN versions without pagination of
+    user_list) return the same results for every page, so downloading also stops
+    when a wave of pages adds no new results and an error is raised if more than
+    max_pages pages are requested. All requests share one keep-alive HTTP session whose connection pool
+    is sized for the thread pool. Results are merged by id so that pages that
+    overlap because of changes during the download do not cause duplicates.
+
+    Args:
+        site_url (str): URL of HDX site
+        api_key (Optional[str]): HDX API key. Defaults to None.
+        user_agent (Optional[str]): User agent. Defaults to None.
+        page_size (int): Number of results requested per page. Defaults to 25.
+        max_workers (int): Maximum number of concurrent requests. Defaults to 8.
+        timeout (float): Timeout of each request in seconds. Defaults to 60.
+        max_pages (int): Maximum number of pages to request. Defaults to 10000.
+    """
+
+    def __init__(
+        self,
+        site_url: str,
+        api_key: Optional[str] = None,
+        user_agent: Optional[str] = None,
+        page_size: int = 25,
+        max_workers: int = 8,
+        timeout: float = 60,
+        max_pages: int = 10000,
+    ):
+        self.site_url = site_url.rstrip("/")
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_pages = max_pages
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=max_workers, max_retries=3
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if api_key:
+            self.session.headers["Authorization"] = api_key
+        if user_agent:
+            self.session.headers["User-Agent"] = user_agent
+
+    def get_action_url(self, action: str) -> str:
+        """Get the URL of a CKAN action
+
+        Args:
+            action (str): CKAN action
+
+        Returns:
+            str: URL of action
+        """
+        return f"{self.site_url}/api/3/action/{action}"
+
+    def get_page(self, action: str, params: Dict, offset: int) -> List[Dict]:
+        """Get a page of results of a CKAN action
+
+        Args:
+            action (str): CKAN action
+            params (Dict): Parameters of action
+            offset (int): Offset of page
+
+        Returns:
+            List[Dict]: Results in page
+        """
+        params = dict(params)
+        params["limit"] = self.page_size
+        params["offset"] = offset
+        response = self.session.get(
+            self.get_action_url(action), params=params, timeout=self.timeout
+        )
+        response.raise_for_status()
+        result = response.json()
+        if not result.get("success"):
+            raise requests.HTTPError(
+                f"{action} failed with error {result.get('error')}!"
+            )
+        return result["result"]
+
+    def get_all(self, action: str, params: Dict) -> List[Dict]:
+        """Get all results of a paginated CKAN action requesting pages
+        concurrently
+
+        Args:
+            action (str): CKAN action
+            params (Dict): Parameters of action
+
+        Returns:
+            List[Dict]: Results
+        """
+        results = dict()
+        page = self.get_page(action, params, 0)
+        pages = 1
+        for result in page:
+            results[result["id"]] = result
+        rows_per_page = len(page)
+        if 0 < rows_per_page < self.page_size:
+            logger.info(
+                f"{action} returned {rows_per_page} of {self.page_size} requested results."
+            )
+        offset = rows_per_page
+        finished = rows_per_page == 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while not finished:
+                if pages + self.max_workers > self.max_pages:
+                    raise requests.HTTPError(
+                        f"{action} needs more than {self.max_pages} pages!"
+                    )
+                offsets = [
+                    offset + i * rows_per_page for i in range(self.max_workers)
+                ]
+                futures = [
+                    executor.submit(self.get_page, action, params, page_offset)
+                    for page_offset in offsets
+                ]
+                no_results = len(results)
+                for future in futures:
+                    page = future.result()
+                    pages += 1
+                    for result in page:
+                        results[result["id"]] = result
+                    if len(page) < rows_per_page:
+                        finished = True
+                if not finished and len(results) == no_results:
+                    logger.warning(f"{action} ignored offset!")
+                    finished = True
+                offset = offsets[-1] + rows_per_page
+        logger.info(
+            f"Downloaded {len(results)} results of {action} in {pages} pages."
+        )
+        return list(results.values())
+
+    def get_users(self) -> List[Dict]:
+        """Get all HDX users
+
+        Returns:
+            List[Dict]: Users
+        """
+        return self.get_all("user_list", {"order_by": "id"})
+
+    def get_organizations(self) -> List[Dict]:
+        """Get all HDX organisations including their users
+
+        Returns:
+            List[Dict]: Organisations
+        """
+        return self.get_all(
+            "organization_list",
+            {"all_fields": "true", "include_users": "true"},
+        )
@@ -0,0 +1,295 @@
+"""Functions that measure the queries of the freshness database
+"""
+import logging
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from hdx.utilities.saver import save_iterable
+from sqlalchemy import Result, Row, Select
+from sqlalchemy.orm import Session
+
+from .bulkloader import BulkLoader
+from .explain import Explain
+
+logger = logging.getLogger(__name__)
+
+
+class QueryProfiler:
+    """A class that measures each statement executed by DatabaseQueries. For each
+    statement, it records the time taken to execute it and fetch its rows (wall
+    time), the time taken to fetch its rows, the number of rows, the approximate
+    size of the values in bytes and its bound parameters. Optionally, the query
+    plan is also recorded. Statements that take longer than the slow threshold are
+    logged as warnings. The measurements form a table that can be logged or saved
+    for monitoring. All the rows of a statement are fetched before its
+    measurements are recorded so that they are complete and in order even if the
+    caller stops reading rows early. This means that rows that would otherwise be
+    streamed are held in memory while profiling.
+
+    Args:
+        slow_threshold (float): Wall time in seconds above which a statement is slow. Defaults to 1.0.
+        explain (bool): Whether to record query plans. Defaults to False.
+    """
+
+    headers = (
+        "run_number",
+        "name",
+        "wall_time",
+        "fetch_time",
+        "rows",
+        "bytes",
+        "slow",
+        "params",
+        "plan",
+    )
+
+    def __init__(self, slow_threshold: float = 1.0, explain: bool = False):
+        self.slow_threshold = slow_threshold
+        self.explain = explain
+        self.queries: List[Dict] = list()
+
+    @staticmethod
+    def get_size(row: Tuple) -> int:
+        """Get the approximate size in bytes of the values in a row as text
+
+        Args:
+            row (Tuple): Row
+
+        Returns:
+            int: Approximate size in bytes
+        """
+        return sum(len(str(value)) for value in row if value is not None)
+
+    @staticmethod
+    def get_params(session: Session, statement: Select) -> Dict[str, Any]:
+        """Get the bound parameters of a statement
+
+        Args:
+            session (sqlalchemy.orm.Session): Session used to execute statement
+            statement (Select): Statement
+
+        Returns:
+            Dict[str, Any]: Parameter name to value
+        """
+        dialect = session.get_bind().dialect
+        return statement.compile(dialect=dialect).params
+
+    @staticmethod
+    def get_plan(session: Session, statement: Select) -> List[str]:
+        """Get the query plan of a statement
+
+        Args:
+            session (sqlalchemy.orm.Session): Session used to execute statement
+            statement (Select): Statement
+
+        Returns:
+            List[str]: Lines of query plan
+        """
+        results = session.execute(Explain(statement))
+        return [str(result[-1]) for result in results]
+
+    def record(
+        self,
+        session: Session,
+        name: str,
+        statement: Select,
+        wall_time: float,
+        fetch_time: float,
+        norows: int,
+        nobytes: int,
+    ) -> Dict:
+        """Record the measurements of a statement
+
+        Args:
+            session (sqlalchemy.orm.Session): Session used to execute statement
+            name (str): Name of statement
+            statement (Select): Statement
+            wall_time (float): Time to execute statement and fetch rows in seconds
+            fetch_time (float): Time to fetch rows in seconds
+            norows (int): Number of rows
+            nobytes (int): Approximate size of values in bytes
+
+        Returns:
+            Dict: Measurements of statement
+        """
+        slow = wall_time > self.slow_threshold
+        query = {
+            "name": name,
+            "wall_time": wall_time,
+            "fetch_time": fetch_time,
+            "rows": norows,
+            "bytes": nobytes,
+            "slow": slow,
+            "params": self.get_params(session, statement),
+            "plan": None,
+        }
+        if self.explain:
+            query["plan"] = self.get_plan(session, statement)
+        self.queries.append(query)
+        message = f"SQL query {name} returned {norows} rows ({nobytes} bytes) in {wall_time:.3f}s (fetch {fetch_time:.3f}s)."
+        if slow:
+            logger.warning(f"Slow {message}")
+        else:
+            logger.info(message)
+        return query
+
+    def fetch(
+        self,
+        session: Session,
+        name: str,
+        statement: Select,
+        results: Result,
+        execute_time: float,
+    ) -> List[Row]:
+        """Fetch all the rows of a result and record the measurements of the
+        statement
+
+        Args:
+            session (sqlalchemy.orm.Session): Session used to execute statement
+            name (str): Name of statement
+            statement (Select): Statement
+            results (Result): Result of executing statement
+            execute_time (float): Time taken to execute statement in seconds
+
+        Returns:
+            List[Row]: Rows
+        """
+        fetch_start = perf_counter()
+        rows = results.all()
+        fetch_time = perf_counter() - fetch_start
+        nobytes = sum(self.get_size(row) for row in rows)
+        self.record(
+            session,
+            name,
+            statement,
+            execute_time + fetch_time,
+            fetch_time,
+            len(rows),
+            nobytes,
+        )
+        return rows
+
+    def execute(
+        self,
+        session: Session,
+        name: str,
+        statement: Select,
+        execution_options: Optional[Dict] = None,
+    ) -> List[Row]:
+        """Execute a statement and fetch all its rows recording its measurements
+
+        Args:
+            session (sqlalchemy.orm.Session): Session to use to execute statement
+            name (str): Name of statement
+            statement (Select): Statement
+            execution_options (Optional[Dict]): Execution options. Defaults to None.
+
+        Returns:
+            List[Row]: Rows
+        """
+        start = perf_counter()
+        if execution_options is None:
+            execution_options = dict()
+        results = session.execute(
+            statement, execution_options=execution_options
+        )
+        execute_time = perf_counter() - start
+        return self.fetch(session, name, statement, results, execute_time)
+
+    def load(
+        self,
+        bulkloader: BulkLoader,
+        name: str,
+        statement: Select,
+    ) -> Dict[str, Tuple]:
+        """Bulk load the results of a statement recording its measurements. The
+        rows are fetched as part of loading so the fetch time is not measured
+        separately.
+
+        Args:
+            bulkloader (BulkLoader): Bulk loader to use to load results
+            name (str): Name of statement
+            statement (Select): Statement
+
+        Returns:
+            Dict[str, Tuple]: Column name to values
+        """
+        start = perf_counter()
+        columns = bulkloader.load(statement)
+        wall_time = perf_counter() - start
+        values = list(columns.values())
+        if values:
+            norows = len(values[0])
+        else:
+            norows = 0
+        nobytes = sum(self.get_size(column) for column in values)
+        self.record(
+            bulkloader.session,
+            name,
+            statement,
+            wall_time,
+            0.0,
+            norows,
+            nobytes,
+        )
+        return columns
+
+    def get_slow_queries(self) -> List[Dict]:
+        """Get the measurements of statements that were slow
+
+        Returns:
+            List[Dict]: Measurements of slow statements
+        """
+        return [query for query in self.queries if query["slow"]]
+
+    def get_table(self, run_number: Optional[int] = None) -> List[Dict]:
+        """Get the measurements of all statements as rows of a table
+
+        Args:
+            run_number (Optional[int]): Run number to add to rows. Defaults to None.
+
+        Returns:
+            List[Dict]: Rows of table
+        """
+        table = list()
+        for query in self.queries:
+            row = {"run_number": run_number}
+            row.update(query)
+            row["wall_time"] = round(row["wall_time"], 6)
+            row["fetch_time"] = round(row["fetch_time"], 6)
+            row["params"] = str(row["params"])
+            plan = row["plan"]
+            if plan is not None:
+                row["plan"] = "\n".join(plan)
+            table.append(row)
+        return table
+
+    def log_table(self) -> None:
+        """Log a summary of the measurements of all statements
+
+        Returns:
+            None
+        """
+        lines = ["name | wall_time | fetch_time | rows | bytes | slow"]
+        for query in self.queries:
+            lines.append(
+                f"{query['name']} | {query['wall_time']:.3f} | {query['fetch_time']:.3f} | {query['rows']} | {query['bytes']} | {query['slow']}"
+            )
+        logger.info("\n".join(lines))
+
+    def save(self, path: str, run_number: Optional[int] = None) -> None:
+        """Save the measurements of all statements to a csv file
+
+        Args:
+            path (str): Path of csv file
+            run_number (Optional[int]): Run number to add to rows. Defaults to None.
+
+        Returns:
+            None
+        """
+        save_iterable(
+            path,
+            self.get_table(run_number),
+            headers=list(self.headers),
+            no_empty=False,
+        )
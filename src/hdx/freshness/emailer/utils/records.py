@@ -0,0 +1,246 @@
+"""Compact record types for freshness database rows and HDX users
+"""
+from collections.abc import Mapping, MutableMapping
+from datetime import datetime
+from sys import intern
+from typing import FrozenSet, Iterator, Optional, Sequence
+
+
+class Record(MutableMapping):
+    """Base class for slotted records. Records are built positionally from query
+    rows so no per-column dictionary is created. They can be accessed like
+    dictionaries (eg. record["name"] or record.get("name")) so that code written
+    for dictionaries continues to work. A key exists if its slot has been set.
+    Keys are checked against a frozenset of the slots of each record type.
+    """
+
+    __slots__ = ()
+    field_names: FrozenSet[str] = frozenset()
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        cls.field_names = frozenset(cls.__slots__)
+
+    @classmethod
+    def from_row(cls, row: Sequence) -> "Record":
+        """Create record from a query row whose columns are in the same order as
+        the record's slots
+
+        Args:
+            row (Sequence): Query row
+
+        Returns:
+            Record: Record
+        """
+        return cls(*row)
+
+    def __getitem__(self, key: str):
+        if key not in self.field_names:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value) -> None:
+        if key not in self.field_names:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self:
+            raise KeyError(key)
+        delattr(self, key)
+
+    def __contains__(self, key) -> bool:
+        return key in self.field_names and hasattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self.__slots__:
+            if hasattr(self, key):
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        items = ", ".join(f"{key}={value!r}" for key, value in self.items())
+        return f"{self.__class__.__name__}({items})"
+
+    def copy(self) -> "Record":
+        """Get a shallow copy of the record
+
+        Returns:
+            Record: Copy of record
+        """
+        record = self.__class__.__new__(self.__class__)
+        for key in self.__slots__:
+            try:
+                setattr(record, key, getattr(self, key))
+            except AttributeError:
+                pass
+        return record
+
+    __copy__ = copy
+
+
+class ResourceRecord(Record):
+    """A resource with an error in the current run
+
+    Args:
+        id (str): Resource id
+        name (str): Resource name
+        error (str): Resource error
+    """
+
+    __slots__ = ("id", "name", "error")
+
+    def __init__(self, id: str, name: str, error: str):
+        self.id = id
+        self.name = name
+        self.error = error
+
+
+class DatasetRecord(Record):
+    """A dataset in the current run along with its freshness, what updated and
+    reference period in the previous run. The order of the arguments is the order
+    of the columns in DatabaseQueries.get_snapshot_statement. The resources slot is
+    only set for datasets with broken resources.
+
+    Args:
+        id (str): Dataset id
+        name (str): Dataset name
+        title (str): Dataset title
+        maintainer (Optional[str]): Maintainer id
+        organization_id (str): Organisation id
+        organization_name (str): Organisation name
+        organization_title (str): Organisation title
+        dataset_date (Optional[str]): Reference period
+        update_frequency (Optional[int]): Update frequency in days
+        latest_of_modifieds (datetime): Latest of the modified dates
+        what_updated (str): What updated in the current run
+        fresh (Optional[int]): Freshness status
+        prev_fresh (Optional[int]): Freshness status in previous run. Defaults to None.
+        prev_what_updated (Optional[str]): What updated in previous run. Defaults to None.
+        prev_dataset_date (Optional[str]): Reference period in previous run. Defaults to None.
+    """
+
+    __slots__ = (
+        "id",
+        "name",
+        "title",
+        "maintainer",
+        "organization_id",
+        "organization_name",
+        "organization_title",
+        "dataset_date",
+        "update_frequency",
+        "latest_of_modifieds",
+        "what_updated",
+        "fresh",
+        "prev_fresh",
+        "prev_what_updated",
+        "prev_dataset_date",
+        "resources",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        name: str,
+        title: str,
+        maintainer: Optional[str],
+        organization_id: str,
+        organization_name: str,
+        organization_title: str,
+        dataset_date: Optional[str],
+        update_frequency: Optional[int],
+        latest_of_modifieds: datetime,
+        what_updated: str,
+        fresh: Optional[int],
+        prev_fresh: Optional[int] = None,
+        prev_what_updated: Optional[str] = None,
+        prev_dataset_date: Optional[str] = None,
+    ):
+        self.id = id
+        self.name = name
+        self.title = title
+        self.maintainer = maintainer
+        self.organization_id = organization_id
+        self.organization_name = organization_name
+        self.organization_title = organization_title
+        self.dataset_date = dataset_date
+        self.update_frequency = update_frequency
+        self.latest_of_modifieds = latest_of_modifieds
+        self.what_updated = what_updated
+        self.fresh = fresh
+        self.prev_fresh = prev_fresh
+        self.prev_what_updated = prev_what_updated
+        self.prev_dataset_date = prev_dataset_date
+
+    def with_resources(self) -> "DatasetRecord":
+        """Get a copy of the dataset with an empty list of resources
+
+        Returns:
+            DatasetRecord: Copy of dataset with empty list of resources
+        """
+        dataset = self.copy()
+        dataset.resources = list()
+        return dataset
+
+
+class UserRecord(Record):
+    """An HDX user holding only the fields read by the emailer
+
+    Args:
+        id (str): User id
+        name (str): User name
+        fullname (Optional[str]): Full name
+        display_name (Optional[str]): Display name
+        email (Optional[str]): Email address
+        sysadmin (bool): Whether user is a system administrator
+    """
+
+    __slots__ = ("id", "name", "fullname", "display_name", "email", "sysadmin")
+
+    def __init__(
+        self,
+        id: str,
+        name: str,
+        fullname: Optional[str],
+        display_name: Optional[str],
+        email: Optional[str],
+        sysadmin: bool,
+    ):
+        self.id = id
+        self.name = name
+        self.fullname = fullname
+        self.display_name = display_name
+        self.email = email
+        self.sysadmin = sysadmin
+
+    @classmethod
+    def from_user(cls, user: Mapping) -> "UserRecord":
+        """Create record from an HDX user interning its strings
+
+        Args:
+            user (Mapping): HDX user
+
+        Returns:
+            UserRecord: Record
+        """
+
+        def get_string(key: str) -> Optional[str]:
+            value = user.get(key)
+            if value is None:
+                return None
+            return intern(value)
+
+        return cls(
+            intern(user["id"]),
+            get_string("name"),
+            get_string("fullname"),
+            get_string("display_name"),
+            get_string("email"),
+            bool(user.get("sysadmin")),
+        )
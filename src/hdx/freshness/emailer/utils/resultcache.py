@@ -0,0 +1,254 @@
+"""Functions that cache the results of freshness database queries on disk
+"""
+import json
+import logging
+import os
+from datetime import datetime
+from hashlib import sha256
+from os import listdir, makedirs, remove, replace, stat, utime
+from os.path import exists, join
+from tempfile import mkstemp
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Dialect, Select
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """A class that keeps the rows returned by freshness database statements in a
+    folder of JSON files. The rows for a pair of current and previous runs do
+    not change once the freshness run has finished so repeat emailer runs on the
+    same day (eg. retries after a Google Sheets or email failure) can be served
+    from the cache without querying the database. Files are keyed by statement
+    name, current run number, previous run number and schema version together with
+    a digest of the compiled statement, its parameters and the states of the runs
+    (see RunCatalog.get_run_state), so rows read while freshness was still writing
+    a run are not used once the run has changed. Files are written to a temporary
+    file that then replaces the cache file and writes are serialised so the cache
+    can be used from several threads. When the total size of the files exceeds
+    max_size, the least recently used files are removed. The folder is created
+    private to the user if it does not exist and a folder that is owned by another
+    user or writable by others is rejected.
+
+    Args:
+        folder (str): Folder for cache files
+        max_size (int): Maximum total size of cache files in bytes. Defaults to 500MB.
+    """
+
+    schema_version = 3
+    extension = ".json"
+
+    def __init__(self, folder: str, max_size: int = 500 * 1024 * 1024):
+        makedirs(folder, mode=0o700, exist_ok=True)
+        self.check_folder(folder)
+        self.folder = folder
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.lock = Lock()
+
+    @staticmethod
+    def check_folder(folder: str) -> None:
+        """Check that a folder is owned by the user and not writable by others
+
+        Args:
+            folder (str): Folder
+
+        Returns:
+            None
+        """
+        if not hasattr(os, "geteuid"):  # pragma: no cover
+            return
+        folderstat = stat(folder)
+        if folderstat.st_uid != os.geteuid():
+            raise ValueError(
+                f"Result cache folder {folder} not owned by user!"
+            )
+        if folderstat.st_mode & 0o022:
+            raise ValueError(
+                f"Result cache folder {folder} writable by other users!"
+            )
+
+    @staticmethod
+    def encode(value: Any) -> Dict:
+        """Encode a value that JSON does not support
+
+        Args:
+            value (Any): Value
+
+        Returns:
+            Dict: Encoded value
+        """
+        if isinstance(value, datetime):
+            return {"datetime": value.isoformat()}
+        raise TypeError(f"Cannot cache value of type {type(value).__name__}!")
+
+    @staticmethod
+    def decode(value: Dict) -> Any:
+        """Decode a value encoded by encode
+
+        Args:
+            value (Dict): Encoded value
+
+        Returns:
+            Any: Value
+        """
+        if value.keys() == {"datetime"}:
+            return datetime.fromisoformat(value["datetime"])
+        return value
+
+    def get_key(
+        self,
+        name: str,
+        run_numbers: List[Tuple],
+        run_states: List[Tuple],
+        statement: Select,
+        dialect: Dialect,
+    ) -> str:
+        """Get the key of the rows of a statement for the current and previous runs
+
+        Args:
+            name (str): Name of statement
+            run_numbers (List[Tuple]): List of (run number, run date) of current and previous runs
+            run_states (List[Tuple]): States of current and previous runs
+            statement (Select): Statement
+            dialect (Dialect): Dialect of database
+
+        Returns:
+            str: Key
+        """
+        cur_run_number = run_numbers[0][0] if run_numbers else None
+        prev_run_number = run_numbers[1][0] if len(run_numbers) > 1 else None
+        compiled = statement.compile(dialect=dialect)
+        params = sorted(compiled.params.items())
+        digest = sha256(
+            f"{compiled}{params}{run_states}".encode()
+        ).hexdigest()[:16]
+        return f"{name}_{cur_run_number}_{prev_run_number}_v{self.schema_version}_{digest}"
+
+    def get_path(self, key: str) -> str:
+        """Get the path of the file for a key
+
+        Args:
+            key (str): Key
+
+        Returns:
+            str: Path of file
+        """
+        return join(self.folder, f"{key}{self.extension}")
+
+    def get(self, key: str) -> Optional[List[Tuple]]:
+        """Get the rows for a key if they are in the cache
+
+        Args:
+            key (str): Key
+
+        Returns:
+            Optional[List[Tuple]]: Rows or None if not in cache
+        """
+        path = self.get_path(key)
+        if not exists(path):
+            return None
+        try:
+            with open(path) as f:
+                rows = json.load(f, object_hook=self.decode)
+            utime(path)
+        except (OSError, ValueError):
+            logger.warning(f"Could not read cache file {path}!")
+            return None
+        return [tuple(row) for row in rows]
+
+    def set(self, key: str, rows: List[Tuple]) -> None:
+        """Add the rows for a key to the cache then remove least recently used
+        files if the cache is too big. The rows are written to a temporary file
+        that then replaces the cache file.
+
+        Args:
+            key (str): Key
+            rows (List[Tuple]): Rows
+
+        Returns:
+            None
+        """
+        path = self.get_path(key)
+        with self.lock:
+            fd, temppath = mkstemp(suffix=".tmp", dir=self.folder)
+            try:
+                with open(fd, "w") as f:
+                    json.dump(rows, f, default=self.encode)
+                replace(temppath, path)
+            except BaseException:
+                if exists(temppath):
+                    remove(temppath)
+                raise
+            self.evict()
+
+    def evict(self) -> List[str]:
+        """Remove least recently used files until the total size of the cache is
+        no more than max_size
+
+        Returns:
+            List[str]: Keys of removed files
+        """
+        files = list()
+        total_size = 0
+        for filename in listdir(self.folder):
+            if not filename.endswith(self.extension):
+                continue
+            try:
+                filestat = stat(join(self.folder, filename))
+            except FileNotFoundError:
+                continue
+            files.append((filestat.st_mtime, filestat.st_size, filename))
+            total_size += filestat.st_size
+        evicted = list()
+        for _, size, filename in sorted(files):
+            if total_size <= self.max_size:
+                break
+            try:
+                remove(join(self.folder, filename))
+            except FileNotFoundError:
+                pass
+            total_size -= size
+            evicted.append(filename[: -len(self.extension)])
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} files from result cache.")
+        return evicted
+
+    def get_rows(
+        self,
+        name: str,
+        run_numbers: List[Tuple],
+        run_states: List[Tuple],
+        statement: Select,
+        dialect: Dialect,
+        get_rows: Callable[[], Iterable[Tuple]],
+    ) -> List[Tuple]:
+        """Get the rows of a statement from the cache or if they are not there, get
+        them using the supplied function and add them to the cache
+
+        Args:
+            name (str): Name of statement
+            run_numbers (List[Tuple]): List of (run number, run date) of current and previous runs
+            run_states (List[Tuple]): States of current and previous runs
+            statement (Select): Statement
+            dialect (Dialect): Dialect of database
+            get_rows (Callable[[], Iterable[Tuple]]): Function that gets the rows from the database
+
+        Returns:
+            List[Tuple]: Rows
+        """
+        key = self.get_key(name, run_numbers, run_states, statement, dialect)
+        rows = self.get(key)
+        if rows is not None:
+            with self.lock:
+                self.hits += 1
+            logger.info(f"Result cache returned {len(rows)} rows for {name}.")
+            return rows
+        with self.lock:
+            self.misses += 1
+        rows = [tuple(row) for row in get_rows()]
+        self.set(key, rows)
+        return rows
@@ -0,0 +1,139 @@
+"""Functions that look up runs in the freshness database
+"""
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from hdx.freshness.database.dbdataset import DBDataset
+from hdx.freshness.database.dbresource import DBResource
+from hdx.freshness.database.dbrun import DBRun
+from sqlalchemy import BindParameter, func, literal, select
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+class RunCatalog:
+    """A class that looks up freshness runs and their dates. Only the current and
+    previous runs are read on construction so that startup cost does not grow with
+    the number of runs in the freshness database. The state of a run can be
+    recorded with anything copied from it and compared later to tell whether the
+    run has changed since, for example because freshness was still writing it.
+    If partition_aware is True, run numbers are rendered into statements as
+    literals so that PostgreSQL can prune partitions of tables partitioned by run
+    number.
+
+    Args:
+        session (sqlalchemy.orm.Session): Session to use for queries
+        now (datetime): Date to use for now
+        partition_aware (bool): Whether to render run numbers as literals. Defaults to False.
+    """
+
+    def __init__(
+        self, session: Session, now: datetime, partition_aware: bool = False
+    ):
+        self.session = session
+        self.now = now
+        self.partition_aware = partition_aware
+        self.run_states: Dict[
+            int, Tuple[int, Optional[datetime], Optional[datetime]]
+        ] = dict()
+        self.run_numbers = self.get_cur_prev_runs()
+
+    def get_cur_prev_runs(self) -> List[Tuple]:
+        """Get the latest run before now and the run before it as a list of tuples
+        of the form (run number, run date)
+
+        Returns:
+             List[Tuple]: List of (run number, run date)
+        """
+        results = self.session.execute(
+            select(DBRun.run_number, DBRun.run_date)
+            .where(DBRun.run_date < self.now)
+            .order_by(DBRun.run_number.desc())
+            .limit(2)
+        )
+        run_numbers = list()
+        for run_number, run_date in results:
+            run_numbers.append((run_number, run_date))
+        return run_numbers
+
+    def get_run_numbers(self) -> List[Tuple]:
+        """Get run numbers as list of tuples of the form (run number, run date)
+
+        Returns:
+             List[Tuple]: List of (run number, run date)
+        """
+        return self.run_numbers
+
+    def get_literal(self, run_number: int) -> Union[int, BindParameter]:
+        """Get a run number for use in a statement. In partition aware mode, it is
+        rendered into the SQL as a literal rather than sent as a parameter.
+
+        Args:
+            run_number (int): Run number
+
+        Returns:
+            Union[int, BindParameter]: Run number or literal run number
+        """
+        if self.partition_aware:
+            return literal(run_number, literal_execute=True)
+        return run_number
+
+    def get_literals(
+        self, run_numbers: Iterable[int]
+    ) -> List[Union[int, BindParameter]]:
+        """Get run numbers for use in an IN clause of a statement. In partition
+        aware mode, they are rendered into the SQL as literals.
+
+        Args:
+            run_numbers (Iterable[int]): Run numbers
+
+        Returns:
+            List[Union[int, BindParameter]]: Run numbers or literal run numbers
+        """
+        return [self.get_literal(run_number) for run_number in run_numbers]
+
+    def get_run_state(
+        self, run_number: int
+    ) -> Tuple[int, Optional[datetime], Optional[datetime]]:
+        """Get the state of a run ie. the number of datasets in it, the latest of
+        their latest of modifieds and the latest time one of its resources was
+        checked. Freshness adds all the datasets and resources of a run, then
+        updates the resources it checks setting when checked to the run date and
+        then updates the datasets whose resources have changed setting their
+        latest of modifieds to the run date, so the state changes while a run is
+        being written.
+
+        Args:
+            run_number (int): Run number
+
+        Returns:
+            Tuple[int, Optional[datetime], Optional[datetime]]:
+            (number of datasets, latest of modifieds, when checked)
+        """
+        run_state = self.run_states.get(run_number)
+        if run_state is None:
+            datasets, latest_of_modifieds = self.session.execute(
+                select(
+                    func.count(DBDataset.id),
+                    func.max(DBDataset.latest_of_modifieds),
+                ).where(DBDataset.run_number == self.get_literal(run_number))
+            ).one()
+            when_checked = self.session.scalar(
+                select(func.max(DBResource.when_checked)).where(
+                    DBResource.run_number == self.get_literal(run_number)
+                )
+            )
+            run_state = datasets, latest_of_modifieds, when_checked
+            self.run_states[run_number] = run_state
+        return run_state
+
+    def get_run_window(self) -> Tuple[datetime, datetime]:
+        """Get the dates of the previous and current runs. Requires that there are
+        at least two runs.
+
+        Returns:
+            Tuple[datetime, datetime]: (previous run date, current run date)
+        """
+        return self.run_numbers[1][1], self.run_numbers[0][1]
@@ -0,0 +1,177 @@
+"""Functions that export the current and previous freshness runs to a compressed
+local file and load them back
+"""
+import gzip
+import logging
+import shutil
+from os.path import join
+from tempfile import TemporaryDirectory
+from typing import Dict, List, Tuple
+
+from hdx.freshness.database.dbdataset import DBDataset
+from hdx.freshness.database.dbinfodataset import DBInfoDataset
+from hdx.freshness.database.dborganization import DBOrganization
+from hdx.freshness.database.dbresource import DBResource
+from hdx.freshness.database.dbrun import DBRun
+from sqlalchemy import Connection, Select, Table, create_engine, insert, select
+
+from .databasequeries import DatabaseQueries
+
+logger = logging.getLogger(__name__)
+
+
+class RunSnapshot:
+    """A class that exports the rows of the freshness database needed by the
+    emailer for the current and previous runs to a gzip compressed SQLite file with
+    the same schema. The history of the datasets modified since the previous run
+    is also exported so that the reference period check gives the same results. The
+    file can be loaded and used instead of the freshness database eg. for repeat
+    runs on the same day or to reproduce a run locally.
+
+    Args:
+        databasequeries (DatabaseQueries): DatabaseQueries object
+    """
+
+    tables = (DBRun, DBOrganization, DBInfoDataset, DBDataset, DBResource)
+
+    def __init__(self, databasequeries: DatabaseQueries):
+        self.databasequeries = databasequeries
+        self.session = databasequeries.session
+        self.run_numbers = databasequeries.run_numbers
+
+    def get_statements(self) -> List[Tuple[Table, Select]]:
+        """Get the statements that select the rows to export from each table.
+        Requires that there is at least one run.
+
+        Returns:
+            List[Tuple[Table, Select]]: List of (table, statement)
+        """
+        runcatalog = self.databasequeries.runcatalog
+        run_number = runcatalog.get_literal(self.run_numbers[0][0])
+        run_numbers = runcatalog.get_literals(x[0] for x in self.run_numbers)
+        dataset_ids = select(DBDataset.id).where(
+            DBDataset.run_number == run_number
+        )
+        organization_ids = select(DBInfoDataset.organization_id).where(
+            DBInfoDataset.id.in_(dataset_ids)
+        )
+        statements = [
+            (
+                DBRun.__table__,
+                select(DBRun.__table__).where(DBRun.run_number <= run_number),
+            ),
+            (
+                DBOrganization.__table__,
+                select(DBOrganization.__table__).where(
+                    DBOrganization.id.in_(organization_ids)
+                ),
+            ),
+            (
+                DBInfoDataset.__table__,
+                select(DBInfoDataset.__table__).where(
+                    DBInfoDataset.id.in_(dataset_ids)
+                ),
+            ),
+            (
+                DBDataset.__table__,
+                select(DBDataset.__table__).where(
+                    DBDataset.run_number.in_(run_numbers)
+                ),
+            ),
+        ]
+        history_ids = list(
+            self.databasequeries.get_datasets_modified_yesterday().keys()
+        )
+        batch_size = self.databasequeries.batch_size
+        for i in range(0, len(history_ids), batch_size):
+            batch = history_ids[i : i + batch_size]
+            statements.append(
+                (
+                    DBDataset.__table__,
+                    select(DBDataset.__table__).where(
+                        DBDataset.id.in_(batch),
+                        DBDataset.run_number < run_numbers[-1],
+                    ),
+                )
+            )
+        statements.append(
+            (
+                DBResource.__table__,
+                select(DBResource.__table__).where(
+                    DBResource.run_number.in_(run_numbers)
+                ),
+            )
+        )
+        return statements
+
+    def copy_rows(
+        self, connection: Connection, table: Table, statement: Select
+    ) -> int:
+        """Copy the rows returned by a statement into a table of another database
+
+        Args:
+            connection (Connection): Connection to database to copy into
+            table (Table): Table to copy into
+            statement (Select): Statement that selects rows to copy
+
+        Returns:
+            int: Number of rows copied
+        """
+        yield_per = self.databasequeries.yield_per
+        results = self.session.execute(
+            statement, execution_options={"yield_per": yield_per}
+        )
+        norows = 0
+        for rows in results.mappings().partitions():
+            connection.execute(insert(table), [dict(row) for row in rows])
+            norows += len(rows)
+        return norows
+
+    def export(self, path: str) -> Dict[str, int]:
+        """Export the current and previous runs to a gzip compressed SQLite file
+
+        Args:
+            path (str): Path of file to create
+
+        Returns:
+            Dict[str, int]: Table name to number of rows exported
+        """
+        norows = dict()
+        if len(self.run_numbers) == 0:
+            logger.error("No runs to export!")
+            return norows
+        tables = [x.__table__ for x in self.tables]
+        with TemporaryDirectory() as tempdir:
+            dbpath = join(tempdir, "snapshot.db")
+            engine = create_engine(f"sqlite:///{dbpath}")
+            DBRun.metadata.create_all(engine, tables=tables)
+            with engine.begin() as connection:
+                for table, statement in self.get_statements():
+                    norows[table.name] = norows.get(
+                        table.name, 0
+                    ) + self.copy_rows(connection, table, statement)
+            engine.dispose()
+            with open(dbpath, "rb") as input:
+                with gzip.open(path, "wb") as output:
+                    shutil.copyfileobj(input, output)
+        logger.info(f"Exported {norows} rows to {path}.")
+        return norows
+
+    @staticmethod
+    def load(path: str, folder: str) -> Dict[str, str]:
+        """Decompress an exported snapshot into a folder and get the database
+        parameters needed to open it
+
+        Args:
+            path (str): Path of exported snapshot
+            folder (str): Folder in which to put decompressed database
+
+        Returns:
+            Dict[str, str]: Database parameters
+        """
+        dbpath = join(folder, "freshness_snapshot.db")
+        with gzip.open(path, "rb") as input:
+            with open(dbpath, "wb") as output:
+                shutil.copyfileobj(input, output)
+        logger.info(f"Loaded snapshot {path} into {dbpath}.")
+        return {"dialect": "sqlite", "database": dbpath}
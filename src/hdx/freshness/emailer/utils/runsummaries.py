@@ -0,0 +1,229 @@
+"""Functions that maintain the table of summaries of freshness runs
+"""
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from hdx.freshness.database.dbdataset import DBDataset
+from hdx.freshness.database.dbresource import DBResource
+from hdx.freshness.database.dbrun import DBRun
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.orm import Session
+
+from .dbrunsummary import DBRunSummary
+from .runcatalog import RunCatalog
+
+logger = logging.getLogger(__name__)
+
+
+class RunSummaries:
+    """A class that maintains a sidecar table holding, for each run, the number of
+    datasets, the number of datasets in each freshness status and the number of
+    resources with errors. Each summary records the state of its run (see
+    RunCatalog.get_run_state) and summaries whose run has changed since are
+    rebuilt. A run is only added to the table once a newer run exists, since until
+    then freshness may still be writing it, so the summary of the newest run is
+    kept in memory. After the first emailer run, only the newest run needs to be
+    summarised from DBDataset.
+
+    Args:
+        session (sqlalchemy.orm.Session): Session to use for queries
+        runcatalog (RunCatalog): Catalog of current and previous runs
+    """
+
+    window = 7
+    statuses = ("fresh", "due", "overdue", "delinquent")
+
+    def __init__(self, session: Session, runcatalog: RunCatalog):
+        self.session = session
+        self.runcatalog = runcatalog
+        self.run_numbers = runcatalog.get_run_numbers()
+        self.summaries: Optional[Dict[int, DBRunSummary]] = None
+
+    def create_table(self) -> None:
+        """Create the run summaries table if it does not exist
+
+        Returns:
+            None
+        """
+        DBRunSummary.__table__.create(
+            self.session.connection(), checkfirst=True
+        )
+
+    def get_runs(self) -> List[Tuple]:
+        """Get the current run and the window of runs before it as a list of tuples
+        of the form (run number, run date) ordered from newest to oldest
+
+        Returns:
+            List[Tuple]: List of (run number, run date)
+        """
+        results = self.session.execute(
+            select(DBRun.run_number, DBRun.run_date)
+            .where(
+                DBRun.run_number
+                <= self.runcatalog.get_literal(self.run_numbers[0][0])
+            )
+            .order_by(DBRun.run_number.desc())
+            .limit(self.window + 1)
+        )
+        return [(run_number, run_date) for run_number, run_date in results]
+
+    def get_summaries(self) -> Dict[int, DBRunSummary]:
+        """Get the summaries of the current run and the window of runs before it,
+        adding or rebuilding them if needed. Requires that there is at least one
+        run.
+
+        Returns:
+            Dict[int, DBRunSummary]: Run number to summary ordered from newest to oldest
+        """
+        if self.summaries is None:
+            self.populate()
+        return self.summaries
+
+    def get_summary_values(self, runs: List[Tuple]) -> List[Dict]:
+        """Get the summaries of the given runs from DBDataset and DBResource
+
+        Args:
+            runs (List[Tuple]): List of (run number, run date)
+
+        Returns:
+            List[Dict]: Summaries as column name to value
+        """
+        summaries = dict()
+        for run_number, run_date in runs:
+            summary = {
+                "run_number": run_number,
+                "run_date": run_date,
+                "datasets": 0,
+                "resource_errors": 0,
+            }
+            for status in self.statuses:
+                summary[status] = 0
+            summaries[run_number] = summary
+        run_numbers = self.runcatalog.get_literals(summaries.keys())
+        status_columns = [
+            func.sum(case((DBDataset.fresh == i, 1), else_=0))
+            for i in range(len(self.statuses))
+        ]
+        results = self.session.execute(
+            select(
+                DBDataset.run_number, func.count(DBDataset.id), *status_columns
+            )
+            .where(DBDataset.run_number.in_(run_numbers))
+            .group_by(DBDataset.run_number)
+        )
+        for run_number, datasets, *status_counts in results:
+            summary = summaries[run_number]
+            summary["datasets"] = datasets
+            for status, count in zip(self.statuses, status_counts):
+                summary[status] = count
+        results = self.session.execute(
+            select(DBResource.run_number, func.count(DBResource.id))
+            .where(
+                DBResource.run_number.in_(run_numbers),
+                DBResource.error.is_not(None),
+            )
+            .group_by(DBResource.run_number)
+        )
+        for run_number, resource_errors in results:
+            summaries[run_number]["resource_errors"] = resource_errors
+        return list(summaries.values())
+
+    def populate(self) -> int:
+        """Add the summaries of the current run and the window of runs before it
+        to the table if they are not already there or their run has changed since
+        they were added. Summaries of runs for which there is no newer run are not
+        added to the table.
+
+        Returns:
+            int: Number of summaries added
+        """
+        self.summaries = dict()
+        if len(self.run_numbers) == 0:
+            return 0
+        self.create_table()
+        runs = self.get_runs()
+        run_states = {
+            run_number: self.runcatalog.get_run_state(run_number)
+            for run_number, _ in runs
+        }
+        results = self.session.scalars(
+            select(DBRunSummary).where(
+                DBRunSummary.run_number.in_(run_states.keys())
+            )
+        )
+        stored = {summary.run_number: summary for summary in results}
+        changed = list()
+        missing = list()
+        for run in runs:
+            run_number = run[0]
+            summary = stored.get(run_number)
+            if summary is not None:
+                run_state = (
+                    summary.datasets,
+                    summary.latest_of_modifieds,
+                    summary.when_checked,
+                )
+                if run_state == run_states[run_number]:
+                    self.summaries[run_number] = summary
+                    continue
+                changed.append(run_number)
+            self.summaries[run_number] = None
+            missing.append(run)
+        if not missing:
+            return 0
+        if changed:
+            self.session.execute(
+                delete(DBRunSummary).where(
+                    DBRunSummary.run_number.in_(changed)
+                )
+            )
+        latest_run_number = self.session.scalar(
+            select(func.max(DBRun.run_number))
+        )
+        added = 0
+        for values in self.get_summary_values(missing):
+            run_number = values["run_number"]
+            _, latest_of_modifieds, when_checked = run_states[run_number]
+            summary = DBRunSummary(
+                latest_of_modifieds=latest_of_modifieds,
+                when_checked=when_checked,
+                **values,
+            )
+            # Freshness may still be writing the newest run
+            if run_number < latest_run_number:
+                self.session.add(summary)
+                added += 1
+            self.summaries[run_number] = summary
+        self.session.commit()
+        logger.info(
+            f"Added {added} run summaries of which {len(changed)} were rebuilt."
+        )
+        return added
+
+    def get_number_datasets(self) -> Tuple[int, int]:
+        """Get the number of datasets today and yesterday in a tuple. Requires that
+        there are at least two runs.
+
+        Returns:
+             Tuple[int, int]: (number of datasets today, number of datasets yesterday)
+        """
+        summaries = self.get_summaries()
+        return (
+            summaries[self.run_numbers[0][0]].datasets,
+            summaries[self.run_numbers[1][0]].datasets,
+        )
+
+    def get_previous_number_datasets(self) -> List[int]:
+        """Get the number of datasets in each of the window of runs before the
+        current run ordered from newest to oldest
+
+        Returns:
+             List[int]: Number of datasets in each run
+        """
+        summaries = self.get_summaries()
+        run_number = self.run_numbers[0][0]
+        return [
+            summary.datasets
+            for summary in summaries.values()
+            if summary.run_number != run_number
+        ]
@@ -3,7 +3,7 @@
 import json
 import logging
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Mapping, Optional, Sequence
 
 import gspread
 from hdx.api.configuration import Configuration
@@ -364,18 +364,18 @@ class Sheet:
     @staticmethod
     def construct_row(
         hdxhelper: HDXHelper,
-        dataset: Dict,
-        maintainer: Dict[str, str],
-        orgadmins: List[Dict[str, str]],
+        dataset: Mapping,
+        maintainer: Optional[Mapping[str, str]],
+        orgadmins: Sequence[Mapping[str, str]],
     ) -> Dict[str, str]:
         """Construct a Google spreadsheet dataset row from dataset, maintainer and
         organisation administrators.
 
         Args:
             hdxhelper (HDXHelper): HDX helper object
-            dataset (Dict): Dataset to examine
-            maintainer (Dict[str, str]): Maintainer information
-            orgadmins (List[Dict[str, str]]): List of organisation administrator info
+            dataset (Mapping): Dataset to examine
+            maintainer (Optional[Mapping[str, str]]): Maintainer information
+            orgadmins (Sequence[Mapping[str, str]]): Organisation administrator info
 
         Returns:
             Dict[str, str]: Spreadsheet row
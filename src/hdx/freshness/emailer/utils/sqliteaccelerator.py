@@ -0,0 +1,133 @@
+"""Functions that speed up queries of local SQLite freshness databases
+"""
+import logging
+import sqlite3
+from os.path import abspath
+from typing import Any, Optional
+from urllib.parse import quote
+
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteAccelerator:
+    """A class that opens a local SQLite freshness database for fast reading and
+    returns a session on it when entering its context. The file is opened
+    read-only and immutable so that SQLite does no locking or change detection,
+    and every connection is given a large memory-mapped I/O size and page cache.
+    The file must not be written to by anything else while it is open. If
+    in_memory is True, the file is instead copied into an in-memory database
+    using SQLite's backup API and the checks read from the copy. Sidecar tables
+    (eg. transitions and run summaries) can only be created when in_memory is True
+    and are discarded with the copy when exiting the context.
+
+    Args:
+        database (str): Path of SQLite database file
+        in_memory (bool): Whether to copy database into memory. Defaults to False.
+        mmap_size (int): Maximum bytes of file to memory map. Defaults to 1GB.
+        cache_size (int): Size of page cache in bytes. Defaults to 256MB.
+    """
+
+    def __init__(
+        self,
+        database: str,
+        in_memory: bool = False,
+        mmap_size: int = 1024 * 1024 * 1024,
+        cache_size: int = 256 * 1024 * 1024,
+    ):
+        self.database = database
+        self.in_memory = in_memory
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        self.memory_connection: Optional[sqlite3.Connection] = None
+        self.engine: Optional[Engine] = None
+        self.session: Optional[Session] = None
+
+    def get_file_uri(self) -> str:
+        """Get the SQLite URI filename that opens the database file read-only and
+        immutable
+
+        Returns:
+            str: SQLite URI filename
+        """
+        path = quote(abspath(self.database))
+        return f"file:{path}?mode=ro&immutable=1"
+
+    def get_memory_uri(self) -> str:
+        """Get the SQLite URI filename of the in-memory copy of the database. The
+        copy is shared by all connections in this process.
+
+        Returns:
+            str: SQLite URI filename
+        """
+        return f"file:freshness_emailer_{id(self)}?mode=memory&cache=shared"
+
+    def set_pragmas(
+        self, dbapi_connection: Any, connection_record: Any
+    ) -> None:
+        """Set the memory-mapped I/O size and page cache size of a new connection
+
+        Args:
+            dbapi_connection (Any): DBAPI connection
+            connection_record (Any): Connection pool record
+
+        Returns:
+            None
+        """
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA mmap_size={self.mmap_size}")
+        # A negative cache size is in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size={-(self.cache_size // 1024)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+    def copy_into_memory(self) -> sqlite3.Connection:
+        """Copy the database file into an in-memory database using the backup API.
+        The returned connection keeps the in-memory database alive until it is
+        closed.
+
+        Returns:
+            sqlite3.Connection: Connection to in-memory database
+        """
+        connection = sqlite3.connect(self.get_memory_uri(), uri=True)
+        source = sqlite3.connect(self.get_file_uri(), uri=True)
+        try:
+            source.backup(connection)
+        finally:
+            source.close()
+        logger.info(f"Copied {self.database} into memory.")
+        return connection
+
+    def __enter__(self) -> Session:
+        """Open the database (or an in-memory copy of it) and get a session on it
+
+        Returns:
+            sqlalchemy.orm.Session: Session to use for queries
+        """
+        if self.in_memory:
+            self.memory_connection = self.copy_into_memory()
+            uri = self.get_memory_uri()
+        else:
+            uri = self.get_file_uri()
+        self.engine = create_engine(
+            f"sqlite:///{uri}&uri=true", poolclass=NullPool, echo=False
+        )
+        event.listen(self.engine, "connect", self.set_pragmas)
+        self.session = Session(bind=self.engine)
+        return self.session
+
+    def __exit__(self, exc_type: Any, exc_value: Any, traceback: Any) -> None:
+        """Close the session and the in-memory copy of the database if there is
+        one
+
+        Returns:
+            None
+        """
+        self.session.close()
+        self.engine.dispose()
+        if self.memory_connection is not None:
+            self.memory_connection.close()
+            self.memory_connection = None
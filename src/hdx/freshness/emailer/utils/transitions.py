@@ -0,0 +1,186 @@
+"""Functions that maintain the table of transitions between freshness runs
+"""
+import logging
+
+from hdx.freshness.database.dbdataset import DBDataset
+from sqlalchemy import delete, insert, literal, select
+from sqlalchemy.orm import Session, aliased
+
+from .dbtransition import DBTransition
+from .dbtransitionrun import DBTransitionRun
+from .runcatalog import RunCatalog
+
+logger = logging.getLogger(__name__)
+
+
+class Transitions:
+    """A class that maintains a sidecar table holding, for each dataset in a run,
+    its freshness, what updated and reference period in that run and in the
+    previous run. The table is populated once per run from DBDataset so that
+    subsequent emailer runs do not need to join DBDataset with itself. Completion
+    of a run is recorded in a marker row along with the state of the run when it
+    was copied. If the run has changed since (eg. because freshness was still
+    writing it), its transitions are copied again. Transitions of runs older
+    than the previous run are deleted when a run is copied so that the table does
+    not grow with the number of runs.
+
+    Args:
+        session (sqlalchemy.orm.Session): Session to use for queries
+        runcatalog (RunCatalog): Catalog of current and previous runs
+    """
+
+    def __init__(self, session: Session, runcatalog: RunCatalog):
+        self.session = session
+        self.runcatalog = runcatalog
+        self.run_numbers = runcatalog.get_run_numbers()
+
+    def create_table(self) -> None:
+        """Create the transitions and marker tables if they do not exist
+
+        Returns:
+            None
+        """
+        connection = self.session.connection()
+        DBTransition.__table__.create(connection, checkfirst=True)
+        DBTransitionRun.__table__.create(connection, checkfirst=True)
+
+    def is_populated(self, run_number: int) -> bool:
+        """Check if all the transitions of a run have been added to the table ie.
+        there is a marker row for the run whose state matches the current state of
+        the run
+
+        Args:
+            run_number (int): Run number
+
+        Returns:
+            bool: Whether the transitions of the run are in the table
+        """
+        marker = self.session.get(DBTransitionRun, run_number)
+        if marker is None:
+            return False
+        run_state = self.runcatalog.get_run_state(run_number)
+        return (
+            marker.datasets,
+            marker.latest_of_modifieds,
+            marker.when_checked,
+        ) == run_state
+
+    def prune(self, run_number: int) -> int:
+        """Delete the transitions and marker rows of runs older than a run. Does
+        not commit.
+
+        Args:
+            run_number (int): Run number of oldest run to keep
+
+        Returns:
+            int: Number of transitions deleted
+        """
+        run_number = self.runcatalog.get_literal(run_number)
+        result = self.session.execute(
+            delete(DBTransition).where(DBTransition.run_number < run_number)
+        )
+        self.session.execute(
+            delete(DBTransitionRun).where(
+                DBTransitionRun.run_number < run_number
+            )
+        )
+        return result.rowcount
+
+    def populate(self) -> int:
+        """Add the transitions of the current run to the table if they are not
+        already there or the run has changed since they were added. Only the
+        newest run needs to be added on each emailer run. Transitions of runs
+        older than the previous run are deleted. The transitions, the marker row
+        and the deletions are written in one transaction.
+
+        Returns:
+            int: Number of transitions added
+        """
+        no_runs = len(self.run_numbers)
+        if no_runs == 0:
+            return 0
+        self.create_table()
+        run_number = self.run_numbers[0][0]
+        if self.is_populated(run_number):
+            return 0
+        self.session.execute(
+            delete(DBTransition).where(
+                DBTransition.run_number
+                == self.runcatalog.get_literal(run_number)
+            )
+        )
+        self.session.execute(
+            delete(DBTransitionRun).where(
+                DBTransitionRun.run_number
+                == self.runcatalog.get_literal(run_number)
+            )
+        )
+        if no_runs >= 2:
+            prev_run_number = self.run_numbers[1][0]
+        else:
+            prev_run_number = None
+        DBDataset2 = aliased(DBDataset)
+        statement = (
+            select(
+                DBDataset.run_number,
+                DBDataset.id,
+                literal(prev_run_number).label("prev_run_number"),
+                DBDataset.dataset_date,
+                DBDataset2.dataset_date,
+                DBDataset.update_frequency,
+                DBDataset.latest_of_modifieds,
+                DBDataset.what_updated,
+                DBDataset2.what_updated,
+                DBDataset.fresh,
+                DBDataset2.fresh,
+            )
+            .outerjoin(
+                DBDataset2,
+                (DBDataset2.id == DBDataset.id)
+                & (
+                    DBDataset2.run_number
+                    == self.runcatalog.get_literal(prev_run_number)
+                ),
+            )
+            .where(
+                DBDataset.run_number == self.runcatalog.get_literal(run_number)
+            )
+        )
+        columns = [
+            "run_number",
+            "id",
+            "prev_run_number",
+            "dataset_date",
+            "prev_dataset_date",
+            "update_frequency",
+            "latest_of_modifieds",
+            "what_updated",
+            "prev_what_updated",
+            "fresh",
+            "prev_fresh",
+        ]
+        result = self.session.execute(
+            insert(DBTransition).from_select(columns, statement)
+        )
+        (
+            datasets,
+            latest_of_modifieds,
+            when_checked,
+        ) = self.runcatalog.get_run_state(run_number)
+        self.session.add(
+            DBTransitionRun(
+                run_number=run_number,
+                datasets=datasets,
+                latest_of_modifieds=latest_of_modifieds,
+                when_checked=when_checked,
+            )
+        )
+        if prev_run_number is not None:
+            pruned = self.prune(prev_run_number)
+        else:
+            pruned = 0
+        self.session.commit()
+        logger.info(
+            f"Added {result.rowcount} transitions for run {run_number} and deleted {pruned} older transitions."
+        )
+        return result.rowcount
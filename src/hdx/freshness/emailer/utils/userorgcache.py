@@ -0,0 +1,282 @@
+"""Functions that cache HDX users and organisation memberships on disk
+"""
+import json
+import logging
+from datetime import datetime, timedelta
+from os import makedirs, replace
+from os.path import exists, join
+from typing import Dict, List, Optional
+
+from hdx.api.configuration import Configuration
+from hdx.data.organization import Organization
+from hdx.data.user import User
+from hdx.utilities.dateparse import now_utc
+
+from .paginatedfetcher import PaginatedFetcher
+
+logger = logging.getLogger(__name__)
+
+
+class UserOrgCache:
+    """A class that keeps the HDX users and the users of each HDX organisation in
+    a file so that they do not need to be downloaded in full on every emailer run.
+    If the cache was refreshed less than ttl ago, it is used as is. Otherwise it is
+    refreshed incrementally: CKAN's user list does not give when a user was
+    modified, so all users are downloaded again (so that changes to emails, names
+    and sysadmin status are picked up), while for organisations only the light
+    list is downloaded and those that are new or whose metadata_modified changed
+    are read individually. Organisations that no longer exist are removed.
+    Organisation memberships do not always change metadata_modified, so everything
+    is downloaded again if the last full refresh was more than full_refresh_age
+    ago or if more than max_delta organisations need to be read. If a
+    PaginatedFetcher is given, it is used to download all users and for full
+    refreshes.
+
+    Args:
+        folder (str): Folder for cache file
+        now (Optional[datetime]): Date to use for now. Defaults to None (now_utc()).
+        ttl (timedelta): Age below which cache is used as is. Defaults to 20 hours.
+        full_refresh_age (timedelta): Age above which cache is rebuilt. Defaults to 7 days.
+        max_delta (int): Maximum number of organisations to read individually. Defaults to 200.
+        configuration (Optional[Configuration]): HDX configuration. Defaults to global configuration.
+        fetcher (Optional[PaginatedFetcher]): Concurrent downloader of users and organisations. Defaults to None.
+    """
+
+    schema_version = 1
+    filename = "users_organizations.json"
+
+    def __init__(
+        self,
+        folder: str,
+        now: Optional[datetime] = None,
+        ttl: timedelta = timedelta(hours=20),
+        full_refresh_age: timedelta = timedelta(days=7),
+        max_delta: int = 200,
+        configuration: Optional[Configuration] = None,
+        fetcher: Optional[PaginatedFetcher] = None,
+    ):
+        makedirs(folder, exist_ok=True)
+        if now is None:
+            now = now_utc()
+        self.now = now
+        self.path = join(folder, self.filename)
+        self.ttl = ttl
+        self.full_refresh_age = full_refresh_age
+        self.max_delta = max_delta
+        self.configuration = configuration
+        self.fetcher = fetcher
+        self.refreshed: Optional[datetime] = None
+        self.full_refreshed: Optional[datetime] = None
+        self.users: Dict[str, Dict] = dict()
+        self.organizations: Dict[str, Dict] = dict()
+        self.load()
+
+    def load(self) -> None:
+        """Load the users and organisations from the cache file if there is one
+        written with the same schema version
+
+        Returns:
+            None
+        """
+        if not exists(self.path):
+            return
+        with open(self.path) as f:
+            cache = json.load(f)
+        if cache["schema_version"] != self.schema_version:
+            logger.warning("User and organisation cache has old schema!")
+            return
+        self.refreshed = datetime.fromisoformat(cache["refreshed"])
+        self.full_refreshed = datetime.fromisoformat(cache["full_refreshed"])
+        self.users = cache["users"]
+        self.organizations = cache["organizations"]
+
+    def save(self) -> None:
+        """Save the users and organisations to the cache file. The file is replaced
+        atomically.
+
+        Returns:
+            None
+        """
+        cache = {
+            "schema_version": self.schema_version,
+            "refreshed": self.refreshed.isoformat(),
+            "full_refreshed": self.full_refreshed.isoformat(),
+            "users": self.users,
+            "organizations": self.organizations,
+        }
+        temppath = f"{self.path}.tmp"
+        with open(temppath, "w") as f:
+            json.dump(cache, f)
+        replace(temppath, self.path)
+
+    @staticmethod
+    def get_organization_entry(organization: Dict) -> Dict:
+        """Get the parts of an organisation needed by the emailer
+
+        Args:
+            organization (Dict): Organisation
+
+        Returns:
+            Dict: Organisation id, name, metadata_modified and users
+        """
+        return {
+            "id": organization["id"],
+            "name": organization["name"],
+            "metadata_modified": organization.get("metadata_modified"),
+            "users": [
+                {"id": user["id"], "capacity": user["capacity"]}
+                for user in organization.get("users", list())
+            ],
+        }
+
+    def get_all_users(self) -> List[Dict]:
+        """Download all HDX users
+
+        Returns:
+            List[Dict]: Users
+        """
+        if self.fetcher is not None:
+            return self.fetcher.get_users()
+        users = User.get_all_users(configuration=self.configuration)
+        return [user.data for user in users]
+
+    def get_all_organizations(self, include_users: bool) -> List[Dict]:
+        """Download all HDX organisations
+
+        Args:
+            include_users (bool): Whether to include users of organisations
+
+        Returns:
+            List[Dict]: Organisations
+        """
+        if include_users and self.fetcher is not None:
+            return self.fetcher.get_organizations()
+        return Organization.get_all_organization_names(
+            configuration=self.configuration,
+            all_fields=True,
+            include_users=include_users,
+        )
+
+    def read_organization(self, identifier: str) -> Optional[Dict]:
+        """Download an HDX organisation including its users
+
+        Args:
+            identifier (str): Organisation id or name
+
+        Returns:
+            Optional[Dict]: Organisation or None if not found
+        """
+        organization = Organization.read_from_hdx(
+            identifier, configuration=self.configuration
+        )
+        if organization is None:
+            return None
+        return organization.data
+
+    def refresh_all(self) -> None:
+        """Download all users and organisations with their users
+
+        Returns:
+            None
+        """
+        self.users = {user["id"]: user for user in self.get_all_users()}
+        self.organizations = dict()
+        for organization in self.get_all_organizations(include_users=True):
+            entry = self.get_organization_entry(organization)
+            self.organizations[entry["id"]] = entry
+        logger.info(
+            f"Downloaded {len(self.users)} users and {len(self.organizations)} organisations."
+        )
+
+    def refresh_users(self) -> None:
+        """Download all users, replacing those from the last refresh
+
+        Returns:
+            None
+        """
+        users = {user["id"]: user for user in self.get_all_users()}
+        changed = 0
+        for userid, user in users.items():
+            if self.users.get(userid) != user:
+                changed += 1
+        removed = len(set(self.users).difference(users))
+        self.users = users
+        logger.info(
+            f"Downloaded {len(users)} users of which {changed} are new or changed and {removed} were removed."
+        )
+
+    def refresh_organizations(self) -> bool:
+        """Read organisations that are new or whose metadata_modified has changed
+        since the last refresh and remove organisations that no longer exist
+
+        Returns:
+            bool: Whether incremental refresh was possible
+        """
+        organizations = {
+            organization["id"]: organization
+            for organization in self.get_all_organizations(include_users=False)
+        }
+        changed = list()
+        for orgid, organization in organizations.items():
+            entry = self.organizations.get(orgid)
+            if entry is None or entry["metadata_modified"] != organization.get(
+                "metadata_modified"
+            ):
+                changed.append(orgid)
+        if len(changed) > self.max_delta:
+            return False
+        for orgid in set(self.organizations).difference(organizations):
+            del self.organizations[orgid]
+        for orgid in changed:
+            organization = self.read_organization(orgid)
+            if organization is not None:
+                self.organizations[orgid] = self.get_organization_entry(
+                    organization
+                )
+        logger.info(f"Read {len(changed)} new or changed organisations.")
+        return True
+
+    def refresh(self) -> bool:
+        """Refresh the cache if it is older than ttl, downloading everything if the
+        last full refresh is older than full_refresh_age or too much has changed,
+        then save it
+
+        Returns:
+            bool: Whether the cache was refreshed
+        """
+        now = self.now
+        if self.refreshed is not None and now - self.refreshed < self.ttl:
+            return False
+        if (
+            self.full_refreshed is None
+            or now - self.full_refreshed >= self.full_refresh_age
+            or not self.refresh_organizations()
+        ):
+            self.refresh_all()
+            self.full_refreshed = now
+        else:
+            self.refresh_users()
+        self.refreshed = now
+        self.save()
+        return True
+
+    def get_users(self) -> List[User]:
+        """Get all users, refreshing the cache if needed
+
+        Returns:
+            List[User]: Users
+        """
+        self.refresh()
+        return [
+            User(user, configuration=self.configuration)
+            for user in self.users.values()
+        ]
+
+    def get_organizations(self) -> List[Dict]:
+        """Get all organisations with their users, refreshing the cache if needed
+
+        Returns:
+            List[Dict]: Organisations
+        """
+        self.refresh()
+        return list(self.organizations.values())
@@ -0,0 +1,125 @@
+"""Compact directory of HDX users and organisation roles
+"""
+from sys import intern
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+from hdx.utilities.dictandlist import dict_of_lists_add
+
+from .records import UserRecord
+
+
+class UserOrgDirectory:
+    """A class that holds the HDX users and the users in each role (capacity) of
+    each HDX organisation in compact form. Users are kept as slotted records with
+    interned strings. Every user id is given a small integer index in the order
+    users are given, and the users in each role of an organisation are kept as a
+    tuple of indices in membership order. Ids of organisation members that are not
+    users are indexed after the users so that they can still be reported.
+
+    Args:
+        users (Iterable[Mapping]): HDX users
+        organizations (Iterable[Mapping]): HDX organisations with their users
+    """
+
+    def __init__(
+        self, users: Iterable[Mapping], organizations: Iterable[Mapping]
+    ):
+        self.user_ids: List[str] = list()
+        self.user_indices: Dict[str, int] = dict()
+        self.users: Dict[str, UserRecord] = dict()
+        self.sysadmins: Dict[str, UserRecord] = dict()
+        for user in users:
+            user = UserRecord.from_user(user)
+            self.get_index(user.id)
+            self.users[user.id] = user
+            if user.sysadmin:
+                self.sysadmins[user.id] = user
+        self.sysadmin_indices: FrozenSet[int] = frozenset(
+            self.user_indices[userid] for userid in self.sysadmins
+        )
+        self.organizations: Dict[str, Dict[str, Tuple[int, ...]]] = dict()
+        for organization in organizations:
+            indices_per_capacity = dict()
+            for user in organization["users"]:
+                dict_of_lists_add(
+                    indices_per_capacity,
+                    intern(user["capacity"]),
+                    self.get_index(user["id"]),
+                )
+            organization_id = intern(organization["id"])
+            self.organizations[organization_id] = {
+                capacity: tuple(indices)
+                for capacity, indices in indices_per_capacity.items()
+            }
+
+    def get_index(self, userid: str) -> int:
+        """Get the index of a user id, adding it if it is not there
+
+        Args:
+            userid (str): User id
+
+        Returns:
+            int: Index of user id
+        """
+        index = self.user_indices.get(userid)
+        if index is None:
+            index = len(self.user_ids)
+            userid = intern(userid)
+            self.user_ids.append(userid)
+            self.user_indices[userid] = index
+        return index
+
+    def get_user(self, userid: str) -> Optional[UserRecord]:
+        """Get a user
+
+        Args:
+            userid (str): User id
+
+        Returns:
+            Optional[UserRecord]: User or None if there is no such user
+        """
+        return self.users.get(userid)
+
+    def get_role_indices(
+        self, organization_id: str, *capacities: str
+    ) -> FrozenSet[int]:
+        """Get the indices of the users in any of the given roles of an
+        organisation
+
+        Args:
+            organization_id (str): Organisation id
+            *capacities (str): Roles eg. admin, editor
+
+        Returns:
+            FrozenSet[int]: Indices of users
+        """
+        organization = self.organizations[organization_id]
+        indices = set()
+        for capacity in capacities:
+            indices.update(organization.get(capacity, tuple()))
+        return frozenset(indices)
+
+    def get_user_ids(self, indices: Iterable[int]) -> List[str]:
+        """Get the user ids of indices in index order
+
+        Args:
+            indices (Iterable[int]): Indices of users
+
+        Returns:
+            List[str]: User ids
+        """
+        return [self.user_ids[index] for index in sorted(indices)]
+
+    def get_role_ids(self, organization_id: str, capacity: str) -> List[str]:
+        """Get the ids of the users in a role of an organisation in membership
+        order
+
+        Args:
+            organization_id (str): Organisation id
+            capacity (str): Role eg. admin
+
+        Returns:
+            List[str]: User ids
+        """
+        indices = self.organizations[organization_id].get(capacity, tuple())
+        return [self.user_ids[index] for index in indices]
@@ -1863,6 +1863,19 @@ class TestDataFreshnessStatus:
                 )
             ]
 
+    def test_is_normal_fall(self):
+        assert DataFreshnessStatus.is_normal_fall(970, [1000, 1000]) is False
+        assert DataFreshnessStatus.is_normal_fall(970, [1000, 1000, 1000]) is (
+            False
+        )
+        assert DataFreshnessStatus.is_normal_fall(985, [1000, 1000, 1000]) is (
+            True
+        )
+        assert (
+            DataFreshnessStatus.is_normal_fall(970, [1000, 960, 1040, 0, 1000])
+            is True
+        )
+
     def test_freshnessdatasetsnoresources(
         self, configuration, database_noresources, users, organizations
     ):
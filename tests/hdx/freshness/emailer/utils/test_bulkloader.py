@@ -0,0 +1,57 @@
+"""
+Unit tests for bulk loader code.
+
+"""
+from os import getenv
+
+import pytest
+from hdx.database import Database
+from hdx.database.dburi import get_params_from_connection_uri
+from hdx.utilities.dateparse import parse_date
+
+from hdx.freshness.emailer.utils.bulkloader import BulkLoader
+from hdx.freshness.emailer.utils.databasequeries import DatabaseQueries
+from hdx.freshness.emailer.utils.hdxhelper import HDXHelper
+from hdx.freshness.emailer.utils.runsnapshot import RunSnapshot
+
+
+class TestBulkLoader:
+    now = parse_date("2017-02-02 19:07:30.333492", include_microseconds=True)
+    hdxhelper = HDXHelper(site_url="", users=list(), organizations=list())
+
+    def test_fallback(self, configuration, database_failure):
+        with Database(**database_failure) as session:
+            assert BulkLoader(session).is_supported() is False
+            databasequeries = DatabaseQueries(
+                session=session,
+                now=self.now,
+                hdxhelper=self.hdxhelper,
+                bulk_load=True,
+            )
+            assert databasequeries.bulkloader is None
+
+    @pytest.mark.skipif(
+        not getenv("TEST_POSTGRES_URI"),
+        reason="Needs a local PostgreSQL database in TEST_POSTGRES_URI",
+    )
+    def test_load(self, configuration, database_failure):
+        params = get_params_from_connection_uri(getenv("TEST_POSTGRES_URI"))
+        with Database(**database_failure) as session:
+            databasequeries = DatabaseQueries(
+                session=session, now=self.now, hdxhelper=self.hdxhelper
+            )
+            runsnapshot = RunSnapshot(databasequeries)
+            snapshot = databasequeries.get_snapshot()
+            with Database(**params) as pg_session:
+                connection = pg_session.connection()
+                for table, statement in runsnapshot.get_statements():
+                    runsnapshot.copy_rows(connection, table, statement)
+                databasequeries = DatabaseQueries(
+                    session=pg_session,
+                    now=self.now,
+                    hdxhelper=self.hdxhelper,
+                    bulk_load=True,
+                )
+                assert databasequeries.bulkloader is not None
+                assert databasequeries.get_snapshot() == snapshot
+                pg_session.rollback()
@@ -2,10 +2,18 @@
 Unit tests for database queries code.
 
 """
+from datetime import timedelta
+
 from hdx.database import Database
+from hdx.freshness.database.dbdataset import DBDataset
+from hdx.freshness.database.dbinfodataset import DBInfoDataset
+from hdx.freshness.database.dborganization import DBOrganization
 from hdx.utilities.dateparse import parse_date
+from sqlalchemy import func, select, update
 
 from hdx.freshness.emailer.utils.databasequeries import DatabaseQueries
+from hdx.freshness.emailer.utils.dbtransition import DBTransition
+from hdx.freshness.emailer.utils.dbtransitionrun import DBTransitionRun
 from hdx.freshness.emailer.utils.hdxhelper import HDXHelper
 
 
@@ -56,3 +64,349 @@ class TestDatabaseQueries:
                 session=session, now=now, hdxhelper=hdxhelper
             )
             assert databasequeries.run_numbers == list()
+
+    def test_get_datasets_reference_period(
+        self, configuration, database_failure
+    ):
+        now = parse_date(
+            "2017-02-02 19:07:30.333492", include_microseconds=True
+        )
+        run_dates = [
+            parse_date(
+                "2017-02-01 09:07:30.333492", include_microseconds=True
+            ),
+            parse_date(
+                "2017-02-02 09:07:30.333492", include_microseconds=True
+            ),
+        ]
+        reference_period = "[2016-01-01T00:00:00 TO 2016-12-31T23:59:59]"
+        new_reference_period = "[2017-01-01T00:00:00 TO 2017-12-31T23:59:59]"
+        with Database(**database_failure) as session:
+            session.add(
+                DBOrganization(id="refperiod-org", name="lala", title="Lala")
+            )
+            datasets = {
+                "refperiod-due": (1, reference_period),
+                "refperiod-notdue": (7, reference_period),
+                "refperiod-changed": (1, new_reference_period),
+            }
+            for dataset_id, (
+                update_frequency,
+                dataset_date,
+            ) in datasets.items():
+                session.add(
+                    DBInfoDataset(
+                        id=dataset_id,
+                        name=dataset_id,
+                        title=dataset_id,
+                        private=False,
+                        organization_id="refperiod-org",
+                    )
+                )
+                for run_number, run_date in enumerate(run_dates):
+                    if run_number == 0:
+                        what_updated = "firstrun"
+                        dataset_date = reference_period
+                    else:
+                        what_updated = "data"
+                        dataset_date = datasets[dataset_id][1]
+                    modified = run_date - timedelta(hours=1)
+                    session.add(
+                        DBDataset(
+                            run_number=run_number,
+                            id=dataset_id,
+                            dataset_date=dataset_date,
+                            update_frequency=update_frequency,
+                            review_date=None,
+                            last_modified=modified,
+                            updated_by_script=None,
+                            metadata_modified=modified,
+                            latest_of_modifieds=modified,
+                            what_updated=what_updated,
+                            last_resource_updated="lala",
+                            last_resource_modified=modified,
+                            fresh=0,
+                            error=False,
+                        )
+                    )
+            hdxhelper = HDXHelper(
+                site_url="", users=list(), organizations=list()
+            )
+            databasequeries = DatabaseQueries(
+                session=session, now=now, hdxhelper=hdxhelper
+            )
+            datasets = databasequeries.get_datasets_reference_period()
+            dataset_ids = [
+                dataset["id"]
+                for dataset in datasets
+                if dataset["id"].startswith("refperiod-")
+            ]
+            assert dataset_ids == ["refperiod-due"]
+
+    def test_iter_status(self, configuration, database_failure):
+        with Database(**database_failure) as session:
+            for dataset_id, name in (("d0", "c"), ("d1", "b"), ("d2", "a")):
+                session.add(
+                    DBInfoDataset(
+                        id=dataset_id,
+                        name=name,
+                        title=name,
+                        private=False,
+                        organization_id="o",
+                    )
+                )
+            session.execute(
+                update(DBDataset)
+                .where(DBDataset.run_number == 1, DBDataset.id != "d0")
+                .values(fresh=1)
+            )
+            session.commit()
+            hdxhelper = HDXHelper(
+                site_url="", users=list(), organizations=list()
+            )
+            for date, statuses in (
+                ("2017-02-01 19:07:30.333492", {0: ["a", "b", "c"]}),
+                ("2017-02-02 19:07:30.333492", {1: ["a", "b"]}),
+            ):
+                now = parse_date(date, include_microseconds=True)
+                databasequeries = DatabaseQueries(
+                    session=session, now=now, hdxhelper=hdxhelper
+                )
+                streamed = {
+                    status: list(databasequeries.iter_status(status))
+                    for status in range(4)
+                }
+                assert databasequeries.snapshot is None
+                for status in range(4):
+                    names = statuses.get(status, list())
+                    assert [d["name"] for d in streamed[status]] == names
+                    datasets = sorted(
+                        databasequeries.get_status(status),
+                        key=lambda d: (d["organization_title"], d["name"]),
+                    )
+                    assert streamed[status] == datasets
+                    assert list(databasequeries.iter_status(status)) == (
+                        datasets
+                    )
+
+    def test_get_error_msg(self, configuration, database_failure):
+        now = parse_date(
+            "2017-02-03 19:07:30.333492", include_microseconds=True
+        )
+        with Database(**database_failure) as session:
+            hdxhelper = HDXHelper(
+                site_url="", users=list(), organizations=list()
+            )
+            databasequeries = DatabaseQueries(
+                session=session, now=now, hdxhelper=hdxhelper
+            )
+            assert (
+                databasequeries.get_error_msg("File too large to hash!")
+                is None
+            )
+            error = "File mimetype text/html does not match HDX format CSV!"
+            assert databasequeries.get_error_msg(error) == "Format Mismatch"
+            assert (
+                databasequeries.get_error_msg(error, True) == "Format Mismatch"
+            )
+            error = "[Client(ssl)Error 404 not found] blah"
+            assert databasequeries.get_error_msg(error) == "Client(ssl)Error"
+            assert databasequeries.error_msgs[error] == "Client(ssl)Error"
+            assert (
+                databasequeries.get_error_msg(
+                    "FILE MIMETYPE TEXT/HTML DOES NOT MATCH HDX FORMAT CSV!",
+                    True,
+                )
+                is None
+            )
+            assert databasequeries.get_error_msg("Server disconnected") is None
+
+    def test_get_status_transitions(self, configuration, database_failure):
+        now = parse_date(
+            "2017-02-03 19:07:30.333492", include_microseconds=True
+        )
+        with Database(**database_failure) as session:
+            hdxhelper = HDXHelper(
+                site_url="", users=list(), organizations=list()
+            )
+            databasequeries = DatabaseQueries(
+                session=session, now=now, hdxhelper=hdxhelper
+            )
+            transitions = databasequeries.get_status_transitions()
+            assert list(transitions.keys()) == [1, 2, 3]
+            for status, datasets in transitions.items():
+                assert datasets == databasequeries.get_status(status)
+                for dataset in datasets:
+                    assert dataset["fresh"] == status
+                    assert dataset["prev_fresh"] == status - 1
+            transitions = databasequeries.get_status_transitions((0,))
+            assert transitions == {0: list()}
+
+    def test_use_transitions(self, configuration, database_failure):
+        now = parse_date(
+            "2017-02-02 19:07:30.333492", include_microseconds=True
+        )
+        with Database(**database_failure) as session:
+            hdxhelper = HDXHelper(
+                site_url="", users=list(), organizations=list()
+            )
+            databasequeries = DatabaseQueries(
+                session=session, now=now, hdxhelper=hdxhelper
+            )
+            assert databasequeries.transitions is None
+            transitionqueries = DatabaseQueries(
+                session=session,
+                now=now,
+                hdxhelper=hdxhelper,
+                use_transitions=True,
+            )
+            transitions = transitionqueries.transitions
+            assert transitions.is_populated(databasequeries.run_numbers[0][0])
+            assert transitions.populate() == 0
+            assert session.scalar(select(func.count(DBTransition.id))) == 3
+            assert transitionqueries.get_snapshot() == (
+                databasequeries.get_snapshot()
+            )
+            for status in range(4):
+                assert transitionqueries.get_status(status) == (
+                    databasequeries.get_status(status)
+                )
+            assert transitionqueries.get_broken() == (
+                databasequeries.get_broken()
+            )
+            assert transitionqueries.get_datasets_modified_yesterday() == (
+                databasequeries.get_datasets_modified_yesterday()
+            )
+
+            # Freshness is still writing the run
+            run_number = databasequeries.run_numbers[0][0]
+            dbdataset = session.scalars(
+                select(DBDataset).where(DBDataset.run_number == run_number)
+            ).first()
+            dbdataset.latest_of_modifieds = now
+            dbdataset.fresh = 3
+            session.commit()
+            transitionqueries = DatabaseQueries(
+                session=session,
+                now=now,
+                hdxhelper=hdxhelper,
+                use_transitions=True,
+            )
+            assert (
+                session.scalar(
+                    select(DBTransition.fresh).where(
+                        DBTransition.run_number == run_number,
+                        DBTransition.id == dbdataset.id,
+                    )
+                )
+                == 3
+            )
+            session.delete(dbdataset)
+            session.commit()
+            transitionqueries = DatabaseQueries(
+                session=session,
+                now=now,
+                hdxhelper=hdxhelper,
+                use_transitions=True,
+            )
+            assert session.scalar(select(func.count(DBTransition.id))) == 2
+            assert transitionqueries.transitions.populate() == 0
+
+            # Transitions of runs older than the previous run are deleted
+            for day in ("01", "03"):
+                now = parse_date(
+                    f"2017-02-{day} 19:07:30.333492", include_microseconds=True
+                )
+                DatabaseQueries(
+                    session=session,
+                    now=now,
+                    hdxhelper=hdxhelper,
+                    use_transitions=True,
+                )
+            results = session.execute(
+                select(DBTransition.run_number, func.count(DBTransition.id))
+                .group_by(DBTransition.run_number)
+                .order_by(DBTransition.run_number)
+            )
+            assert results.all() == [(1, 2)]
+            assert session.scalars(
+                select(DBTransitionRun.run_number).order_by(
+                    DBTransitionRun.run_number
+                )
+            ).all() == [1, 2]
+
+    def test_prefetch(self, configuration, database_failure):
+        now = parse_date(
+            "2017-02-03 19:07:30.333492", include_microseconds=True
+        )
+        with Database(**database_failure) as session:
+            hdxhelper = HDXHelper(
+                site_url="", users=list(), organizations=list()
+            )
+            databasequeries = DatabaseQueries(
+                session=session, now=now, hdxhelper=hdxhelper
+            )
+            prefetchqueries = DatabaseQueries(
+                session=session, now=now, hdxhelper=hdxhelper
+            )
+            prefetchqueries.prefetch(max_workers=2)
+            assert list(prefetchqueries.prefetched.keys()) == [
+                "number_datasets",
+                "broken_resources",
+            ]
+            assert prefetchqueries.snapshot == databasequeries.get_snapshot()
+            assert prefetchqueries.get_number_datasets() == (
+                databasequeries.get_number_datasets()
+            )
+            assert prefetchqueries.get_broken() == databasequeries.get_broken()
+            assert prefetchqueries.prefetched == dict()
+            assert prefetchqueries.get_broken() == databasequeries.get_broken()
+
+    def test_partition_aware(self, configuration, database_failure):
+        now = parse_date(
+            "2017-02-02 19:07:30.333492", include_microseconds=True
+        )
+        with Database(**database_failure) as session:
+            hdxhelper = HDXHelper(
+                site_url="", users=list(), organizations=list()
+            )
+            databasequeries = DatabaseQueries(
+                session=session, now=now, hdxhelper=hdxhelper
+            )
+            partitionqueries = DatabaseQueries(
+                session=session,
+                now=now,
+                hdxhelper=hdxhelper,
+                partition_aware=True,
+            )
+            dialect = session.get_bind().dialect
+            statements = databasequeries.get_statements()
+            partitionstatements = partitionqueries.get_statements()
+            for name, statement in partitionstatements.items():
+                compiled = statement.compile(
+                    dialect=dialect,
+                    compile_kwargs={"render_postcompile": True},
+                )
+                assert "run_number = 1" in str(
+                    compiled
+                ) or "run_number <= 1" in str(compiled)
+                assert session.execute(statement).all() == (
+                    session.execute(statements[name]).all()
+                )
+            assert partitionqueries.get_number_datasets() == (
+                databasequeries.get_number_datasets()
+            )
+            sidecarqueries = DatabaseQueries(
+                session=session,
+                now=now,
+                hdxhelper=hdxhelper,
+                use_transitions=True,
+                use_run_summaries=True,
+                partition_aware=True,
+            )
+            assert sidecarqueries.get_number_datasets() == (
+                databasequeries.get_number_datasets()
+            )
+            assert sidecarqueries.get_status(1) == databasequeries.get_status(
+                1
+            )
@@ -0,0 +1,64 @@
+"""
+Unit tests for HDX helper code.
+
+"""
+import pytest
+
+from hdx.freshness.emailer.utils.hdxhelper import HDXHelper
+
+
+class TestHDXHelper:
+    @pytest.fixture(scope="class")
+    def hdxhelper(self):
+        users = [
+            {
+                "id": "u1",
+                "name": "user1",
+                "fullname": "User 1",
+                "email": "u1@x.org",
+                "sysadmin": False,
+            },
+            {
+                "id": "u2",
+                "name": "user2",
+                "fullname": "",
+                "display_name": "Second",
+                "email": "u2@x.org",
+                "sysadmin": False,
+            },
+        ]
+        organizations = [
+            {
+                "id": "o1",
+                "users": [
+                    {"id": "u2", "capacity": "admin"},
+                    {"id": "u1", "capacity": "editor"},
+                ],
+            },
+        ]
+        return HDXHelper(site_url="", users=users, organizations=organizations)
+
+    def test_get_maintainer_orgadmins(self, hdxhelper):
+        dataset1 = {"maintainer": "u1", "organization_id": "o1"}
+        dataset2 = {"maintainer": "u1", "organization_id": "o1"}
+        result = hdxhelper.get_maintainer_orgadmins(dataset1)
+        maintainer, orgadmins, users_to_email = result
+        assert maintainer == {"name": "User 1", "email": "u1@x.org"}
+        assert orgadmins == ({"name": "Second", "email": "u2@x.org"},)
+        assert [user["id"] for user in users_to_email] == ["u1"]
+        assert hdxhelper.get_maintainer_orgadmins(dataset2) is result
+        with pytest.raises(TypeError):
+            maintainer["name"] = "Changed"
+        with pytest.raises(TypeError):
+            orgadmins[0]["email"] = "changed@x.org"
+
+        dataset3 = {"maintainer": None, "organization_id": "o1"}
+        (
+            maintainer,
+            orgadmins,
+            users_to_email,
+        ) = hdxhelper.get_maintainer_orgadmins(dataset3)
+        assert maintainer is None
+        assert len(orgadmins) == 1
+        assert [user["id"] for user in users_to_email] == ["u2"]
+        assert len(hdxhelper.maintainer_orgadmins) == 2
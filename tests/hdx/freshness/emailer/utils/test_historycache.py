@@ -0,0 +1,150 @@
+"""
+Unit tests for history cache code.
+
+"""
+from datetime import datetime
+
+import pytest
+from hdx.database import Database
+from hdx.freshness.database.dbdataset import DBDataset
+from hdx.utilities.dateparse import parse_date
+from hdx.utilities.path import temp_dir
+from sqlalchemy import insert, literal, select
+
+from hdx.freshness.emailer.utils.databasequeries import DatabaseQueries
+from hdx.freshness.emailer.utils.hdxhelper import HDXHelper
+from hdx.freshness.emailer.utils.historycache import HistoryCache
+from hdx.freshness.emailer.utils.runcatalog import RunCatalog
+
+pytest.importorskip("numpy")
+
+
+class TestHistoryCache:
+    def test_history_cache(self, configuration, database_failure):
+        with temp_dir("TestHistoryCache") as folder:
+            with Database(**database_failure) as session:
+                hdxhelper = HDXHelper(
+                    site_url="", users=list(), organizations=list()
+                )
+                for date, runs in (
+                    ("2017-02-02 19:07:30.333492", 2),
+                    ("2017-02-03 19:07:30.333492", 1),
+                ):
+                    now = parse_date(date, include_microseconds=True)
+                    databasequeries = DatabaseQueries(
+                        session=session, now=now, hdxhelper=hdxhelper
+                    )
+                    historycache = HistoryCache(folder)
+                    assert (
+                        historycache.update(
+                            session, databasequeries.runcatalog
+                        )
+                        == runs
+                    )
+                    historycache = HistoryCache(folder)
+                    cachedqueries = DatabaseQueries(
+                        session=session,
+                        now=now,
+                        hdxhelper=hdxhelper,
+                        historycache=historycache,
+                    )
+                    dataset_ids = ["d0", "d1", "d2", "d3"]
+                    datasets = {dataset_id: None for dataset_id in dataset_ids}
+                    assert cachedqueries.get_dataset_date_last_changed(
+                        dataset_ids
+                    ) == databasequeries.get_dataset_date_last_changed(
+                        dataset_ids
+                    )
+                    assert cachedqueries.get_update_regularity(
+                        datasets
+                    ) == databasequeries.get_update_regularity(datasets)
+                assert historycache.rows == 6
+                assert historycache.last_run_number == 2
+
+                # Freshness was still writing the last run
+                columns = [
+                    column
+                    for column in DBDataset.__table__.columns
+                    if column.name != "run_number"
+                ]
+                session.execute(
+                    insert(DBDataset).from_select(
+                        [DBDataset.run_number] + columns,
+                        select(literal(2), *columns).where(
+                            DBDataset.run_number == 1
+                        ),
+                    )
+                )
+                session.commit()
+                historycache = HistoryCache(folder)
+                runcatalog = RunCatalog(session, now)
+                assert historycache.update(session, runcatalog) == 1
+                assert historycache.update(session, runcatalog) == 0
+                historycache = HistoryCache(folder)
+                assert historycache.rows == 9
+                assert historycache.last_run_number == 2
+                assert historycache.get_column("run_number").tolist()[-3:] == [
+                    2,
+                    2,
+                    2,
+                ]
+
+    def test_history(self):
+        with temp_dir("TestHistoryCacheHistory") as folder:
+            run_dates = [datetime(2024, 1, day) for day in range(1, 6)]
+            historycache = HistoryCache(folder)
+            historycache.append(
+                0,
+                run_dates[0],
+                [
+                    ("a", "2023", "firstrun", 7, 0),
+                    ("b", None, "firstrun", None, 0),
+                ],
+            )
+            historycache.append(
+                1,
+                run_dates[1],
+                [("a", "2023", "nothing", 7, 0), ("b", None, "data", None, 0)],
+            )
+            historycache.append(
+                2,
+                run_dates[2],
+                [("a", "2024", "data", 7, 0), ("b", "2024", "data", None, 0)],
+            )
+            historycache = HistoryCache(folder)
+            historycache.append(
+                3,
+                run_dates[3],
+                [
+                    ("a", "2024", "metadata", 14, 0),
+                    ("b", None, "nothing", None, 1),
+                ],
+            )
+            historycache.append(
+                4, run_dates[4], [("c", "2024", "firstrun", 7, None)]
+            )
+            assert historycache.rows == 9
+            assert historycache.get_dataset_date_last_changed(
+                ["a", "b", "c", "d"], 4
+            ) == {"a": run_dates[2], "b": run_dates[3], "c": run_dates[4]}
+            assert historycache.get_dataset_date_last_changed(
+                ["a", "b"], 1
+            ) == {"a": run_dates[0], "b": run_dates[0]}
+            assert list(historycache.get_updates(["a", "b", "c"], 4)) == [
+                ("b", run_dates[2], None),
+                ("b", run_dates[1], None),
+                ("a", run_dates[3], 14),
+                ("a", run_dates[2], 7),
+            ]
+            assert list(historycache.get_updates(["c", "d"], 4)) == list()
+            assert historycache.get_column("dataset").tolist() == [
+                0,
+                1,
+                0,
+                1,
+                0,
+                1,
+                0,
+                1,
+                2,
+            ]
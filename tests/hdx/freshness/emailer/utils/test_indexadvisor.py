@@ -0,0 +1,39 @@
+"""
+Unit tests for index advisor code.
+
+"""
+from hdx.database import Database
+from hdx.utilities.dateparse import parse_date
+
+from hdx.freshness.emailer.utils.databasequeries import DatabaseQueries
+from hdx.freshness.emailer.utils.hdxhelper import HDXHelper
+from hdx.freshness.emailer.utils.indexadvisor import IndexAdvisor
+
+
+class TestIndexAdvisor:
+    def test_ensure_indexes(self, configuration, database_failure):
+        now = parse_date(
+            "2017-02-03 19:07:30.333492", include_microseconds=True
+        )
+        with Database(**database_failure) as session:
+            hdxhelper = HDXHelper(
+                site_url="", users=list(), organizations=list()
+            )
+            databasequeries = DatabaseQueries(
+                session=session, now=now, hdxhelper=hdxhelper
+            )
+            indexadvisor = IndexAdvisor(session, databasequeries)
+            missing_indexes = indexadvisor.get_missing_indexes()
+            assert ("dbdatasets", ["run_number", "fresh"]) in missing_indexes
+            plans = indexadvisor.ensure_indexes()
+            assert indexadvisor.get_missing_indexes() == list()
+            assert list(plans.keys()) == list(
+                databasequeries.get_statements().keys()
+            )
+            assert "ix_dbresources_run_number_when_checked" in " ".join(
+                plans["broken_resources"]
+            )
+            assert "ix_dbdatasets_run_number_fresh" in " ".join(
+                plans["status"]
+            )
+            assert indexadvisor.create_indexes() == list()
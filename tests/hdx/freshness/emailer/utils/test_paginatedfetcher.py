@@ -0,0 +1,117 @@
+"""
+Unit tests for paginated fetcher code.
+
+"""
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+import requests
+
+from hdx.freshness.emailer.utils.hdxhelper import HDXHelper
+from hdx.freshness.emailer.utils.paginatedfetcher import PaginatedFetcher
+
+
+class CKANStandIn(BaseHTTPRequestHandler):
+    users = [
+        {"id": f"u{i:02d}", "name": f"user{i}", "sysadmin": i % 10 == 0}
+        for i in range(23)
+    ]
+    organizations = [
+        {
+            "id": f"o{i:02d}",
+            "name": f"org{i}",
+            "users": [{"id": f"u{i:02d}", "capacity": "admin"}],
+        }
+        for i in range(10)
+    ]
+    # Like CKAN, the limit of organization_list with all_fields is capped
+    max_limits = {"user_list": 1000, "organization_list": 4}
+    # Like CKAN versions without pagination of user_list
+    ignore_offset = False
+    requests = list()
+    lock = Lock()
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {key: value[0] for key, value in parse_qs(url.query).items()}
+        action = url.path.split("/")[-1]
+        with self.lock:
+            self.requests.append((action, params))
+        offset = int(params["offset"])
+        limit = min(int(params["limit"]), self.max_limits.get(action, 1000))
+        if self.ignore_offset:
+            offset = 0
+            limit = 1000
+        if action == "user_list":
+            results = self.users
+        elif action == "organization_list":
+            results = self.organizations
+        else:
+            self.send_error(404)
+            return
+        body = json.dumps(
+            {"success": True, "result": results[offset : offset + limit]}
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestPaginatedFetcher:
+    @pytest.fixture(scope="function")
+    def site_url(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), CKANStandIn)
+        thread = Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        CKANStandIn.requests = list()
+        CKANStandIn.ignore_offset = False
+        yield f"http://127.0.0.1:{server.server_port}"
+        server.shutdown()
+        server.server_close()
+
+    def test_paginated_fetcher(self, site_url):
+        fetcher = PaginatedFetcher(site_url, page_size=5, max_workers=3)
+        assert fetcher.get_users() == CKANStandIn.users
+        user_requests = [params for action, params in CKANStandIn.requests]
+        assert sorted(int(params["offset"]) for params in user_requests) == [
+            0,
+            5,
+            10,
+            15,
+            20,
+            25,
+            30,
+        ]
+        assert all(params["order_by"] == "id" for params in user_requests)
+        CKANStandIn.requests = list()
+        assert fetcher.get_organizations() == CKANStandIn.organizations
+        organization_requests = [params for _, params in CKANStandIn.requests]
+        assert sorted(
+            int(params["offset"]) for params in organization_requests
+        ) == [0, 4, 8, 12]
+        assert all(params["limit"] == "5" for params in organization_requests)
+
+        hdxhelper = HDXHelper(site_url=site_url, fetcher=fetcher)
+        assert len(hdxhelper.users) == 23
+        assert sorted(hdxhelper.sysadmins.keys()) == ["u00", "u10", "u20"]
+        assert hdxhelper.directory.get_role_ids("o03", "admin") == ["u03"]
+
+    def test_ignored_offset(self, site_url):
+        CKANStandIn.ignore_offset = True
+        fetcher = PaginatedFetcher(site_url, page_size=5, max_workers=3)
+        assert fetcher.get_users() == CKANStandIn.users
+        assert len(CKANStandIn.requests) == 4
+        CKANStandIn.ignore_offset = False
+        fetcher = PaginatedFetcher(
+            site_url, page_size=5, max_workers=3, max_pages=5
+        )
+        with pytest.raises(requests.HTTPError):
+            fetcher.get_users()
@@ -0,0 +1,81 @@
+"""
+Unit tests for query profiler code.
+
+"""
+from os.path import join
+
+from hdx.database import Database
+from hdx.freshness.database.dbdataset import DBDataset
+from hdx.utilities.dateparse import parse_date
+from hdx.utilities.path import temp_dir
+from sqlalchemy import select
+
+from hdx.freshness.emailer.utils.databasequeries import DatabaseQueries
+from hdx.freshness.emailer.utils.hdxhelper import HDXHelper
+from hdx.freshness.emailer.utils.queryprofiler import QueryProfiler
+
+
+class TestQueryProfiler:
+    def test_profile_queries(self, configuration, database_failure):
+        now = parse_date(
+            "2017-02-02 19:07:30.333492", include_microseconds=True
+        )
+        with Database(**database_failure) as session:
+            hdxhelper = HDXHelper(
+                site_url="", users=list(), organizations=list()
+            )
+            databasequeries = DatabaseQueries(
+                session=session, now=now, hdxhelper=hdxhelper
+            )
+            queryprofiler = QueryProfiler(slow_threshold=0.0, explain=True)
+            profiledqueries = DatabaseQueries(
+                session=session,
+                now=now,
+                hdxhelper=hdxhelper,
+                queryprofiler=queryprofiler,
+            )
+            assert profiledqueries.get_number_datasets() == (
+                databasequeries.get_number_datasets()
+            )
+            assert profiledqueries.get_broken() == databasequeries.get_broken()
+            assert profiledqueries.get_status(3) == (
+                databasequeries.get_status(3)
+            )
+            names = [query["name"] for query in queryprofiler.queries]
+            assert names == [
+                "number_datasets",
+                "number_datasets",
+                "snapshot",
+                "broken_resources",
+            ]
+            query = queryprofiler.queries[2]
+            assert query["rows"] == len(databasequeries.get_snapshot())
+            assert query["wall_time"] >= query["fetch_time"]
+            assert query["plan"]
+            query = queryprofiler.queries[0]
+            assert query["rows"] == 1
+            assert query["bytes"] > 0
+            assert list(query["params"].values()) == [
+                databasequeries.run_numbers[0][0]
+            ]
+            # Recorded in full even if the caller stops reading rows early
+            statement = select(DBDataset.id).where(
+                DBDataset.run_number == databasequeries.run_numbers[0][0]
+            )
+            rows = profiledqueries.iter_rows("datasets", statement)
+            next(rows)
+            rows.close()
+            query = queryprofiler.queries[-1]
+            assert query["name"] == "datasets"
+            assert query["rows"] == 3
+            assert queryprofiler.get_slow_queries() == queryprofiler.queries
+            run_number = databasequeries.run_numbers[0][0]
+            table = queryprofiler.get_table(run_number)
+            assert list(table[0].keys()) == list(QueryProfiler.headers)
+            assert table[0]["run_number"] == run_number
+            with temp_dir("TestQueryProfiler") as folder:
+                path = join(folder, "queries.csv")
+                queryprofiler.save(path, run_number)
+                with open(path) as f:
+                    lines = f.read().splitlines()
+                assert lines[0] == ",".join(QueryProfiler.headers)
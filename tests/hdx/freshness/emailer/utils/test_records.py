@@ -0,0 +1,72 @@
+"""
+Unit tests for records code.
+
+"""
+from copy import copy
+
+import pytest
+
+from hdx.freshness.emailer.utils.records import DatasetRecord, ResourceRecord
+
+
+class TestRecords:
+    def test_dataset_record(self):
+        row = (
+            "ds1",
+            "dataset-1",
+            "Dataset 1",
+            "user1",
+            "org1",
+            "org-1",
+            "Org 1",
+            "[2017-01-01T00:00:00 TO 2017-12-31T23:59:59]",
+            7,
+            None,
+            "data",
+            0,
+        )
+        dataset = DatasetRecord.from_row(row)
+        assert dataset["name"] == "dataset-1"
+        assert dataset.get("prev_fresh") is None
+        assert "resources" not in dataset
+        assert dataset.get("resources", "missing") == "missing"
+        with pytest.raises(KeyError):
+            dataset["lala"]
+        with pytest.raises(KeyError):
+            dataset["lala"] = 1
+        expected = {
+            "id": "ds1",
+            "name": "dataset-1",
+            "title": "Dataset 1",
+            "maintainer": "user1",
+            "organization_id": "org1",
+            "organization_name": "org-1",
+            "organization_title": "Org 1",
+            "dataset_date": "[2017-01-01T00:00:00 TO 2017-12-31T23:59:59]",
+            "update_frequency": 7,
+            "latest_of_modifieds": None,
+            "what_updated": "data",
+            "fresh": 0,
+            "prev_fresh": None,
+            "prev_what_updated": None,
+            "prev_dataset_date": None,
+        }
+        assert dataset == expected
+        assert dict(dataset) == expected
+
+        broken_dataset = dataset.with_resources()
+        broken_dataset["resources"].append(
+            ResourceRecord.from_row(("res1", "Resource 1", "error"))
+        )
+        broken_dataset["what_updated"] = "nothing"
+        assert "resources" not in dataset
+        assert dataset.what_updated == "data"
+        assert broken_dataset["resources"] == [
+            {"id": "res1", "name": "Resource 1", "error": "error"}
+        ]
+        assert len(broken_dataset) == len(expected) + 1
+        assert DatasetRecord.field_names == frozenset(DatasetRecord.__slots__)
+        copied_dataset = copy(broken_dataset)
+        assert copied_dataset == broken_dataset
+        assert copied_dataset.resources is broken_dataset.resources
+        assert copy(dataset) == expected
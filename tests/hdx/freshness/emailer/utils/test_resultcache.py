@@ -0,0 +1,107 @@
+"""
+Unit tests for result cache code.
+
+"""
+from datetime import datetime, timezone
+from os import chmod, listdir
+from os.path import join
+
+import pytest
+from hdx.database import Database
+from hdx.freshness.database.dbdataset import DBDataset
+from hdx.utilities.dateparse import parse_date
+from hdx.utilities.path import temp_dir
+from sqlalchemy import update
+
+from hdx.freshness.emailer.utils.databasequeries import DatabaseQueries
+from hdx.freshness.emailer.utils.hdxhelper import HDXHelper
+from hdx.freshness.emailer.utils.queryprofiler import QueryProfiler
+from hdx.freshness.emailer.utils.resultcache import ResultCache
+
+
+class TestResultCache:
+    def test_result_cache(self, configuration, database_failure):
+        now = parse_date(
+            "2017-02-02 19:07:30.333492", include_microseconds=True
+        )
+        with temp_dir("TestResultCache") as folder:
+            with Database(**database_failure) as session:
+                hdxhelper = HDXHelper(
+                    site_url="", users=list(), organizations=list()
+                )
+                databasequeries = DatabaseQueries(
+                    session=session, now=now, hdxhelper=hdxhelper
+                )
+                number_datasets = databasequeries.get_number_datasets()
+                broken = databasequeries.get_broken()
+                for _ in range(2):
+                    resultcache = ResultCache(folder)
+                    queryprofiler = QueryProfiler()
+                    cachedqueries = DatabaseQueries(
+                        session=session,
+                        now=now,
+                        hdxhelper=hdxhelper,
+                        queryprofiler=queryprofiler,
+                        resultcache=resultcache,
+                    )
+                    assert cachedqueries.get_number_datasets() == (
+                        number_datasets
+                    )
+                    assert cachedqueries.get_broken() == broken
+                assert resultcache.hits == 4
+                assert resultcache.misses == 0
+                assert queryprofiler.queries == list()
+                filenames = sorted(listdir(folder))
+                assert len(filenames) == 4
+                assert filenames[0].startswith("broken_resources_1_0_v3_")
+
+                # Freshness changes the run after the rows were cached
+                session.execute(
+                    update(DBDataset)
+                    .where(DBDataset.run_number == 1, DBDataset.id == "d0")
+                    .values(latest_of_modifieds=now)
+                )
+                session.commit()
+                resultcache = ResultCache(folder)
+                cachedqueries = DatabaseQueries(
+                    session=session,
+                    now=now,
+                    hdxhelper=hdxhelper,
+                    resultcache=resultcache,
+                )
+                assert cachedqueries.get_number_datasets() == (number_datasets)
+                assert resultcache.hits == 0
+                assert resultcache.misses == 2
+                assert not any(
+                    filename.endswith(".tmp") for filename in listdir(folder)
+                )
+
+                resultcache = ResultCache(folder, max_size=0)
+                assert len(resultcache.evict()) == 6
+                assert listdir(folder) == list()
+
+    def test_rows_and_folder(self):
+        with temp_dir("TestResultCacheRows") as folder:
+            cachefolder = join(folder, "cache")
+            resultcache = ResultCache(cachefolder)
+            rows = [
+                ("a", 1, True, None, datetime(2024, 1, 2, 3, 4, 5)),
+                (
+                    "b",
+                    2,
+                    False,
+                    1.5,
+                    datetime(2024, 1, 2, tzinfo=timezone.utc),
+                ),
+            ]
+            resultcache.set("key", rows)
+            assert ResultCache(cachefolder).get("key") == rows
+            with pytest.raises(TypeError):
+                resultcache.set("bad", [(object(),)])
+            assert listdir(cachefolder) == ["key.json"]
+            with open(resultcache.get_path("bad"), "w") as f:
+                f.write("not json")
+            assert resultcache.get("bad") is None
+            chmod(cachefolder, 0o777)
+            with pytest.raises(ValueError):
+                ResultCache(cachefolder)
@@ -0,0 +1,60 @@
+"""
+Unit tests for run catalog code.
+
+"""
+from hdx.database import Database
+from hdx.freshness.database.dbrun import DBRun
+from hdx.utilities.dateparse import parse_date
+from sqlalchemy import select
+
+from hdx.freshness.emailer.utils.runcatalog import RunCatalog
+
+
+class TestRunCatalog:
+    def test_run_catalog(self, configuration, database_failure):
+        now = parse_date(
+            "2017-02-02 19:07:30.333492", include_microseconds=True
+        )
+        run_date0 = parse_date(
+            "2017-02-01 09:07:30.333492", include_microseconds=True
+        )
+        run_date1 = parse_date(
+            "2017-02-02 09:07:30.333492", include_microseconds=True
+        )
+        with Database(**database_failure) as session:
+            runcatalog = RunCatalog(session, now)
+            assert runcatalog.get_run_numbers() == [
+                (1, run_date1),
+                (0, run_date0),
+            ]
+            assert runcatalog.get_run_window() == (run_date0, run_date1)
+            datasets, latest_of_modifieds, _ = runcatalog.get_run_state(1)
+            assert datasets == 3
+            assert latest_of_modifieds is not None
+            assert runcatalog.get_run_state(99) == (0, None, None)
+            now = parse_date(
+                "2017-01-31 19:07:30.333492", include_microseconds=True
+            )
+            runcatalog = RunCatalog(session, now)
+            assert runcatalog.get_run_numbers() == list()
+
+    def test_partition_aware(self, configuration, database_failure):
+        now = parse_date(
+            "2017-02-02 19:07:30.333492", include_microseconds=True
+        )
+        with Database(**database_failure) as session:
+            runcatalog = RunCatalog(session, now)
+            assert runcatalog.get_literals((1, 0)) == [1, 0]
+            partitioncatalog = RunCatalog(session, now, partition_aware=True)
+            statement = select(DBRun.run_number).where(
+                DBRun.run_number.in_(partitioncatalog.get_literals((1, 0)))
+            )
+            compiled = statement.compile(
+                dialect=session.get_bind().dialect,
+                compile_kwargs={"render_postcompile": True},
+            )
+            assert "IN (1, 0)" in str(compiled)
+            assert session.scalars(statement).all() == [0, 1]
+            assert partitioncatalog.get_run_state(
+                1
+            ) == runcatalog.get_run_state(1)
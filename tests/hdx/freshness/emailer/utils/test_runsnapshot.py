@@ -0,0 +1,41 @@
+"""
+Unit tests for run snapshot code.
+
+"""
+from os.path import join
+
+from hdx.database import Database
+from hdx.utilities.dateparse import parse_date
+from hdx.utilities.path import temp_dir
+
+from hdx.freshness.emailer.utils.databasequeries import DatabaseQueries
+from hdx.freshness.emailer.utils.hdxhelper import HDXHelper
+from hdx.freshness.emailer.utils.runsnapshot import RunSnapshot
+
+
+class TestRunSnapshot:
+    def test_export_load(self, configuration, database_failure):
+        now = parse_date(
+            "2017-02-02 19:07:30.333492", include_microseconds=True
+        )
+        hdxhelper = HDXHelper(site_url="", users=list(), organizations=list())
+        with temp_dir("test_runsnapshot") as folder:
+            path = join(folder, "snapshot.db.gz")
+            with Database(**database_failure) as session:
+                databasequeries = DatabaseQueries(
+                    session=session, now=now, hdxhelper=hdxhelper
+                )
+                run_numbers = databasequeries.run_numbers
+                number_datasets = databasequeries.get_number_datasets()
+                snapshot = databasequeries.get_snapshot()
+                norows = RunSnapshot(databasequeries).export(path)
+            assert norows["dbruns"] == 2
+            assert norows["dbdatasets"] == 6
+            params = RunSnapshot.load(path, folder)
+            with Database(**params) as session:
+                databasequeries = DatabaseQueries(
+                    session=session, now=now, hdxhelper=hdxhelper
+                )
+                assert databasequeries.run_numbers == run_numbers
+                assert databasequeries.get_number_datasets() == number_datasets
+                assert databasequeries.get_snapshot() == snapshot
@@ -0,0 +1,80 @@
+"""
+Unit tests for run summaries code.
+
+"""
+from hdx.database import Database
+from hdx.freshness.database.dbdataset import DBDataset
+from hdx.utilities.dateparse import parse_date
+from sqlalchemy import func, insert, select
+
+from hdx.freshness.emailer.utils.databasequeries import DatabaseQueries
+from hdx.freshness.emailer.utils.dbrunsummary import DBRunSummary
+from hdx.freshness.emailer.utils.hdxhelper import HDXHelper
+
+
+class TestRunSummaries:
+    def test_use_run_summaries(self, configuration, database_failure):
+        now = parse_date(
+            "2017-02-03 19:07:30.333492", include_microseconds=True
+        )
+        with Database(**database_failure) as session:
+            hdxhelper = HDXHelper(
+                site_url="", users=list(), organizations=list()
+            )
+            databasequeries = DatabaseQueries(
+                session=session, now=now, hdxhelper=hdxhelper
+            )
+            assert databasequeries.runsummaries is None
+            assert databasequeries.get_previous_number_datasets() == list()
+            summaryqueries = DatabaseQueries(
+                session=session,
+                now=now,
+                hdxhelper=hdxhelper,
+                use_run_summaries=True,
+            )
+            runsummaries = summaryqueries.runsummaries
+            assert (
+                session.scalar(select(func.count(DBRunSummary.run_number)))
+                == 2
+            )
+            assert runsummaries.populate() == 0
+            assert summaryqueries.get_number_datasets() == (
+                databasequeries.get_number_datasets()
+            )
+            assert summaryqueries.get_previous_number_datasets() == [3, 3]
+            summary = runsummaries.get_summaries()[1]
+            assert summary.datasets == 3
+            assert (
+                summary.fresh
+                + summary.due
+                + summary.overdue
+                + summary.delinquent
+                == 3
+            )
+            assert summary.resource_errors == 0
+
+            # Freshness was still writing run 1 when it was summarised
+            columns = [
+                column
+                for column in DBDataset.__table__.columns
+                if column.name != "id"
+            ]
+            session.execute(
+                insert(DBDataset).from_select(
+                    [DBDataset.id] + columns,
+                    select(DBDataset.id + "x", *columns).where(
+                        DBDataset.run_number == 1
+                    ),
+                )
+            )
+            session.commit()
+            summaryqueries = DatabaseQueries(
+                session=session,
+                now=now,
+                hdxhelper=hdxhelper,
+                use_run_summaries=True,
+            )
+            assert summaryqueries.runsummaries.populate() == 0
+            assert summaryqueries.get_number_datasets() == (0, 6)
+            assert summaryqueries.get_previous_number_datasets() == [6, 3]
+            assert session.get(DBRunSummary, 1).datasets == 6
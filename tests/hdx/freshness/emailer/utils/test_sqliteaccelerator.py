@@ -0,0 +1,67 @@
+"""
+Unit tests for SQLite accelerator code.
+
+"""
+import pytest
+from hdx.database import Database
+from hdx.utilities.dateparse import parse_date
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+
+from hdx.freshness.emailer.utils.databasequeries import DatabaseQueries
+from hdx.freshness.emailer.utils.dbrunsummary import DBRunSummary
+from hdx.freshness.emailer.utils.hdxhelper import HDXHelper
+from hdx.freshness.emailer.utils.sqliteaccelerator import SQLiteAccelerator
+
+
+class TestSQLiteAccelerator:
+    def test_sqlite_accelerator(self, configuration, database_failure):
+        now = parse_date(
+            "2017-02-02 19:07:30.333492", include_microseconds=True
+        )
+        hdxhelper = HDXHelper(site_url="", users=list(), organizations=list())
+        with Database(**database_failure) as session:
+            databasequeries = DatabaseQueries(
+                session=session, now=now, hdxhelper=hdxhelper
+            )
+            run_numbers = databasequeries.run_numbers
+            number_datasets = databasequeries.get_number_datasets()
+            status = databasequeries.get_status(0)
+        database = database_failure["database"]
+        with SQLiteAccelerator(database, mmap_size=1024 * 1024) as session:
+            assert session.execute(text("PRAGMA mmap_size")).scalar() == (
+                1024 * 1024
+            )
+            assert session.execute(text("PRAGMA cache_size")).scalar() == (
+                -256 * 1024
+            )
+            databasequeries = DatabaseQueries(
+                session=session, now=now, hdxhelper=hdxhelper
+            )
+            assert databasequeries.run_numbers == run_numbers
+            assert databasequeries.get_number_datasets() == number_datasets
+            assert databasequeries.get_status(0) == status
+            with pytest.raises(OperationalError):
+                DatabaseQueries(
+                    session=session,
+                    now=now,
+                    hdxhelper=hdxhelper,
+                    use_run_summaries=True,
+                )
+            session.rollback()
+        with SQLiteAccelerator(database, in_memory=True) as session:
+            databasequeries = DatabaseQueries(
+                session=session,
+                now=now,
+                hdxhelper=hdxhelper,
+                use_run_summaries=True,
+            )
+            assert databasequeries.run_numbers == run_numbers
+            assert databasequeries.get_number_datasets() == number_datasets
+            assert inspect(session.get_bind()).has_table(
+                DBRunSummary.__tablename__
+            )
+        with Database(**database_failure) as session:
+            assert not inspect(session.get_bind()).has_table(
+                DBRunSummary.__tablename__
+            )
@@ -0,0 +1,127 @@
+"""
+Unit tests for user and organisation cache code.
+
+"""
+from datetime import timedelta
+
+from hdx.utilities.dateparse import parse_date
+from hdx.utilities.path import temp_dir
+
+from hdx.freshness.emailer.utils.hdxhelper import HDXHelper
+from hdx.freshness.emailer.utils.userorgcache import UserOrgCache
+
+
+class FakeHDX:
+    def __init__(self):
+        self.users = {
+            "u1": {"id": "u1", "name": "user1", "sysadmin": True},
+            "u2": {"id": "u2", "name": "user2", "sysadmin": False},
+        }
+        self.organizations = {
+            "o1": {
+                "id": "o1",
+                "name": "org1",
+                "metadata_modified": "2024-01-01",
+                "users": [{"id": "u1", "capacity": "admin"}],
+            },
+            "o2": {
+                "id": "o2",
+                "name": "org2",
+                "metadata_modified": "2024-01-01",
+                "users": [{"id": "u2", "capacity": "editor"}],
+            },
+        }
+        self.calls = list()
+
+
+class TestUserOrgCache:
+    class UserOrgCacheFake(UserOrgCache):
+        def __init__(self, folder, now, hdx, **kwargs):
+            self.hdx = hdx
+            super().__init__(folder, now, **kwargs)
+
+        def get_all_users(self):
+            self.hdx.calls.append("get_all_users")
+            return list(self.hdx.users.values())
+
+        def get_all_organizations(self, include_users):
+            self.hdx.calls.append(f"get_all_organizations {include_users}")
+            organizations = list()
+            for organization in self.hdx.organizations.values():
+                organization = dict(organization)
+                if not include_users:
+                    del organization["users"]
+                organizations.append(organization)
+            return organizations
+
+        def read_organization(self, identifier):
+            self.hdx.calls.append(f"read_organization {identifier}")
+            return self.hdx.organizations.get(identifier)
+
+    def test_user_org_cache(self, configuration):
+        now = parse_date("2024-01-02 10:00:00")
+        hdx = FakeHDX()
+        with temp_dir("TestUserOrgCache") as folder:
+            cache = self.UserOrgCacheFake(folder, now, hdx)
+            assert cache.refresh() is True
+            assert hdx.calls == [
+                "get_all_users",
+                "get_all_organizations True",
+            ]
+            hdx.calls = list()
+            cache = self.UserOrgCacheFake(
+                folder, now + timedelta(hours=1), hdx
+            )
+            assert cache.refresh() is False
+            assert hdx.calls == list()
+
+            hdx.users["u3"] = {"id": "u3", "name": "user3", "sysadmin": False}
+            del hdx.users["u2"]
+            hdx.users["u1"] = {"id": "u1", "name": "user1", "sysadmin": False}
+            hdx.organizations["o1"]["metadata_modified"] = "2024-01-02"
+            hdx.organizations["o1"]["users"].append(
+                {"id": "u3", "capacity": "admin"}
+            )
+            del hdx.organizations["o2"]
+            now = now + timedelta(days=1)
+            cache = self.UserOrgCacheFake(folder, now, hdx)
+            hdxhelper = HDXHelper(site_url="", userorgcache=cache)
+            assert hdx.calls == list()
+            assert list(hdxhelper.sysadmins.keys()) == list()
+            assert hdx.calls == [
+                "get_all_organizations False",
+                "read_organization o1",
+                "get_all_users",
+            ]
+            assert sorted(hdxhelper.users.keys()) == ["u1", "u3"]
+            assert hdxhelper.directory.get_role_ids("o1", "admin") == [
+                "u1",
+                "u3",
+            ]
+            assert list(hdxhelper.organizations.keys()) == ["o1"]
+
+            hdx.calls = list()
+            cache = self.UserOrgCacheFake(folder, now + timedelta(days=7), hdx)
+            assert cache.refresh() is True
+            assert hdx.calls == [
+                "get_all_users",
+                "get_all_organizations True",
+            ]
+
+            hdx.calls = list()
+            cache = self.UserOrgCacheFake(
+                folder, now + timedelta(days=8), hdx, max_delta=0
+            )
+            hdx.organizations["o3"] = {
+                "id": "o3",
+                "name": "org3",
+                "metadata_modified": "2024-01-10",
+                "users": [{"id": "u3", "capacity": "admin"}],
+            }
+            assert cache.refresh() is True
+            assert hdx.calls == [
+                "get_all_organizations False",
+                "get_all_users",
+                "get_all_organizations True",
+            ]
+            assert "o3" in cache.organizations
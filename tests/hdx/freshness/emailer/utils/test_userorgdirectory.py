@@ -0,0 +1,72 @@
+"""
+Unit tests for user and organisation directory code.
+
+"""
+from hdx.freshness.emailer.utils.records import UserRecord
+from hdx.freshness.emailer.utils.userorgdirectory import UserOrgDirectory
+
+
+class TestUserOrgDirectory:
+    def test_user_org_directory(self):
+        users = [
+            {
+                "id": "u1",
+                "name": "user1",
+                "fullname": "User 1",
+                "display_name": None,
+                "email": "u1@x.org",
+                "sysadmin": False,
+                "about": "not kept",
+            },
+            {
+                "id": "u2",
+                "name": "user2",
+                "fullname": "",
+                "email": "u2@x.org",
+                "sysadmin": True,
+            },
+        ]
+        organizations = [
+            {
+                "id": "o1",
+                "users": [
+                    {"id": "u2", "capacity": "admin"},
+                    {"id": "missing", "capacity": "admin"},
+                    {"id": "u1", "capacity": "editor"},
+                ],
+            },
+            {"id": "o2", "users": [{"id": "u1", "capacity": "member"}]},
+            {
+                "id": "o3",
+                "users": [
+                    {"id": "u2", "capacity": "admin"},
+                    {"id": "u1", "capacity": "admin"},
+                ],
+            },
+        ]
+        directory = UserOrgDirectory(users, organizations)
+        user = directory.get_user("u1")
+        assert isinstance(user, UserRecord)
+        assert dict(user) == {
+            "id": "u1",
+            "name": "user1",
+            "fullname": "User 1",
+            "display_name": None,
+            "email": "u1@x.org",
+            "sysadmin": False,
+        }
+        assert directory.get_user("missing") is None
+        assert list(directory.sysadmins.keys()) == ["u2"]
+        assert directory.sysadmin_indices == frozenset((1,))
+        assert directory.user_ids == ["u1", "u2", "missing"]
+        assert directory.organizations["o1"] == {
+            "admin": (1, 2),
+            "editor": (0,),
+        }
+        assert directory.get_role_ids("o1", "admin") == ["u2", "missing"]
+        assert directory.get_role_ids("o2", "member") == ["u1"]
+        assert directory.get_role_ids("o2", "admin") == list()
+        assert directory.get_role_ids("o3", "admin") == ["u2", "u1"]
+        assert directory.get_role_indices("o1", "admin", "editor") == (
+            frozenset((0, 1, 2))
+        )